@@ -4,24 +4,35 @@
 
 import sys
 import random
+import os
 
-try:
-    import arcade
-except ImportError as e:
-    sys.exit(
-        str(e)
-        + """
+# Display-less machines (CI): a null renderer stands for arcade
+HEADLESS = bool(os.environ.get("TETRARCADE_HEADLESS"))
+if HEADLESS:
+    import nullrenderer as arcade
+else:
+    try:
+        import arcade
+    except ImportError as e:
+        sys.exit(
+            str(e)
+            + """
 This game require arcade library.
 You can install it with:
-python -m pip install --user arcade"""
-    )
-import pyglet
+python -m pip install --user -r requirements.txt"""
+        )
+    import pyglet
 
+import csv
+import json
 import locale
 import time
-import os
+import sqlite3
+import warnings
 import itertools
 import configparser
+import concurrent.futures
+import multiprocessing
 
 from tetrislogic import (
     TetrisLogic,
@@ -29,8 +40,16 @@ from tetrislogic import (
     Coord,
     I_Tetrimino,
     Movement,
-    AbstractScheduler,
+    Mode,
+    Tetromino,
+    VirtualScheduler,
 )
+from tetrislogic.telemetry import Telemetry
+from tetrislogic.eventlog import EventLog
+from tetrislogic.bot import Bot, ORIENTATIONS, snapshot, best_placement
+from tetrislogic.store import Store, Session, session
+from tetrislogic.positions import PositionLibrary
+from tetrislogic.perfectclear import hint as perfect_clear_hint
 
 
 # Constants
@@ -62,11 +81,18 @@ BG_COLOR = (7, 11, 21)
 
 # Delays (seconds)
 HIGHLIGHT_TEXT_DISPLAY_DELAY = 0.7
+ATTRACT_DELAY = 30  # Idle time on start screen before demo
+DEMO_ACTION_PERIOD = 0.05
+PLAYING_UPDATE_RATE = 1 / 60
+IDLE_UPDATE_RATE = 1 / 10  # Starting screen, pause and game over
+BUFFERED_FRAMES = 2  # Frames drawn after a change, one per buffer
+MAX_UPDATE_DELAY = 0.1  # Longer frames slow games down instead of skipping
 
 # Transparency (0=invisible, 255=opaque)
 NORMAL_ALPHA = 255
 PRELOCKED_ALPHA = 100
 GHOST_ALPHA = 30
+HINT_ALPHA = 60
 MATRIX_BG_ALPHA = 100
 BAR_ALPHA = 75
 
@@ -98,11 +124,8 @@ MINOES_COLOR_ID = {
     Color.YELLOW: 6,
     Color.LOCKED: 7,
 }
-TEXTURES = arcade.load_textures(
-    MINOES_SPRITES_PATH,
-    ((i * MINO_SPRITE_SIZE, 0, MINO_SPRITE_SIZE, MINO_SPRITE_SIZE) for i in range(8)),
-)
-TEXTURES = {color: TEXTURES[i] for color, i in MINOES_COLOR_ID.items()}
+# Loaded once a window exists, see load_textures
+TEXTURES = {}
 
 # Music
 MUSIC_DIR = os.path.join(RESOURCES_DIR, "musics")
@@ -116,6 +139,13 @@ STATS_TEXT_SIZE = 14
 STATS_TEXT_WIDTH = 150
 HIGHLIGHT_TEXT_COLOR = arcade.color.BUBBLES
 HIGHLIGHT_TEXT_SIZE = 20
+FRAME_STATS_TEXT_SIZE = 8
+FRAME_STATS_MARGIN = 10
+
+# Frame statistics
+FRAME_STATS_SIZE = 3600  # frames kept for export
+FRAME_STATS_SUMMARY = 120  # last frames averaged on display
+FRAME_STATS_REFRESH = 0.5  # seconds between display updates
 
 # User profile path
 if sys.platform == "win32":
@@ -127,8 +157,23 @@ else:
         "XDG_DATA_HOME", os.path.expanduser("~/.local/share")
     )
 USER_PROFILE_DIR = os.path.join(USER_PROFILE_DIR, "TetrArcade")
-HIGH_SCORE_PATH = os.path.join(USER_PROFILE_DIR, ".high_score")
+HIGH_SCORE_PATH = os.path.join(USER_PROFILE_DIR, ".high_score")  # Previous versions
+DATABASE_PATH = os.path.join(USER_PROFILE_DIR, "tetrarcade.sqlite")
 CONF_PATH = os.path.join(USER_PROFILE_DIR, "config.ini")
+EVENT_LOG_DIR = os.path.join(USER_PROFILE_DIR, "logs")
+
+
+def load_textures():
+    if TEXTURES:
+        return
+    textures = arcade.load_textures(
+        MINOES_SPRITES_PATH,
+        (
+            (i * MINO_SPRITE_SIZE, 0, MINO_SPRITE_SIZE, MINO_SPRITE_SIZE)
+            for i in range(8)
+        ),
+    )
+    TEXTURES.update({color: textures[i] for color, i in MINOES_COLOR_ID.items()})
 
 
 class Texture:
@@ -145,72 +190,142 @@ class State:
     OVER = 3
 
 
-class Scheduler(AbstractScheduler):
-    def __init__(self):
-        self.tasks = {}
+class FrameStats:
+    """Timings (seconds) and render counters of the last frames, in a ring.
+    Timings are accumulated between two on_draw, by origin."""
+
+    FIELDS = (
+        "frame",
+        "input",
+        "callbacks",
+        "update",
+        "draw",
+        "text",
+        "sprites",
+        "draw_calls",
+        "particles",
+    )
 
-    def postpone(self, task, delay):
-        _task = lambda _: task()
-        self.tasks[task] = _task
-        pyglet.clock.schedule_once(_task, delay)
+    def __init__(self, size=FRAME_STATS_SIZE):
+        self.ring = [None] * size
+        self.nb_frames = 0
+        self.last_frame = None
+        self.draw_start = 0
+        self.reset()
+
+    def reset(self):
+        self.input = 0
+        self.callbacks = 0
+        self.update = 0
+        self.text = 0
+        self.draw_calls = 0
+
+    def start_draw(self):
+        self.draw_start = time.perf_counter()
+
+    def end_draw(self, sprites, particles):
+        now = time.perf_counter()
+        frame = now - self.last_frame if self.last_frame is not None else 0
+        self.last_frame = self.draw_start
+        self.ring[self.nb_frames % len(self.ring)] = (
+            frame,
+            self.input,
+            self.callbacks,
+            self.update,
+            now - self.draw_start,
+            self.text,
+            sprites,
+            self.draw_calls,
+            particles,
+        )
+        self.nb_frames += 1
+        self.reset()
+
+    def frames(self, n=None):
+        """last `n` frames records, oldest first"""
+        size = len(self.ring)
+        n = min(n or size, size, self.nb_frames)
+        return [self.ring[i % size] for i in range(self.nb_frames - n, self.nb_frames)]
+
+    def summary(self, n=FRAME_STATS_SUMMARY):
+        frames = self.frames(n)
+        if not frames:
+            return ""
+        columns = dict(zip(self.FIELDS, zip(*frames)))
+        mean = {
+            name: 1000 * sum(column) / len(frames) for name, column in columns.items()
+        }
+        frame_times = sorted(columns["frame"])
+        p99 = 1000 * frame_times[min(len(frames) - 1, int(0.99 * len(frames)))]
+        last = frames[-1]
+        return (
+            "FRAME     {:6.2f} MS  P99 {:6.2f} MS\n"
+            "UPDATE    {:6.2f} MS  CALLBACKS {:6.2f} MS  INPUT {:6.2f} MS\n"
+            "DRAW      {:6.2f} MS  TEXT {:6.2f} MS\n"
+            "SPRITES {:d}  DRAW CALLS {:d}  PARTICLES {:d}"
+        ).format(
+            mean["frame"],
+            p99,
+            mean["update"],
+            mean["callbacks"],
+            mean["input"],
+            mean["draw"],
+            mean["text"],
+            *last[-3:]
+        )
 
-    def cancel(self, task):
-        try:
-            _task = self.tasks[task]
-        except KeyError:
-            pass
-        else:
-            arcade.unschedule(_task)
-            del self.tasks[task]
+    def export(self, path):
+        """CSV file if `path` ends with .csv, else JSON"""
+        frames = self.frames()
+        with open(path, "w", newline="") as f:
+            if path.lower().endswith(".csv"):
+                writer = csv.writer(f)
+                writer.writerow(self.FIELDS)
+                writer.writerows(frames)
+            else:
+                json.dump([dict(zip(self.FIELDS, frame)) for frame in frames], f)
 
-    def reset(self, task, delay):
-        try:
-            _task = self.tasks[task]
-        except KeyError:
-            _task = lambda _: task()
-            self.tasks[task] = _task
-        else:
-            arcade.unschedule(_task)
-        pyglet.clock.schedule_once(_task, delay)
+
+class Scheduler(VirtualScheduler):
+    """Board timer on a game clock, advanced by the window each update,
+    timing callbacks in `frame_stats`"""
+
+    def __init__(self, frame_stats):
+        super().__init__()
+        self.frame_stats = frame_stats
+
+    def advance(self, delay):
+        start = time.perf_counter()
+        super().advance(delay)
+        self.frame_stats.callbacks += time.perf_counter() - start
 
 
 class MinoSprite(arcade.Sprite):
-    def __init__(self, mino, window, alpha):
+    def __init__(self, mino, board, alpha):
         super().__init__()
         self.alpha = alpha
-        self.window = window
+        self.board = board
         self.append_texture(TEXTURES[mino.color])
         self.append_texture(TEXTURES[Color.LOCKED])
         self.set_texture(0)
-        self.resize()
-
-    def resize(self):
-        self.scale = self.window.scale
-        self.size = MINO_SIZE * self.window.scale
+        # All boards minoes are drawn in one batch
+        board.window.minoes.append(self)
 
     def update(self, x, y):
-        self.left = self.window.matrix.bg.left + x * self.size
-        self.bottom = self.window.matrix.bg.bottom + y * self.size
+        self.left = self.board.matrix.bg.left + x * MINO_SIZE
+        self.bottom = self.board.matrix.bg.bottom + y * MINO_SIZE
 
     def fall(self, lines_cleared):
-        self.bottom -= MINO_SIZE * self.window.scale * lines_cleared
+        self.bottom -= MINO_SIZE * lines_cleared
 
 
-class MinoesSprites(arcade.SpriteList):
-    def resize(self):
-        for sprite in self:
-            sprite.resize()
-        self.update()
-
-
-class TetrominoSprites(MinoesSprites):
-    def __init__(self, tetromino, window, alpha=NORMAL_ALPHA):
+class TetrominoSprites(list):
+    def __init__(self, tetromino, board, alpha=NORMAL_ALPHA):
         super().__init__()
         self.tetromino = tetromino
         self.alpha = alpha
-        self.window = window
         for mino in tetromino:
-            mino.sprite = MinoSprite(mino, window, alpha)
+            mino.sprite = MinoSprite(mino, board, alpha)
             self.append(mino.sprite)
 
     def update(self):
@@ -221,12 +336,14 @@ class TetrominoSprites(MinoesSprites):
     def set_texture(self, texture):
         for mino in self.tetromino:
             mino.sprite.set_texture(texture)
-            mino.sprite.scale = self.window.scale
 
+    def kill(self):
+        for sprite in self:
+            sprite.remove_from_sprite_lists()
 
-class MatrixSprites(MinoesSprites):
+
+class MatrixSprites:
     def __init__(self, matrix):
-        super().__init__()
         self.matrix = matrix
 
     def update(self):
@@ -239,17 +356,378 @@ class MatrixSprites(MinoesSprites):
         for y in lines_to_remove:
             for mino in self.matrix[y]:
                 if mino:
-                    self.remove(mino.sprite)
+                    mino.sprite.remove_from_sprite_lists()
+
+
+class Board(TetrisLogic):
+    """A game drawn in a TetrArcade window, its matrix centered on `center_x`.
+    Boards have their own timer and pieces bag but share the window
+    textures and sprite batches."""
+
+    # Pieces coords, relative to the matrix
+    NEXT_PIECES_COORDS = NEXT_PIECES_COORDS
+    HELD_PIECE_COORD = HELD_PIECE_COORD
+
+    def __init__(self, window, center_x, center_y=WINDOW_HEIGHT / 2):
+        self.timer = Scheduler(window.frame_stats)
+        self.window = window
+        self.highlight_texts = []
+        super().__init__(LINES, COLLUMNS, NEXT_PIECES)
+
+        self.matrix.bg = arcade.Sprite(MATRIX_BG_PATH)
+        self.matrix.bg.alpha = MATRIX_BG_ALPHA
+        self.matrix.bg.center_x = center_x
+        self.matrix.bg.center_y = center_y
+        self.matrix.bg.left = int(self.matrix.bg.left)
+        self.matrix.bg.top = int(self.matrix.bg.top)
+        window.matrix_bgs.append(self.matrix.bg)
+        self.matrix.sprites = MatrixSprites(self.matrix)
+        self.ghost_sprites = None
+        self.sprites_deferred = False
+        self.exploding_minoes = [None for y in range(LINES)]
+        self.displayed_time = ""
+        self.play_time = 0
+        self.clocks_read = (time.monotonic(), self.timer.time())
+        self.stats.clock = self.play_clock
+
+    def play_clock(self):
+        """Stats clock: real time, paused time being left out by Stats, so
+        that Sprint and Ultra times are not clamped after stalls; the board
+        virtual clock in headless and turbo modes, where games run faster"""
+        now = (time.monotonic(), self.timer.time())
+        real, virtual = (new - old for new, old in zip(now, self.clocks_read))
+        self.clocks_read = now
+        self.play_time += virtual if HEADLESS or self.window.speed != 1 else real
+        return self.play_time
+
+    def check_time_up(self):
+        """end Ultra on the Stats clock: after stalls, the board timer runs
+        behind it and would end the game late"""
+        if (
+            self.mode == Mode.ULTRA
+            and not self.over
+            and self.stats.running_since is not None
+            and self.stats.time >= self.ULTRA_TIME
+        ):
+            self.time_up()
+
+    def defer_sprites(self):
+        """in turbo mode, sprites are not updated at each step but synchronized
+        with the last state once per frame, by animate"""
+        if self.window.speed > 1 or self.sprites_deferred:
+            self.sprites_deferred = True
+        return self.sprites_deferred
+
+    def sync_sprites(self):
+        """create, place and remove sprites to show the current state only"""
+        self.sprites_deferred = False
+        shown = set()
+        for y, line in enumerate(self.matrix):
+            for x, mino in enumerate(line):
+                if mino:
+                    if not getattr(mino, "sprite", None):
+                        mino.sprite = MinoSprite(mino, self, NORMAL_ALPHA)
+                    mino.sprite.set_texture(Texture.NORMAL)
+                    mino.sprite.update(x, y)
+                    shown.add(mino.sprite)
+        for piece, coord in zip(self.next.pieces, self.NEXT_PIECES_COORDS):
+            piece.coord = coord
+        if self.held.piece:
+            self.held.piece.coord = self.HELD_PIECE_COORD
+            if type(self.held.piece) == I_Tetrimino:
+                self.held.piece.coord += Movement.LEFT
+        pieces = self.next.pieces + [self.held.piece]
+        if self.matrix.piece:
+            pieces.append(self.matrix.piece)
+            if not getattr(self.matrix.ghost, "sprites", None):
+                self.matrix.ghost.sprites = TetrominoSprites(
+                    self.matrix.ghost, self, GHOST_ALPHA
+                )
+            self.ghost_sprites = self.matrix.ghost.sprites
+            pieces.append(self.matrix.ghost)
+        for piece in pieces:
+            if not piece:
+                continue
+            if not getattr(piece, "sprites", None):
+                piece.sprites = TetrominoSprites(piece, self)
+            if piece is self.matrix.piece and getattr(piece, "locked", False):
+                piece.sprites.set_texture(Texture.LOCKED)
+            elif piece is not self.matrix.ghost:
+                piece.sprites.set_texture(Texture.NORMAL)
+            piece.sprites.update()
+            shown.update(piece.sprites)
+        for sprite in [
+            sprite
+            for sprite in self.window.minoes
+            if sprite.board is self and sprite not in shown
+        ]:
+            sprite.remove_from_sprite_lists()
+        self.window.set_dirty()
+
+    def clear_sprites(self):
+        for sprite in [sprite for sprite in self.window.minoes if sprite.board is self]:
+            sprite.remove_from_sprite_lists()
+        self.ghost_sprites = None
+
+    def on_new_game(self, matrix, next_pieces):
+        self.highlight_texts = []
+        self.displayed_time = ""
+        if self.defer_sprites():
+            return
+        self.clear_sprites()
+        for piece in next_pieces:
+            piece.sprites = TetrominoSprites(piece, self)
+        # Starting position
+        for line in matrix:
+            for mino in line:
+                if mino:
+                    mino.sprite = MinoSprite(mino, self, NORMAL_ALPHA)
+        if self.held.piece:
+            self.held.piece.sprites = TetrominoSprites(self.held.piece, self)
+            self.on_hold(self.held.piece)
+        self.window.set_dirty()
+
+    def on_new_level(self, level):
+        self.show_text("LEVEL\n{:n}".format(level))
+
+    def on_generation_phase(self, matrix, falling_piece, ghost_piece, next_pieces):
+        if self.defer_sprites():
+            return
+        matrix.sprites.update()
+        # falling piece keeps its sprites from next or held queue
+        if self.ghost_sprites:
+            self.ghost_sprites.kill()
+        ghost_piece.sprites = TetrominoSprites(ghost_piece, self, GHOST_ALPHA)
+        self.ghost_sprites = ghost_piece.sprites
+        if not getattr(next_pieces[-1], "sprites", None):
+            # New piece, not after a hold
+            next_pieces[-1].sprites = TetrominoSprites(next_pieces[-1], self)
+        for piece, coord in zip(next_pieces, self.NEXT_PIECES_COORDS):
+            piece.coord = coord
+        for piece in [falling_piece, ghost_piece] + next_pieces:
+            piece.sprites.update()
+        self.window.set_dirty()
+
+    def on_falling_phase(self, falling_piece, ghost_piece):
+        if self.defer_sprites():
+            return
+        falling_piece.sprites.set_texture(Texture.NORMAL)
+        falling_piece.sprites.update()
+        ghost_piece.sprites.update()
+        self.window.set_dirty()
+
+    def on_locked(self, falling_piece, ghost_piece):
+        if self.defer_sprites():
+            return
+        falling_piece.sprites.set_texture(Texture.LOCKED)
+        falling_piece.sprites.update()
+        ghost_piece.sprites.update()
+        self.window.set_dirty()
+
+    def on_locks_down(self, matrix, falling_piece):
+        if self.defer_sprites():
+            return
+        falling_piece.sprites.set_texture(Texture.NORMAL)
+        self.window.set_dirty()
+
+    def on_animate_phase(self, matrix, lines_to_remove):
+        if not lines_to_remove or self.defer_sprites():
+            return
+
+        self.timer.cancel(self.clean_particules)
+        for y in lines_to_remove:
+            line_textures = tuple(TEXTURES[mino.color] for mino in matrix[y])
+            self.exploding_minoes[y] = arcade.Emitter(
+                center_xy=(matrix.bg.left, matrix.bg.bottom + (y + 0.5) * MINO_SIZE),
+                emit_controller=arcade.EmitBurst(COLLUMNS),
+                particle_factory=lambda emitter: arcade.LifetimeParticle(
+                    filename_or_texture=random.choice(line_textures),
+                    change_xy=arcade.rand_in_rect(
+                        (-COLLUMNS * MINO_SIZE, -4 * MINO_SIZE),
+                        2 * COLLUMNS * MINO_SIZE,
+                        5 * MINO_SIZE,
+                    ),
+                    lifetime=EXPLOSION_ANIMATION,
+                    center_xy=arcade.rand_on_line((0, 0), (matrix.bg.width, 0)),
+                    alpha=NORMAL_ALPHA,
+                    change_angle=2,
+                ),
+            )
+        self.timer.postpone(self.clean_particules, EXPLOSION_ANIMATION)
+
+    def clean_particules(self):
+        self.exploding_minoes = [None for y in range(LINES)]
+        self.window.set_dirty()
+
+    def on_eliminate_phase(self, matrix, lines_to_remove):
+        if self.defer_sprites():
+            return
+        matrix.sprites.remove_lines(lines_to_remove)
+        self.window.set_dirty()
+
+    def on_completion_phase(self, pattern_name, pattern_score, nb_combo, combo_score):
+        if pattern_score:
+            self.show_text("{:s}\n{:n}".format(pattern_name, pattern_score))
+        if combo_score:
+            self.show_text("COMBO x{:n}\n{:n}".format(nb_combo, combo_score))
+        self.window.set_dirty()
+
+    def on_attack(self, nb_lines):
+        self.window.send_garbage(self, nb_lines)
+
+    def on_garbage(self, matrix, nb_lines, hole):
+        if self.defer_sprites():
+            return
+        for line in matrix[:nb_lines]:
+            for mino in line:
+                if mino:
+                    mino.sprite = MinoSprite(mino, self, NORMAL_ALPHA)
+        matrix.sprites.update()
+        self.window.set_dirty()
 
+    def on_hold(self, held_piece):
+        if self.defer_sprites():
+            return
+        held_piece.coord = self.HELD_PIECE_COORD
+        if type(held_piece) == I_Tetrimino:
+            held_piece.coord += Movement.LEFT
+        held_piece.sprites.set_texture(Texture.NORMAL)
+        held_piece.sprites.update()
+        self.window.set_dirty()
+
+    def show_text(self, text):
+        self.highlight_texts.append(text)
+        self.window.set_dirty()
+        self.timer.postpone(self.del_highlight_text, HIGHLIGHT_TEXT_DISPLAY_DELAY)
 
-class TetrArcade(TetrisLogic, arcade.Window):
-    """Tetris clone with arcade GUI library"""
+    def del_highlight_text(self):
+        if self.highlight_texts:
+            self.highlight_texts.pop(0)
+            self.window.set_dirty()
+        else:
+            self.timer.cancel(self.del_highlight_text)
+
+    def time_text(self):
+        """whole seconds in marathon, hundredths in timed modes"""
+        minutes, seconds = divmod(self.stats.time, 60)
+        hours, minutes = divmod(int(minutes), 60)
+        if hours:
+            return "{:d}:{:02d}:{:02d}".format(hours, minutes, int(seconds))
+        elif self.mode == Mode.MARATHON:
+            return "{:02d}:{:02d}".format(minutes, int(seconds))
+        else:
+            return "{:02d}:{:05.2f}".format(minutes, seconds)
+
+    def animate(self):
+        """dispatch events, update sprites, particles and clock text"""
+        self.events.dispatch()
+        if self.sprites_deferred:
+            self.sync_sprites()
+        for exploding_minoes in self.exploding_minoes:
+            if exploding_minoes:
+                exploding_minoes.update()
+                self.window.set_dirty()
+        if self.window.state == State.PLAYING:
+            time_text = self.time_text()
+            if time_text != self.displayed_time:
+                self.displayed_time = time_text
+                self.window.set_dirty()
+
+    def draw_stats(self):
+        font_size = STATS_TEXT_SIZE
+        for y, text in enumerate(
+            ("TIME", "LINES", "GOAL", "LEVEL", "HIGH SCORE", "SCORE")
+        ):
+            arcade.draw_text(
+                text=text,
+                start_x=self.matrix.bg.left - STATS_TEXT_MARGIN - STATS_TEXT_WIDTH,
+                start_y=self.matrix.bg.bottom + 1.5 * (2 * y + 1) * font_size,
+                color=TEXT_COLOR,
+                font_size=font_size,
+                align="right",
+                font_name=FONT_NAME,
+                anchor_x="left",
+            )
+            self.window.frame_stats.draw_calls += 1
+        for y, text in enumerate(
+            (
+                self.displayed_time,
+                "{:n}".format(self.stats.lines_cleared),
+                "{:n}".format(self.stats.goal),
+                "{:n}".format(self.stats.level),
+                "{:n}".format(self.stats.high_score),
+                "{:n}".format(self.stats.score),
+            )
+        ):
+            arcade.draw_text(
+                text=text,
+                start_x=self.matrix.bg.left - STATS_TEXT_MARGIN,
+                start_y=self.matrix.bg.bottom + 3 * y * font_size,
+                color=TEXT_COLOR,
+                font_size=font_size,
+                align="right",
+                font_name=FONT_NAME,
+                anchor_x="right",
+            )
+            self.window.frame_stats.draw_calls += 1
+
+    def draw_particles(self):
+        for exploding_minoes in self.exploding_minoes:
+            if exploding_minoes:
+                exploding_minoes.draw()
+                self.window.frame_stats.draw_calls += 1
+
+    def draw_highlight_text(self, text):
+        arcade.draw_text(
+            text=text,
+            start_x=self.matrix.bg.center_x,
+            start_y=self.matrix.bg.center_y,
+            color=HIGHLIGHT_TEXT_COLOR,
+            font_size=HIGHLIGHT_TEXT_SIZE,
+            align="center",
+            font_name=FONT_NAME,
+            anchor_x="center",
+            anchor_y="center",
+        )
+        self.window.frame_stats.draw_calls += 1
 
-    timer = Scheduler()
+
+class BotBoard(Board):
+    """Board played by the beam search bot"""
+
+    def __init__(self, window, center_x, center_y=WINDOW_HEIGHT / 2):
+        super().__init__(window, center_x, center_y)
+        self.bot = Bot(self)
+
+    def on_new_game(self, matrix, next_pieces):
+        super().on_new_game(matrix, next_pieces)
+        self.timer.reset(self.bot_step, DEMO_ACTION_PERIOD)
+
+    def bot_step(self):
+        self.bot.step()
+        if not self.over:
+            self.timer.postpone(self.bot_step, DEMO_ACTION_PERIOD)
+
+    def stop_all(self):
+        super().stop_all()
+        self.timer.cancel(self.bot_step)
+
+    def on_resume(self):
+        self.timer.reset(self.bot_step, DEMO_ACTION_PERIOD)
+
+    def load_high_score(self):
+        self.stats.high_score = 0
+
+    def save_high_score(self):
+        pass
+
+
+class TetrArcade(Board, arcade.Window):
+    """Tetris clone with arcade GUI library
+    The player board, and the window of all boards"""
 
     def __init__(self):
         locale.setlocale(locale.LC_ALL, "")
-        self.highlight_texts = []
 
         self.conf = configparser.ConfigParser()
         if self.conf.read(CONF_PATH):
@@ -262,7 +740,27 @@ class TetrArcade(TetrisLogic, arcade.Window):
             self.new_conf()
             self.load_conf()
 
-        super().__init__(LINES, COLLUMNS, NEXT_PIECES)
+        try:
+            self.store = Store(DATABASE_PATH)
+        except sqlite3.Error as e:
+            warnings.warn("Scores will not be saved: {}".format(e))
+            self.store = None
+        self.session_start = None
+
+        self.positions = None
+        if self.positions_path:
+            try:
+                self.positions = PositionLibrary(self.positions_path)
+                if self.positions.collumns != COLLUMNS:
+                    raise ValueError(
+                        "{} collumns positions".format(self.positions.collumns)
+                    )
+            except (OSError, ValueError) as e:
+                warnings.warn("Positions could not be loaded: {}".format(e))
+                self.positions = None
+        self.position = None
+        self.nb_positions_played = 0
+
         arcade.Window.__init__(
             self,
             width=self.init_width,
@@ -273,16 +771,49 @@ class TetrArcade(TetrisLogic, arcade.Window):
             fullscreen=self.init_fullscreen,
         )
 
+        self.hint = None
+        self.hint_result = None
+        self.hint_generation = 0
+        self.hint_future = None
+        if self.show_hint:
+            self.hint_pool = concurrent.futures.ProcessPoolExecutor(1)
+        else:
+            self.hint_pool = None
+
+        load_textures()
+        # Shared by all boards
+        self.matrix_bgs = arcade.SpriteList()
+        self.minoes = arcade.SpriteList()
+        self.frame_stats = FrameStats()
+        self.frame_stats_text = ""
+        self.frame_stats_refreshed = 0
+        self.speed = 1
+
+        super().__init__(self, WINDOW_WIDTH / 2)
+        # Finesse table generated in background, the first time
+        self.telemetry = Telemetry(
+            self,
+            clock=time.perf_counter,
+            finesse_cache=USER_PROFILE_DIR,
+            background=True,
+        )
+        if self.log_events:
+            self.event_log = EventLog(self, EVENT_LOG_DIR)
+        else:
+            self.event_log = None
+        self.opponents = [
+            BotBoard(self, (n + 1.5) * WINDOW_WIDTH) for n in range(self.nb_bots)
+        ]
+        self.boards = [self] + self.opponents
+
         arcade.set_background_color(BG_COLOR)
         self.set_minimum_size(WINDOW_MIN_WIDTH, WINDOW_MIN_HEIGHT)
         self.bg = arcade.Sprite(WINDOW_BG_PATH)
-        self.matrix.bg = arcade.Sprite(MATRIX_BG_PATH)
-        self.matrix.bg.alpha = MATRIX_BG_ALPHA
-        self.matrix.sprites = MatrixSprites(self.matrix)
+        self.bg.center_x = len(self.boards) * WINDOW_WIDTH / 2
+        self.bg.center_y = WINDOW_HEIGHT / 2
         self.on_resize(self.init_width, self.init_height)
-        self.exploding_minoes = [None for y in range(LINES)]
 
-        if self.play_music:
+        if self.play_music and not HEADLESS:
             try:
                 self.music = pyglet.media.Player()
                 playlist = itertools.cycle(
@@ -295,7 +826,29 @@ class TetrArcade(TetrisLogic, arcade.Window):
         else:
             self.music = None
 
+        self.demo = False
+        self.bot = None
+
+        self.dirty_frames = BUFFERED_FRAMES
         self.state = State.STARTING
+        self.timer.postpone(self.start_demo, ATTRACT_DELAY)
+
+    def set_dirty(self):
+        """redraw on next frames"""
+        self.dirty_frames = BUFFERED_FRAMES
+
+    def _get_state(self):
+        return self._state
+
+    def _set_state(self, state):
+        self._state = state
+        self.set_dirty()
+        if state == State.PLAYING:
+            self.set_update_rate(PLAYING_UPDATE_RATE)
+        else:
+            self.set_update_rate(IDLE_UPDATE_RATE)
+
+    state = property(_get_state, _set_state)
 
     def new_conf(self):
         self.conf["WINDOW"] = {
@@ -314,9 +867,17 @@ class TetrArcade(TetrisLogic, arcade.Window):
             "hold": "C",
             "pause": "ESCAPE",
             "fullscreen": "F11",
+            "frame stats": "F3",
         }
         self.conf["MUSIC"] = {"play": True}
         self.conf["AUTO-REPEAT"] = {"delay": 0.3, "period": 0.01}
+        self.conf["GAME"] = {"mode": Mode.MARATHON, "positions": ""}
+        self.conf["HINT"] = {"show": False, "perfect clear": False}
+        self.conf["BOARDS"] = {"bots": 0, "versus": False}
+        self.conf["PROFILE"] = {"name": "PLAYER"}
+        self.conf["LOG"] = {"events": False}
+        self.conf["DEMO"] = {"speed": 1}
+        self.conf["FRAME STATS"] = {"show": False, "export": ""}
         self.load_conf()
         if not os.path.exists(USER_PROFILE_DIR):
             os.makedirs(USER_PROFILE_DIR)
@@ -328,6 +889,7 @@ class TetrArcade(TetrisLogic, arcade.Window):
         self.init_height = int(self.conf["WINDOW"]["height"])
         self.init_fullscreen = self.conf["WINDOW"].getboolean("fullscreen")
 
+        self.conf["KEYBOARD"].setdefault("frame stats", "F3")
         for action, key in self.conf["KEYBOARD"].items():
             self.conf["KEYBOARD"][action] = key.upper()
         self.key_map = {
@@ -336,6 +898,9 @@ class TetrArcade(TetrisLogic, arcade.Window):
                 getattr(
                     arcade.key, self.conf["KEYBOARD"]["fullscreen"]
                 ): self.toggle_fullscreen,
+                getattr(
+                    arcade.key, self.conf["KEYBOARD"]["frame stats"]
+                ): self.toggle_frame_stats,
             },
             State.PLAYING: {
                 getattr(arcade.key, self.conf["KEYBOARD"]["move left"]): self.move_left,
@@ -355,18 +920,27 @@ class TetrArcade(TetrisLogic, arcade.Window):
                 getattr(
                     arcade.key, self.conf["KEYBOARD"]["fullscreen"]
                 ): self.toggle_fullscreen,
+                getattr(
+                    arcade.key, self.conf["KEYBOARD"]["frame stats"]
+                ): self.toggle_frame_stats,
             },
             State.PAUSED: {
                 getattr(arcade.key, self.conf["KEYBOARD"]["pause"]): self.resume,
                 getattr(
                     arcade.key, self.conf["KEYBOARD"]["fullscreen"]
                 ): self.toggle_fullscreen,
+                getattr(
+                    arcade.key, self.conf["KEYBOARD"]["frame stats"]
+                ): self.toggle_frame_stats,
             },
             State.OVER: {
                 getattr(arcade.key, self.conf["KEYBOARD"]["start"]): self.new_game,
                 getattr(
                     arcade.key, self.conf["KEYBOARD"]["fullscreen"]
                 ): self.toggle_fullscreen,
+                getattr(
+                    arcade.key, self.conf["KEYBOARD"]["frame stats"]
+                ): self.toggle_frame_stats,
             },
         }
 
@@ -403,13 +977,42 @@ AGAIN""".format(
         )
 
         self.play_music = self.conf["MUSIC"].getboolean("play")
+        self.game_mode = self.conf.get("GAME", "mode", fallback=Mode.MARATHON).upper()
+        self.positions_path = self.conf.get("GAME", "positions", fallback="")
+        self.show_hint = self.conf.getboolean("HINT", "show", fallback=False)
+        self.hint_perfect_clear = self.conf.getboolean(
+            "HINT", "perfect clear", fallback=False
+        )
+        self.nb_bots = self.conf.getint("BOARDS", "bots", fallback=0)
+        self.versus = self.conf.getboolean("BOARDS", "versus", fallback=False)
+        self.profile = self.conf.get("PROFILE", "name", fallback="PLAYER")
+        self.log_events = self.conf.getboolean("LOG", "events", fallback=False)
+        self.demo_speed = max(1, self.conf.getfloat("DEMO", "speed", fallback=1))
+        self.show_frame_stats = self.conf.getboolean(
+            "FRAME STATS", "show", fallback=False
+        )
+        self.frame_stats_export = self.conf.get("FRAME STATS", "export", fallback="")
+
+    def new_game(self):
+        """from the next position of the library, if any, in order"""
+        if self.positions and not self.demo:
+            self.position = self.positions[
+                self.nb_positions_played % len(self.positions)
+            ]
+            self.nb_positions_played += 1
+        else:
+            self.position = None
+        super().new_game(mode=self.game_mode, position=self.position)
 
     def on_new_game(self, matrix, next_pieces):
-        self.highlight_texts = []
-
-        self.matrix.sprites = MatrixSprites(matrix)
-        for piece in next_pieces:
-            piece.sprites = TetrominoSprites(piece, self)
+        super().on_new_game(matrix, next_pieces)
+        for board in self.opponents:
+            board.new_game(mode=self.game_mode)
+        # Positions scores are not comparable
+        if self.demo or self.position is not None:
+            self.session_start = None
+        else:
+            self.session_start = time.time()
 
         if self.music:
             self.music.seek(0)
@@ -417,101 +1020,149 @@ AGAIN""".format(
 
         self.state = State.PLAYING
 
-    def on_new_level(self, level):
-        self.show_text("LEVEL\n{:n}".format(level))
-
     def on_generation_phase(self, matrix, falling_piece, ghost_piece, next_pieces):
-        matrix.sprites.update()
-        falling_piece.sprites = TetrominoSprites(falling_piece, self)
-        ghost_piece.sprites = TetrominoSprites(ghost_piece, self, GHOST_ALPHA)
-        next_pieces[-1].sprites = TetrominoSprites(next_pieces[-1], self)
-        for piece, coord in zip(next_pieces, NEXT_PIECES_COORDS):
-            piece.coord = coord
-        for piece in [falling_piece, ghost_piece] + next_pieces:
-            piece.sprites.update()
+        super().on_generation_phase(matrix, falling_piece, ghost_piece, next_pieces)
+        if self.hint_pool and self.speed == 1:
+            self.request_hint()
+
+    def request_hint(self):
+        """search best placement (or first placement of a perfect clear)
+        in another process from a matrix snapshot"""
+        if self.hint:
+            self.hint.sprites.kill()
+        self.hint = None
+        self.hint_generation += 1
+        generation = self.hint_generation
+        if self.hint_future:
+            # Stale search: dropped if not started yet
+            self.hint_future.cancel()
+        future = self.hint_future = self.hint_pool.submit(
+            perfect_clear_hint if self.hint_perfect_clear else best_placement,
+            *snapshot(self),
+            self.matrix.collumns
+        )
 
-    def on_falling_phase(self, falling_piece, ghost_piece):
-        falling_piece.sprites.set_texture(Texture.NORMAL)
-        falling_piece.sprites.update()
-        ghost_piece.sprites.update()
+        def on_done(future):
+            # Called from another thread, the result is used in update
+            if not future.cancelled() and not future.exception():
+                self.hint_result = (generation, future.result())
 
-    def on_locked(self, falling_piece, ghost_piece):
-        falling_piece.sprites.set_texture(Texture.LOCKED)
-        falling_piece.sprites.update()
-        ghost_piece.sprites.update()
+        future.add_done_callback(on_done)
 
-    def on_locks_down(self, matrix, falling_piece):
-        falling_piece.sprites.set_texture(Texture.NORMAL)
-        for mino in falling_piece:
-            matrix.sprites.append(mino.sprite)
-
-    def on_animate_phase(self, matrix, lines_to_remove):
-        if not lines_to_remove:
+    def show_hint_result(self, generation, placement):
+        if generation != self.hint_generation or placement is None:
+            # Piece changed since request
             return
 
-        self.timer.cancel(self.clean_particules)
-        for y in lines_to_remove:
-            line_textures = tuple(TEXTURES[mino.color] for mino in matrix[y])
-            self.exploding_minoes[y] = arcade.Emitter(
-                center_xy=(matrix.bg.left, matrix.bg.bottom + (y + 0.5) * MINO_SIZE),
-                emit_controller=arcade.EmitBurst(COLLUMNS),
-                particle_factory=lambda emitter: arcade.LifetimeParticle(
-                    filename_or_texture=random.choice(line_textures),
-                    change_xy=arcade.rand_in_rect(
-                        (-COLLUMNS * MINO_SIZE, -4 * MINO_SIZE),
-                        2 * COLLUMNS * MINO_SIZE,
-                        5 * MINO_SIZE,
-                    ),
-                    lifetime=EXPLOSION_ANIMATION,
-                    center_xy=arcade.rand_on_line((0, 0), (matrix.bg.width, 0)),
-                    scale=self.scale,
-                    alpha=NORMAL_ALPHA,
-                    change_angle=2,
-                ),
-            )
-        self.timer.postpone(self.clean_particules, EXPLOSION_ANIMATION)
-
-    def clean_particules(self):
-        self.exploding_minoes = [None for y in range(LINES)]
-
-    def on_eliminate_phase(self, matrix, lines_to_remove):
-        matrix.sprites.remove_lines(lines_to_remove)
-
-    def on_completion_phase(self, pattern_name, pattern_score, nb_combo, combo_score):
-        if pattern_score:
-            self.show_text("{:s}\n{:n}".format(pattern_name, pattern_score))
-        if combo_score:
-            self.show_text("COMBO x{:n}\n{:n}".format(nb_combo, combo_score))
-
-    def on_hold(self, held_piece):
-        held_piece.coord = HELD_PIECE_COORD
-        if type(held_piece) == I_Tetrimino:
-            held_piece.coord += Movement.LEFT
-        held_piece.sprites.set_texture(Texture.NORMAL)
-        held_piece.sprites.update()
+        if placement.hold:
+            if self.held.piece:
+                shape = type(self.held.piece)
+            else:
+                shape = type(self.next.pieces[0])
+        else:
+            shape = type(self.matrix.piece)
+        hint = shape()
+        cells = ORIENTATIONS[Tetromino.shapes.index(shape)][placement.orientation]
+        for mino, (x, y) in zip(hint, cells):
+            mino.coord = Coord(x, y)
+        hint.coord = Coord(
+            placement.left - min(x for x, y in cells), self.FALLING_PIECE_COORD.y
+        )
+        while self.matrix.space_to_move(
+            hint.coord + Movement.DOWN, (mino.coord for mino in hint)
+        ):
+            hint.coord += Movement.DOWN
+        hint.sprites = TetrominoSprites(hint, self, HINT_ALPHA)
+        hint.sprites.set_texture(Texture.LOCKED)
+        hint.sprites.update()
+        self.hint = hint
+        self.set_dirty()
+
+    def send_garbage(self, sender, nb_lines):
+        """versus: garbage goes to the next board still playing"""
+        if not self.versus:
+            return
+        n = self.boards.index(sender)
+        for board in self.boards[n + 1 :] + self.boards[:n]:
+            if not board.over:
+                board.receive_garbage(nb_lines)
+                return
 
     def on_pause(self):
         self.state = State.PAUSED
+        for board in self.opponents:
+            if not board.over:
+                board.pause()
         if self.music:
             self.music.pause()
 
-    def resume(self):
+    def on_resume(self):
+        for board in self.opponents:
+            if not board.over:
+                board.resume()
         if self.music:
             self.music.play()
         self.state = State.PLAYING
 
     def on_game_over(self):
         self.state = State.OVER
+        for board in self.opponents:
+            board.stop_all()
+        if self.music:
+            self.music.pause()
+        if self.demo:
+            self.stop_demo()
+
+    def start_demo(self):
+        """attract mode: the bot plays until a key is pressed"""
+        self.demo = True
+        self.high_score_before_demo = self.stats.high_score
+        if not self.bot:
+            self.bot = Bot(self)
+        self.set_speed(self.demo_speed)
+        self.new_game()
+        self.timer.postpone(self.demo_step, DEMO_ACTION_PERIOD)
+
+    def demo_step(self):
+        if self.state == State.PLAYING:
+            self.bot.step()
+            self.timer.postpone(self.demo_step, DEMO_ACTION_PERIOD)
+
+    def stop_demo(self):
+        self.demo = False
+        self.set_speed(1)
+        self.timer.cancel(self.demo_step)
+        self.stop_all()
+        for board in self.opponents:
+            board.stop_all()
+        self.pressed_actions = []
+        self.highlight_texts = []
+        self.stats.high_score = self.high_score_before_demo
         if self.music:
             self.music.pause()
+        self.state = State.STARTING
+        self.timer.postpone(self.start_demo, ATTRACT_DELAY)
 
     def on_key_press(self, key, modifiers):
+        if self.demo:
+            self.stop_demo()
+            return
+
         try:
             action = self.key_map[self.state][key]
         except KeyError:
-            return
+            pass
         else:
+            start = time.perf_counter()
+            # Latency measured up to the next frame
+            self.telemetry.key_pressed(start)
             self.do_action(action)
+            self.frame_stats.input += time.perf_counter() - start
+
+        if self.state == State.STARTING:
+            self.timer.reset(self.start_demo, ATTRACT_DELAY)
+        else:
+            self.timer.cancel(self.start_demo)
 
     def on_key_release(self, key, modifiers):
         try:
@@ -519,160 +1170,184 @@ AGAIN""".format(
         except KeyError:
             return
         else:
+            start = time.perf_counter()
             self.remove_action(action)
-
-    def show_text(self, text):
-        self.highlight_texts.append(text)
-        self.timer.postpone(self.del_highlight_text, HIGHLIGHT_TEXT_DISPLAY_DELAY)
-
-    def del_highlight_text(self):
-        if self.highlight_texts:
-            self.highlight_texts.pop(0)
-        else:
-            self.timer.cancel(self.del_highlight_text)
+            self.frame_stats.input += time.perf_counter() - start
 
     def on_draw(self):
+        if not self.dirty_frames:
+            # Unchanged frame: pending inputs had nothing to show
+            self.telemetry.frame_drawn()
+            return
+        self.dirty_frames -= 1
+        self.frame_stats.start_draw()
+
         arcade.start_render()
         self.bg.draw()
+        self.frame_stats.draw_calls += 1
 
         if self.state not in (State.STARTING, State.PAUSED):
-            self.matrix.bg.draw()
-            self.matrix.sprites.draw()
-
-            for tetromino in [
-                self.held.piece,
-                self.matrix.piece,
-                self.matrix.ghost,
-            ] + self.next.pieces:
-                if tetromino:
-                    tetromino.sprites.draw()
-
-            t = time.localtime(self.stats.time)
-            font_size = STATS_TEXT_SIZE * self.scale
-            for y, text in enumerate(
-                ("TIME", "LINES", "GOAL", "LEVEL", "HIGH SCORE", "SCORE")
-            ):
-                arcade.draw_text(
-                    text=text,
-                    start_x=self.matrix.bg.left
-                    - self.scale * (STATS_TEXT_MARGIN + STATS_TEXT_WIDTH),
-                    start_y=self.matrix.bg.bottom + 1.5 * (2 * y + 1) * font_size,
-                    color=TEXT_COLOR,
-                    font_size=font_size,
-                    align="right",
-                    font_name=FONT_NAME,
-                    anchor_x="left",
-                )
-            for y, text in enumerate(
-                (
-                    "{:02d}:{:02d}:{:02d}".format(t.tm_hour - 1, t.tm_min, t.tm_sec),
-                    "{:n}".format(self.stats.lines_cleared),
-                    "{:n}".format(self.stats.goal),
-                    "{:n}".format(self.stats.level),
-                    "{:n}".format(self.stats.high_score),
-                    "{:n}".format(self.stats.score),
-                )
-            ):
-                arcade.draw_text(
-                    text=text,
-                    start_x=self.matrix.bg.left - STATS_TEXT_MARGIN * self.scale,
-                    start_y=self.matrix.bg.bottom + 3 * y * font_size,
-                    color=TEXT_COLOR,
-                    font_size=font_size,
-                    align="right",
-                    font_name=FONT_NAME,
-                    anchor_x="right",
-                )
-
-        for exploding_minoes in self.exploding_minoes:
-            if exploding_minoes:
-                exploding_minoes.draw()
+            # One draw call per batch, whatever the number of boards
+            self.matrix_bgs.draw()
+            self.minoes.draw()
+            self.frame_stats.draw_calls += 2
+            start = time.perf_counter()
+            for board in self.boards:
+                board.draw_stats()
+            self.frame_stats.text += time.perf_counter() - start
+
+        for board in self.boards:
+            board.draw_particles()
+
+        start = time.perf_counter()
+        if self.state == State.PLAYING:
+            for board in self.boards:
+                if board.highlight_texts:
+                    board.draw_highlight_text(board.highlight_texts[0])
+        else:
+            highlight_text = {
+                State.STARTING: self.start_text,
+                State.PAUSED: self.pause_text,
+                State.OVER: self.game_over_text,
+            }.get(self.state, "")
+            if highlight_text:
+                self.draw_highlight_text(highlight_text)
+        if self.show_frame_stats:
+            self.draw_frame_stats()
+        self.frame_stats.text += time.perf_counter() - start
+
+        self.telemetry.frame_drawn()
+        self.frame_stats.end_draw(
+            sprites=1 + len(self.matrix_bgs) + len(self.minoes),
+            particles=sum(
+                emitter.get_count()
+                for board in self.boards
+                for emitter in board.exploding_minoes
+                if emitter
+            ),
+        )
 
-        highlight_text = {
-            State.STARTING: self.start_text,
-            State.PLAYING: self.highlight_texts[0] if self.highlight_texts else "",
-            State.PAUSED: self.pause_text,
-            State.OVER: self.game_over_text,
-        }.get(self.state, "")
-        if highlight_text:
-            arcade.draw_text(
-                text=highlight_text,
-                start_x=self.matrix.bg.center_x,
-                start_y=self.matrix.bg.center_y,
-                color=HIGHLIGHT_TEXT_COLOR,
-                font_size=HIGHLIGHT_TEXT_SIZE * self.scale,
-                align="center",
-                font_name=FONT_NAME,
-                anchor_x="center",
-                anchor_y="center",
-            )
+    def draw_frame_stats(self):
+        now = time.perf_counter()
+        if (
+            not self.frame_stats_text
+            or now - self.frame_stats_refreshed >= FRAME_STATS_REFRESH
+        ):
+            self.frame_stats_text = self.frame_stats.summary()
+            self.frame_stats_refreshed = now
+        left, right, bottom, top = arcade.get_viewport()
+        arcade.draw_text(
+            text=self.frame_stats_text,
+            start_x=left + FRAME_STATS_MARGIN,
+            start_y=top - FRAME_STATS_MARGIN,
+            color=TEXT_COLOR,
+            font_size=FRAME_STATS_TEXT_SIZE,
+            font_name=FONT_NAME,
+            anchor_x="left",
+            anchor_y="top",
+        )
+        self.frame_stats.draw_calls += 1
 
     def on_hide(self):
         self.pause()
 
+    def on_expose(self):
+        self.set_dirty()
+
     def toggle_fullscreen(self):
         self.set_fullscreen(not self.fullscreen)
 
+    def toggle_frame_stats(self):
+        self.show_frame_stats = not self.show_frame_stats
+        self.set_dirty()
+
     def on_resize(self, width, height):
+        """everything is drawn in logical units, WINDOW_WIDTH x WINDOW_HEIGHT
+        per board, centered and scaled to fit the window by the projection only"""
         super().on_resize(width, height)
-        center_x = width / 2
-        center_y = height / 2
-        self.scale = min(width / WINDOW_WIDTH, height / WINDOW_HEIGHT)
-
-        self.bg.scale = max(width / WINDOW_WIDTH, height / WINDOW_HEIGHT)
-        self.bg.center_x = center_x
-        self.bg.center_y = center_y
-
-        self.matrix.bg.scale = self.scale
-        self.matrix.bg.center_x = center_x
-        self.matrix.bg.center_y = center_y
-        self.matrix.bg.left = int(self.matrix.bg.left)
-        self.matrix.bg.top = int(self.matrix.bg.top)
-
-        self.matrix.sprites.resize()
-
-        for tetromino in [
-            self.held.piece,
-            self.matrix.piece,
-            self.matrix.ghost,
-        ] + self.next.pieces:
-            if tetromino:
-                tetromino.sprites.resize()
+        logical_width = len(self.boards) * WINDOW_WIDTH
+        scale = min(width / logical_width, height / WINDOW_HEIGHT)
+        left = (logical_width - width / scale) / 2
+        bottom = (WINDOW_HEIGHT - height / scale) / 2
+        arcade.set_viewport(left, left + width / scale, bottom, bottom + height / scale)
+        # Background covers the whole window
+        self.bg.scale = max(width / logical_width, height / WINDOW_HEIGHT) / scale
+        self.set_dirty()
 
     def load_high_score(self):
-        try:
-            with open(HIGH_SCORE_PATH, "rb") as f:
-                crypted_high_score = f.read()
-                super().load_high_score(crypted_high_score)
-        except:
-            self.stats.high_score = 0
+        if self.store:
+            high_score = self.store.high_score(self.profile, self.game_mode)
+        else:
+            high_score = 0
+        if self.store and os.path.exists(HIGH_SCORE_PATH):
+            # Imports high score file of previous versions, marathon only
+            try:
+                with open(HIGH_SCORE_PATH, "rb") as f:
+                    super().load_high_score(f.read())
+                self.store.add_session(
+                    Session(
+                        self.profile,
+                        Mode.MARATHON,
+                        os.path.getmtime(HIGH_SCORE_PATH),
+                        0,
+                        self.stats.high_score,
+                        0,
+                        0,
+                    )
+                )
+                os.replace(HIGH_SCORE_PATH, HIGH_SCORE_PATH + ".old")
+                if self.game_mode == Mode.MARATHON:
+                    high_score = max(high_score, self.stats.high_score)
+            except Exception as e:
+                warnings.warn("High score file could not be imported: {}".format(e))
+        self.stats.high_score = high_score
 
     def save_high_score(self):
-        try:
-            if not os.path.exists(USER_PROFILE_DIR):
-                os.makedirs(USER_PROFILE_DIR)
-            with open(HIGH_SCORE_PATH, mode="wb") as f:
-                crypted_high_score = super().save_high_score()
-                f.write(crypted_high_score)
-        except Exception as e:
-            sys.exit(
-                """High score: {:n}
-High score could not be saved:
-""".format(
-                    self.high_score
-                )
-                + str(e)
-            )
+        """queue the game session in the store, written in background"""
+        if self.demo or self.session_start is None or not self.store:
+            return
+        self.store.add_session(session(self, self.profile, self.session_start))
+        self.session_start = None
+
+    def set_speed(self, speed):
+        """run all boards `speed` times faster than real time
+        Above 1, only the last state of each frame is drawn"""
+        self.speed = speed
 
     def update(self, delta_time):
-        for exploding_minoes in self.exploding_minoes:
-            if exploding_minoes:
-                exploding_minoes.update()
+        game_delay = min(delta_time, MAX_UPDATE_DELAY) * self.speed
+        for board in self.boards:
+            board.timer.advance(game_delay)
+            board.check_time_up()
+
+        start = time.perf_counter()
+        if self.hint_result:
+            hint_result, self.hint_result = self.hint_result, None
+            self.show_hint_result(*hint_result)
+        for board in self.boards:
+            board.animate()
+        if self.show_frame_stats:
+            # Frame times are measured on drawn frames only
+            self.set_dirty()
+        self.frame_stats.update += time.perf_counter() - start
 
     def on_close(self):
         self.save_high_score()
         if self.music:
             self.music.pause()
+        if self.hint_pool:
+            self.hint_pool.shutdown(wait=False, cancel_futures=True)
+        if self.store:
+            self.store.close()
+        if self.event_log:
+            self.event_log.close()
+        if self.positions:
+            self.positions.close()
+        if self.frame_stats_export:
+            try:
+                self.frame_stats.export(self.frame_stats_export)
+            except OSError as e:
+                warnings.warn("Frame stats could not be exported: {}".format(e))
         super().on_close()
 
 
@@ -685,4 +1360,5 @@ def main():
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""Null renderer: the part of arcade TetrArcade uses, drawing nothing
+
+    TETRARCADE_HEADLESS=1 python TetrArcade.py
+
+Imported as arcade in headless mode, on machines without display nor
+OpenGL (CI): windows, sprites, sprite lists and particle emitters keep
+their state and callbacks run, but draw calls do nothing. Needs neither
+arcade nor pyglet.
+"""
+
+
+import time
+import types
+
+
+KEY_NAMES = """
+BACKSPACE TAB LINEFEED CLEAR RETURN ENTER PAUSE SCROLLLOCK SYSREQ ESCAPE
+HOME LEFT UP RIGHT DOWN PAGEUP PAGEDOWN END BEGIN DELETE SELECT PRINT
+EXECUTE INSERT UNDO REDO MENU FIND CANCEL HELP BREAK MODESWITCH SCRIPTSWITCH
+NUMLOCK NUM_SPACE NUM_TAB NUM_ENTER NUM_F1 NUM_F2 NUM_F3 NUM_F4 NUM_HOME
+NUM_LEFT NUM_UP NUM_RIGHT NUM_DOWN NUM_PRIOR NUM_PAGE_UP NUM_NEXT
+NUM_PAGE_DOWN NUM_END NUM_BEGIN NUM_INSERT NUM_DELETE NUM_EQUAL NUM_MULTIPLY
+NUM_ADD NUM_SEPARATOR NUM_SUBTRACT NUM_DECIMAL NUM_DIVIDE NUM_0 NUM_1 NUM_2
+NUM_3 NUM_4 NUM_5 NUM_6 NUM_7 NUM_8 NUM_9 F1 F2 F3 F4 F5 F6 F7 F8 F9 F10 F11
+F12 F13 F14 F15 F16 LSHIFT RSHIFT LCTRL RCTRL CAPSLOCK LMETA RMETA LALT RALT
+LWINDOWS RWINDOWS LCOMMAND RCOMMAND LOPTION ROPTION SPACE EXCLAMATION
+DOUBLEQUOTE HASH POUND DOLLAR PERCENT AMPERSAND APOSTROPHE PARENLEFT
+PARENRIGHT ASTERISK PLUS COMMA MINUS PERIOD SLASH KEY_0 KEY_1 KEY_2 KEY_3
+KEY_4 KEY_5 KEY_6 KEY_7 KEY_8 KEY_9 COLON SEMICOLON LESS EQUAL GREATER
+QUESTION AT BRACKETLEFT BACKSLASH BRACKETRIGHT ASCIICIRCUM UNDERSCORE GRAVE
+QUOTELEFT A B C D E F G H I J K L M N O P Q R S T U V W X Y Z BRACELEFT BAR
+BRACERIGHT ASCIITILDE
+""".split()
+
+key = types.SimpleNamespace(**{name: n for n, name in enumerate(KEY_NAMES, 1)})
+color = types.SimpleNamespace(BUBBLES=(231, 254, 255))
+
+windows = []
+viewport = (0, 0, 0, 0)
+
+
+def set_background_color(color):
+    pass
+
+
+def set_viewport(left, right, bottom, top):
+    global viewport
+    viewport = (left, right, bottom, top)
+
+
+def get_viewport():
+    return viewport
+
+
+def start_render():
+    pass
+
+
+def draw_text(text, start_x, start_y, color, **kwargs):
+    pass
+
+
+def rand_in_rect(bottom_left, width, height):
+    return bottom_left
+
+
+def rand_on_line(pos1, pos2):
+    return pos1
+
+
+class Texture:
+    def __init__(self, name):
+        self.name = name
+
+
+def load_textures(file_name, image_location_list):
+    return [
+        Texture("{} {}".format(file_name, location))
+        for location in image_location_list
+    ]
+
+
+class Sprite:
+    """Position, scale, alpha and textures, without image: sprites are
+    0 wide and high"""
+
+    def __init__(self, filename=None):
+        self.filename = filename
+        self.textures = []
+        self.texture = None
+        self.sprite_lists = []
+        self.center_x = 0
+        self.center_y = 0
+        self.scale = 1
+        self.alpha = 255
+        self.width = 0
+        self.height = 0
+
+    def _get_left(self):
+        return self.center_x - self.width / 2
+
+    def _set_left(self, left):
+        self.center_x = left + self.width / 2
+
+    left = property(_get_left, _set_left)
+
+    def _get_bottom(self):
+        return self.center_y - self.height / 2
+
+    def _set_bottom(self, bottom):
+        self.center_y = bottom + self.height / 2
+
+    bottom = property(_get_bottom, _set_bottom)
+
+    def _get_top(self):
+        return self.center_y + self.height / 2
+
+    def _set_top(self, top):
+        self.center_y = top - self.height / 2
+
+    top = property(_get_top, _set_top)
+
+    def append_texture(self, texture):
+        self.textures.append(texture)
+
+    def set_texture(self, texture_no):
+        self.texture = self.textures[texture_no]
+
+    def remove_from_sprite_lists(self):
+        for sprite_list in list(self.sprite_lists):
+            sprite_list.remove(self)
+
+    def draw(self):
+        pass
+
+
+class SpriteList(list):
+    def append(self, sprite):
+        super().append(sprite)
+        sprite.sprite_lists.append(self)
+
+    def remove(self, sprite):
+        super().remove(sprite)
+        sprite.sprite_lists.remove(self)
+
+    def draw(self):
+        pass
+
+
+class EmitBurst:
+    def __init__(self, count):
+        self.count = count
+
+
+class LifetimeParticle:
+    def __init__(self, lifetime, **kwargs):
+        self.lifetime = lifetime
+
+
+class Emitter:
+    """Counts its particles, removed when their lifetime is out"""
+
+    def __init__(self, center_xy, emit_controller, particle_factory):
+        self.particles = [
+            particle_factory(self) for n in range(emit_controller.count)
+        ]
+        self.start = time.monotonic()
+
+    def update(self):
+        now = time.monotonic()
+        self.particles = [
+            particle
+            for particle in self.particles
+            if now - self.start < particle.lifetime
+        ]
+
+    def get_count(self):
+        return len(self.particles)
+
+    def draw(self):
+        pass
+
+
+class Window:
+    def __init__(
+        self,
+        width=800,
+        height=600,
+        title="",
+        resizable=False,
+        antialiasing=True,
+        fullscreen=False,
+    ):
+        self.width = width
+        self.height = height
+        self.title = title
+        self.fullscreen = fullscreen
+        self.update_rate = 1 / 60
+        self.closed = False
+        windows.append(self)
+
+    def set_update_rate(self, rate):
+        self.update_rate = rate
+
+    def set_minimum_size(self, width, height):
+        pass
+
+    def set_fullscreen(self, fullscreen=True):
+        self.fullscreen = fullscreen
+
+    def on_resize(self, width, height):
+        self.width = width
+        self.height = height
+
+    def on_close(self):
+        self.closed = True
+        if self in windows:
+            windows.remove(self)
+
+    def update(self, delta_time):
+        pass
+
+    def on_draw(self):
+        pass
+
+
+def run():
+    """update and draw the windows at their update rate until closed"""
+    last = time.monotonic()
+    while windows:
+        window = windows[0]
+        time.sleep(window.update_rate)
+        now = time.monotonic()
+        window.update(now - last)
+        window.on_draw()
+        last = now
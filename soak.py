@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+"""Soak test: plays games in a loop and fails if memory keeps growing
+
+    python soak.py --games 5000
+    python soak.py --gui --games 200
+
+Games are played on a virtual clock, by a random player on the engine
+only, or by the demo bot through the offscreen GUI (sprites, particles,
+highlight texts...).
+Every `--sample` games, after a garbage collection, the traced memory
+(tracemalloc), the number of live objects and the size of the structures
+that grow and shrink during play are sampled. The test fails if a value
+of the last third of the samples is above the first third by more than
+its tolerance.
+"""
+
+
+import os
+import gc
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+from collections import Counter
+
+from tetrislogic import Mino
+from tetrislogic.tetromino import TetrominoBase
+from tetrislogic.env import HeadlessTetrisLogic
+
+
+FRAME = 1 / 60
+MAX_FRAMES = 60 * 60  # per game, then a new game is started
+WARM_UP = 0.2  # part of the samples ignored
+
+# Absolute and relative growth tolerated between the first and last thirds
+MEMORY_TOLERANCE = (64 * 1024, 0.05)
+OBJECTS_TOLERANCE = (1000, 0.02)
+STRUCTURE_TOLERANCE = (16, 0.25)
+
+ACTIONS = (
+    "move_left",
+    "move_right",
+    "soft_drop",
+    "rotate_clockwise",
+    "rotate_counter",
+    "hold",
+)
+HARD_DROP_PROBABILITY = 0.1
+
+
+def random_action(game, rng):
+    if rng.random() < HARD_DROP_PROBABILITY:
+        return game.hard_drop
+    return getattr(game, rng.choice(ACTIONS))
+
+
+def live_entries(timer):
+    """entries of a VirtualScheduler queue not cancelled: cancelled ones
+    stay in the heap until they are due"""
+    return sum(1 for entry in timer.queue if entry[2] is not None)
+
+
+def count_objects():
+    counts = Counter()
+    for obj in gc.get_objects():
+        if isinstance(obj, Mino):
+            counts["Mino"] += 1
+        elif isinstance(obj, TetrominoBase):
+            counts["Tetromino"] += 1
+        counts["objects"] += 1
+    return counts
+
+
+class LogicSoak:
+    """Engine only games"""
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.game = HeadlessTetrisLogic()
+
+    def play(self, seed):
+        game = self.game
+        game.new_game(seed=seed)
+        for frame in range(MAX_FRAMES):
+            action = random_action(game, self.rng)
+            game.do_action(action)
+            game.remove_action(action)
+            if game.over:
+                break
+            game.timer.advance(FRAME)
+            game.events.dispatch()
+
+    def structures(self):
+        game = self.game
+        return {
+            "scheduler tasks": len(game.timer.tasks),
+            "scheduler queue": live_entries(game.timer),
+            "events queue": len(game.events.queue),
+            "pressed actions": len(game.pressed_actions),
+        }
+
+
+class GUISoak:
+    """Offscreen TetrArcade demo games, boards game clocks advanced frame by frame"""
+
+    def __init__(self):
+        os.environ.setdefault("TETRARCADE_HEADLESS", "1")
+        from TetrArcade import TetrArcade
+
+        self.window = TetrArcade()
+
+    def play(self, seed):
+        from TetrArcade import State
+
+        window = self.window
+        window.start_demo()
+        for frame in range(MAX_FRAMES):
+            if window.state != State.PLAYING:
+                break
+            self.frame()
+        else:
+            window.stop_demo()
+        # Let highlight texts and explosions end
+        for frame in range(int(1 / FRAME)):
+            self.frame()
+        window.timer.cancel(window.start_demo)
+
+    def frame(self):
+        self.window.update(FRAME)
+        self.window.on_draw()
+
+    def structures(self):
+        window = self.window
+        sizes = {
+            "minoes sprites": len(window.minoes),
+            "matrix backgrounds": len(window.matrix_bgs),
+            "events queue": len(window.events.queue),
+        }
+        for n, board in enumerate(window.boards):
+            sizes["board {} scheduler tasks".format(n)] = len(board.timer.tasks)
+            sizes["board {} scheduler queue".format(n)] = live_entries(board.timer)
+            sizes["board {} highlight texts".format(n)] = len(board.highlight_texts)
+            sizes["board {} emitters".format(n)] = sum(
+                1 for emitter in board.exploding_minoes if emitter
+            )
+        return sizes
+
+
+def sample(soak):
+    gc.collect()
+    values = {"traced memory": tracemalloc.get_traced_memory()[0]}
+    values.update(count_objects())
+    values.update(soak.structures())
+    return values
+
+
+def tolerance(name):
+    if name == "traced memory":
+        return MEMORY_TOLERANCE
+    if name in ("objects", "Mino", "Tetromino"):
+        return OBJECTS_TOLERANCE
+    return STRUCTURE_TOLERANCE
+
+
+def trends(samples):
+    """(name, first third mean, last third mean, leaking) of each value"""
+    samples = samples[int(len(samples) * WARM_UP) :]
+    third = max(1, len(samples) // 3)
+    results = []
+    for name in samples[0]:
+        first = sum(s.get(name, 0) for s in samples[:third]) / third
+        last = sum(s.get(name, 0) for s in samples[-third:]) / third
+        absolute, relative = tolerance(name)
+        results.append(
+            (name, first, last, last - first > max(absolute, relative * first))
+        )
+    return results
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--games", type=int, default=2000)
+    parser.add_argument("--sample", type=int, default=50, help="games between samples")
+    parser.add_argument("--gui", action="store_true", help="demo games of TetrArcade")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(args)
+
+    rng = random.Random(args.seed)
+    soak = GUISoak() if args.gui else LogicSoak(rng)
+    tracemalloc.start()
+    start = time.perf_counter()
+    samples = []
+    for n in range(args.games):
+        soak.play(args.seed + n)
+        if n % args.sample == args.sample - 1:
+            samples.append(sample(soak))
+            print(
+                "{:>8} games {:>10.0f} s {:>12} B {:>10} objects".format(
+                    n + 1,
+                    time.perf_counter() - start,
+                    samples[-1]["traced memory"],
+                    samples[-1]["objects"],
+                ),
+                flush=True,
+            )
+    tracemalloc.stop()
+
+    if len(samples) < 3:
+        sys.exit("Not enough samples: play more games or sample more often")
+    leaks = 0
+    print("\n{:<32}{:>14}{:>14}".format("", "FIRST", "LAST"))
+    for name, first, last, leaking in trends(samples):
+        leaks += leaking
+        print(
+            "{:<32}{:>14.0f}{:>14.0f}{}".format(
+                name, first, last, "  LEAK" if leaking else ""
+            )
+        )
+    return 1 if leaks else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
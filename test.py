@@ -1,15 +1,20 @@
 # -*- coding: utf-8 -*-
+import os
+import time
+
+# Runs offscreen unless TETRARCADE_HEADLESS is explicitly set to ""
+os.environ.setdefault("TETRARCADE_HEADLESS", "1")
 
 from TetrArcade import TetrArcade, MinoSprite, State
 from tetrislogic import Mino, Color, Coord
 
+start = time.perf_counter()
 game = TetrArcade()
 game.new_game()
 for x in range(game.matrix.collumns):
     mino = Mino(Color.ORANGE, Coord(x, 0))
     mino.sprite = MinoSprite(mino, game, 200)
     game.matrix[0][x] = mino
-    game.matrix.sprites.append(mino.sprite)
 game.move_left()
 game.pause()
 game.resume()
@@ -21,6 +26,8 @@ game.rotate_clockwise()
 game.hold()
 game.update(0)
 game.on_draw()
+game.on_resize(1024, 768)
+game.on_draw()
 game.rotate_counter()
 for i in range(22):
     game.soft_drop()
@@ -32,3 +39,7 @@ game.on_draw()
 while game.state != State.OVER:
     game.hard_drop()
 game.on_draw()
+for i in range(60):
+    game.update(1 / 60)
+    game.on_draw()
+print("Test run in {:.3f} s".format(time.perf_counter() - start))
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""Gym-style environment: a seed replays a game, the board is a view
+
+    python -m pytest test_env.py
+"""
+
+
+import random
+
+import numpy as np
+
+from tetrislogic.env import TetrisEnv, ACTIONS
+
+
+def rollout(env, seed, nb_steps=500):
+    """observations and rewards of random actions after reset(seed)"""
+    rng = random.Random(0)
+    observation, info = env.reset(seed=seed)
+    trajectory = [(observation["matrix"].copy(), observation["next"], info)]
+    for step in range(nb_steps):
+        observation, reward, done, info = env.step(rng.randrange(len(ACTIONS)))
+        trajectory.append(
+            (observation["matrix"].copy(), observation["piece"], reward, info)
+        )
+        if done:
+            break
+    return trajectory
+
+
+def same(trajectory1, trajectory2):
+    assert len(trajectory1) == len(trajectory2)
+    for step1, step2 in zip(trajectory1, trajectory2):
+        assert np.array_equal(step1[0], step2[0])
+        assert step1[1:] == step2[1:]
+
+
+def test_same_seed_same_game():
+    env = TetrisEnv()
+    same(rollout(env, 42), rollout(TetrisEnv(), 42))
+    # and again on a reused env
+    same(rollout(env, 42), rollout(env, 42))
+
+
+def test_other_seed_other_pieces():
+    env = TetrisEnv()
+    sequences = set()
+    for seed in range(10):
+        observation, info = env.reset(seed=seed)
+        sequences.add(observation["next"])
+    assert len(sequences) > 1
+
+
+def test_board_is_a_view_of_the_engine_cells():
+    env = TetrisEnv()
+    observation, info = env.reset(seed=1)
+    board = observation["matrix"]
+    assert not board.any()
+    assert not board.flags.owndata
+    observation, reward, done, info = env.step("hard_drop")
+    assert observation["matrix"] is board
+    assert np.count_nonzero(board) == 4
+
+
+if __name__ == "__main__":
+    test_same_seed_same_game()
+    test_other_seed_other_pieces()
+    test_board_is_a_view_of_the_engine_cells()
+    print("Environment tests passed")
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""Event log: records reach the gzip files, write errors don't stop it
+
+    python -m pytest test_eventlog.py
+"""
+
+
+import os
+import gzip
+import json
+import tempfile
+import warnings
+
+from tetrislogic.env import HeadlessTetrisLogic
+from tetrislogic.eventlog import EventLog
+
+
+def logged_events(directory):
+    events = []
+    for name in sorted(os.listdir(directory)):
+        with gzip.open(os.path.join(directory, name), "rt") as f:
+            events.extend(json.loads(line)["event"] for line in f)
+    return events
+
+
+def test_events_are_logged():
+    with tempfile.TemporaryDirectory() as directory:
+        game = HeadlessTetrisLogic()
+        log = EventLog(game, directory)
+        game.new_game(seed=0)
+        game.hard_drop()
+        game.events.dispatch()
+        log.close()
+        events = logged_events(directory)
+        assert events[0] == "NewGame"
+        assert "LocksDown" in events
+
+
+def test_write_errors_are_recorded():
+    with tempfile.TemporaryDirectory() as directory:
+        game = HeadlessTetrisLogic()
+        # The writer thread only wakes up on close
+        log = EventLog(game, directory, flush_period=3600)
+        write = log.write
+
+        def disk_full(text):
+            raise OSError(28, "No space left on device")
+
+        log.write = disk_full
+        game.new_game(seed=0)
+        game.events.dispatch()
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            log.try_write_batch()
+        assert isinstance(log.last_error, OSError)
+        assert log.writer.is_alive()
+
+        log.write = write
+        game.hard_drop()
+        game.events.dispatch()
+        log.close()
+        assert "LocksDown" in logged_events(directory)
+
+
+if __name__ == "__main__":
+    test_events_are_logged()
+    test_write_errors_are_recorded()
+    print("Event log tests passed")
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""Event bus: subscribers get the events they want, in order, on dispatch
+
+    python -m pytest test_events.py
+"""
+
+
+from tetrislogic import TetrisLogic, AbstractScheduler
+from tetrislogic.events import (
+    EventBus,
+    NewGame,
+    GenerationPhase,
+    LocksDown,
+    CompletionPhase,
+    Hold,
+)
+
+
+class NoTimer(AbstractScheduler):
+    """pieces only move and lock down on actions"""
+
+    def postpone(self, task, delay):
+        pass
+
+    def cancel(self, task):
+        pass
+
+    def reset(self, task, delay):
+        pass
+
+
+class Game(TetrisLogic):
+
+    timer = NoTimer()
+
+    def load_high_score(self):
+        self.stats.high_score = 0
+
+    def show_text(self, text):
+        pass
+
+
+def test_only_wanted_events_are_queued():
+    game = Game()
+    game.new_game()
+    assert game.events.queue == []
+
+    game.events.subscribe(lambda events: None, LocksDown)
+    game.hard_drop()
+    assert {type(event) for event in game.events.queue} == {LocksDown}
+
+
+def test_batches_in_publication_order():
+    game = Game()
+    pieces = []
+    phases = []
+    game.events.subscribe(pieces.extend, GenerationPhase, LocksDown)
+    game.events.subscribe(phases.extend, NewGame, CompletionPhase, Hold)
+    game.new_game()
+    game.hold()
+    game.hard_drop()
+    assert pieces == []
+    game.events.dispatch()
+    assert [type(event) for event in pieces] == [
+        GenerationPhase,
+        GenerationPhase,
+        LocksDown,
+        GenerationPhase,
+    ]
+    assert [type(event) for event in phases] == [NewGame, Hold, CompletionPhase]
+    assert game.events.queue == []
+
+
+def test_unsubscribe():
+    bus = EventBus()
+    batches = []
+    bus.subscribe(batches.append, Hold)
+    bus.publish(Hold(None))
+    bus.dispatch()
+    bus.unsubscribe(batches.append)
+    assert bus.wanted == set()
+    bus.publish(Hold(None))
+    bus.dispatch()
+    assert batches == [[Hold(None)]]
+
+
+if __name__ == "__main__":
+    test_only_wanted_events_are_queued()
+    test_batches_in_publication_order()
+    test_unsubscribe()
+    print("Event bus tests passed")
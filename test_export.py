@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""Training data export: chunks are written full, and the last one on close
+
+    python -m pytest test_export.py
+"""
+
+
+import os
+import tempfile
+
+import numpy as np
+
+from tetrislogic import TetrisLogic, AbstractScheduler
+from tetrislogic.events import CompletionPhase
+from tetrislogic.export import Exporter, chunk_writer, schema
+
+
+class NoTimer(AbstractScheduler):
+    """pieces only move and lock down on actions"""
+
+    def postpone(self, task, delay):
+        pass
+
+    def cancel(self, task):
+        pass
+
+    def reset(self, task, delay):
+        pass
+
+
+class Game(TetrisLogic):
+
+    timer = NoTimer()
+
+    def load_high_score(self):
+        self.stats.high_score = 0
+
+    def show_text(self, text):
+        pass
+
+
+def chunks(directory):
+    return [
+        np.load(os.path.join(directory, name)) for name in sorted(os.listdir(directory))
+    ]
+
+
+def test_last_partial_chunk_is_written_on_close():
+    columns = schema()
+    with tempfile.TemporaryDirectory() as directory:
+        writer = chunk_writer(directory, columns, chunk_size=4)
+        next(writer)
+        for n in range(10):
+            record = {
+                name: np.full(shape, n, dtype)
+                for name, (dtype, shape) in columns.items()
+            }
+            writer.send(record)
+        assert len(os.listdir(directory)) == 2
+        writer.close()
+        written = chunks(directory)
+        assert [len(chunk["piece"]) for chunk in written] == [4, 4, 2]
+        assert list(np.concatenate([chunk["x"] for chunk in written])) == list(
+            range(10)
+        )
+
+
+def test_live_game_export():
+    with tempfile.TemporaryDirectory() as directory:
+        game = Game()
+        exporter = Exporter(game, directory, chunk_size=16)
+        completions = []
+        game.events.subscribe(completions.extend, CompletionPhase)
+        game.new_game()
+        nb_pieces = 0
+        while not game.over:
+            game.hard_drop()
+            nb_pieces += 1
+            game.events.dispatch()
+        exporter.close()
+        written = chunks(directory)
+        # One record per piece completed, a last piece locking out has none
+        assert sum(len(chunk["piece"]) for chunk in written) == len(completions)
+        assert len(completions) >= nb_pieces - 1
+
+
+if __name__ == "__main__":
+    test_last_partial_chunk_is_written_on_close()
+    test_live_game_export()
+    print("Export tests passed")
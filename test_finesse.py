@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""Finesse table: fewest inputs of each placement, cached on disk
+
+    python -m pytest test_finesse.py
+"""
+
+
+import os
+import tempfile
+
+from tetrislogic.consts import LINES
+from tetrislogic.tetromino import Tetromino
+from tetrislogic.positions import Position
+from tetrislogic.env import HeadlessTetrisLogic
+from tetrislogic.finesse import (
+    FinesseTable,
+    OpenBoardLogic,
+    footprint,
+    press,
+    PREFIX,
+    EXTENSION,
+)
+
+
+table = None
+
+
+def open_board_table():
+    global table
+    if table is None:
+        table = FinesseTable.generate(LINES)
+    return table
+
+
+def test_all_placements():
+    placements = open_board_table().placements
+    counts = {}
+    for name, left, cells in placements:
+        counts[name] = counts.get(name, 0) + 1
+    assert counts == {
+        "O_Tetrimino": 9,
+        "I_Tetrimino": 17,
+        "S_Tetrimino": 17,
+        "Z_Tetrimino": 17,
+        "T_Tetrimino": 34,
+        "L_Tetrimino": 34,
+        "J_Tetrimino": 34,
+    }
+    assert max(len(inputs) for inputs in placements.values()) <= 4
+
+
+def test_inputs_reach_their_placement():
+    game = OpenBoardLogic(LINES)
+    for (name, left, cells), inputs in open_board_table().placements.items():
+        shape = [shape.__name__ for shape in Tetromino.shapes].index(name)
+        game.new_game(position=Position("", (), shape, None, ()))
+        for input_name in inputs:
+            press(game, input_name)
+        assert footprint(game.matrix.piece) == (left, cells), inputs
+
+
+def test_faults():
+    table = open_board_table()
+    game = HeadlessTetrisLogic()
+    game.new_game(seed=0)
+    piece = game.matrix.piece
+    assert table.optimal(piece) == ()
+    assert table.faults(piece, ["move_left", "move_right", "hard_drop"]) == 2
+    game.move_left()
+    assert table.optimal(piece) == ("left",)
+    assert table.faults(piece, ["move_left"]) == 0
+    assert table.faults(piece, ["rotate_clockwise"] * 4 + ["move_left"]) == 4
+
+
+def test_cache():
+    game = HeadlessTetrisLogic()
+    with tempfile.TemporaryDirectory() as directory:
+        generated = FinesseTable.for_game(game, directory)
+        (file_name,) = os.listdir(directory)
+        assert file_name.startswith(PREFIX) and file_name.endswith(EXTENSION)
+        assert generated.placements == open_board_table().placements
+        assert FinesseTable.for_game(game, directory).placements == table.placements
+
+        # Unreadable cache is generated again
+        path = os.path.join(directory, file_name)
+        with open(path, "w") as f:
+            f.write("{")
+        assert FinesseTable.for_game(game, directory).placements == table.placements
+        assert FinesseTable.load(path).placements == table.placements
+
+
+if __name__ == "__main__":
+    test_all_placements()
+    test_inputs_reach_their_placement()
+    test_faults()
+    test_cache()
+    print("Finesse tests passed")
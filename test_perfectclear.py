@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""Perfect clear solver: solutions played on a game empty its matrix
+
+    python -m pytest test_perfectclear.py
+"""
+
+
+from tetrislogic.utils import Color, Coord
+from tetrislogic.tetromino import Mino
+from tetrislogic.env import HeadlessTetrisLogic, FRAME, play
+from tetrislogic.bot import Bot, snapshot
+from tetrislogic.perfectclear import perfect_clear, PerfectClearSolver
+
+
+def game_with_well(seed, width, height=4):
+    """`height` full lines but `width` collumns on the right"""
+    game = HeadlessTetrisLogic()
+    game.new_game(seed=seed)
+    for y in range(height):
+        for x in range(game.matrix.collumns - width):
+            game.matrix[y][x] = Mino(Color.GARBAGE, Coord(x, y))
+    return game
+
+
+def play_solution(game, placements):
+    driver = Bot(game)
+    for placement in placements:
+        while game.matrix.piece is None:
+            game.timer.advance(FRAME)
+        play(game, driver, placement)
+
+
+def test_solutions_clear_the_matrix():
+    nb_solved = 0
+    for seed in range(20):
+        game = game_with_well(seed, 4)
+        solution = perfect_clear(game)
+        if solution is None:
+            continue
+        nb_solved += 1
+        height, placements = solution
+        assert height == 4
+        assert len(placements) == 4
+        play_solution(game, placements)
+        assert not any(game.matrix.cells)
+        assert game.stats.lines_cleared == 4
+    assert nb_solved
+
+
+def test_no_solution():
+    # 6 free cells: not a whole number of pieces for 2 lines
+    game = game_with_well(0, 3, 2)
+    assert perfect_clear(game, max_height=2) is None
+
+
+def test_solver_pool():
+    solver = PerfectClearSolver(workers=2)
+    try:
+        for seed in range(5):
+            game = game_with_well(seed, 4)
+            solution = perfect_clear(game)
+            pool_solution = solver.solve(*snapshot(game), game.matrix.collumns)
+            if solution is None:
+                assert pool_solution is None
+            else:
+                assert pool_solution[0] == solution[0]
+                play_solution(game, pool_solution[1])
+                assert not any(game.matrix.cells)
+    finally:
+        solver.close()
+
+
+if __name__ == "__main__":
+    test_solutions_clear_the_matrix()
+    test_no_solution()
+    test_solver_pool()
+    print("Perfect clear tests passed")
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""Replay files: seeking to a keyframe then playing ends the game as recorded
+
+    python -m pytest test_replay.py
+"""
+
+
+import os
+import random
+import tempfile
+
+from tetrislogic.env import HeadlessTetrisLogic, ACTIONS
+from tetrislogic.replay import RecordingLogic, Replay
+
+
+GAMES = 60
+KEYFRAME_PERIOD = 7
+
+
+class RecordedLogic(RecordingLogic, HeadlessTetrisLogic):
+    pass
+
+
+def record(path, seed):
+    """random game, holds and rotations included, recorded to `path`"""
+    rng = random.Random(seed)
+    game = RecordedLogic()
+    game.record(path, KEYFRAME_PERIOD)
+    game.new_game(seed=seed)
+    while not game.over:
+        action = getattr(game, rng.choice(ACTIONS))
+        game.do_action(action)
+        if rng.random() < 0.8:
+            game.remove_action(action)
+        game.timer.advance(rng.choice((0, 1 / 60, 0.1, 0.5)))
+        if game.timer.now > 600:
+            game.game_over()
+
+
+def result(game):
+    return game.stats.score, game.stats.lines_cleared
+
+
+def test_seek_then_play_matches_full_replay():
+    with tempfile.TemporaryDirectory() as directory:
+        for n in range(GAMES):
+            path = os.path.join(directory, "{}.replay".format(n))
+            record(path, n)
+            with Replay(path) as replay:
+                game, offset = replay.new_game()
+                replay.play(game, offset)
+                full = result(game)
+                assert full == (replay.score, replay.lines_cleared), n
+                for keyframe in range(replay.nb_keyframes):
+                    game, offset = replay.game_at(keyframe * KEYFRAME_PERIOD)
+                    replay.play(game, offset)
+                    assert result(game) == full, (n, keyframe)
+
+
+if __name__ == "__main__":
+    test_seek_then_play_matches_full_replay()
+    print("Replay seek test passed")
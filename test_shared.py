@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""Shared memory: agents read the engine state and play through the ring
+
+    python -m pytest test_shared.py
+"""
+
+
+import random
+
+import pytest
+
+from tetrislogic import TetrisLogic, BufferedMatrix, AbstractScheduler
+from tetrislogic.stream import cell_value, piece_pose
+from tetrislogic.shared import SharedState, SharedStateClient, ACTIONS
+
+
+class NoTimer(AbstractScheduler):
+    """pieces only move and lock down on actions"""
+
+    def postpone(self, task, delay):
+        pass
+
+    def cancel(self, task):
+        pass
+
+    def reset(self, task, delay):
+        pass
+
+
+class Game(TetrisLogic):
+
+    MATRIX_CLASS = BufferedMatrix
+    timer = NoTimer()
+
+    def load_high_score(self):
+        self.stats.high_score = 0
+
+    def show_text(self, text):
+        pass
+
+
+def engine_cells(game):
+    return bytes(cell_value(mino) for line in game.matrix for mino in line)
+
+
+def test_round_trip():
+    game = Game()
+    state = SharedState(game, ring_size=16)
+    client = SharedStateClient(state.name)
+    try:
+        rng = random.Random(0)
+        game.new_game()
+        game.events.dispatch()
+        while not game.over:
+            for n in range(rng.randrange(1, 6)):
+                assert client.send(rng.choice(ACTIONS))
+            assert state.play_actions() >= 0
+            game.events.dispatch()
+            seq, cells, pose, held, next_pieces, stats = client.read()
+            assert seq == state.seq and seq % 2 == 0
+            assert cells == engine_cells(game)
+            assert pose == piece_pose(game.matrix.piece)
+            assert stats["score"] == game.stats.score
+        # Actions sent after game over are dropped
+        client.send("hard_drop")
+        assert state.play_actions() == 0
+    finally:
+        client.close()
+        state.close()
+    # The game keeps its cells once unpublished
+    assert bytes(game.matrix.cells) == engine_cells(game)
+
+
+def test_matrix_writes_make_seq_odd():
+    game = Game()
+    state = SharedState(game)
+    client = SharedStateClient(state.name)
+    try:
+        game.new_game()
+        game.events.dispatch()
+        assert client.seq % 2 == 0
+        game.hard_drop()
+        assert client.seq % 2 == 1
+        game.events.dispatch()
+        assert client.seq % 2 == 0
+    finally:
+        client.close()
+        state.close()
+
+
+def test_invalid_action_codes_are_skipped():
+    game = Game()
+    state = SharedState(game, ring_size=4)
+    client = SharedStateClient(state.name)
+    try:
+        game.new_game()
+        layout = client.layout
+        client.send("move_left")
+        client.buf[layout.ring + 1] = 200
+        client.buf[layout.ring_indexes] = 2
+        assert state.play_actions() == 1
+        assert state.invalid_actions == 1
+    finally:
+        client.close()
+        state.close()
+
+
+def test_ring_size_is_a_power_of_2():
+    with pytest.raises(ValueError):
+        SharedState(Game(), ring_size=100)
+
+
+if __name__ == "__main__":
+    test_round_trip()
+    test_matrix_writes_make_seq_odd()
+    test_invalid_action_codes_are_skipped()
+    test_ring_size_is_a_power_of_2()
+    print("Shared memory tests passed")
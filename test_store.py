@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""Score store: sessions written in background, high scores and leaderboards
+
+    python -m pytest test_store.py
+"""
+
+
+import os
+import tempfile
+import warnings
+
+from tetrislogic.utils import Mode
+from tetrislogic.store import Store, Session
+
+
+def sessions():
+    return [
+        Session("ALICE", Mode.MARATHON, 1.0, 300.0, 12000, 40, 5),
+        Session("BOB", Mode.MARATHON, 2.0, 200.0, 8000, 30, 4),
+        Session("ALICE", Mode.MARATHON, 3.0, 100.0, 3000, 10, 2),
+        Session("ALICE", Mode.SPRINT, 4.0, 90.0, 5000, 40, 4),
+        Session("BOB", Mode.SPRINT, 5.0, 80.0, 4000, 40, 4),
+        Session("CAROL", Mode.SPRINT, 6.0, 30.0, 1000, 12, 2),
+    ]
+
+
+def test_sessions_are_written_in_batches():
+    with tempfile.TemporaryDirectory() as directory:
+        store = Store(os.path.join(directory, "scores.sqlite"), batch_size=2)
+        store.add_session(sessions()[0])
+        store.add_sessions(sessions()[1:])
+        store.add_sessions([])
+        store.flush()
+        assert store.last_error is None
+        assert store.profiles() == ["ALICE", "BOB", "CAROL"]
+        assert store.high_score("ALICE") == 12000
+        assert store.high_score("BOB", Mode.SPRINT) == 4000
+        assert store.high_score("DAVE") == 0
+        assert [s.score for s in store.leaderboard(limit=2)] == [12000, 8000]
+        # Completed sprints, fastest first
+        assert [s.profile for s in store.leaderboard(Mode.SPRINT)] == ["BOB", "ALICE"]
+        assert [s.started for s in store.sessions("ALICE")] == [1.0, 3.0, 4.0]
+        store.close()
+
+        # Written to disk
+        store = Store(os.path.join(directory, "scores.sqlite"))
+        assert len(store.sessions("ALICE")) == 3
+        store.close()
+
+
+def test_writer_survives_errors():
+    with tempfile.TemporaryDirectory() as directory:
+        store = Store(os.path.join(directory, "scores.sqlite"))
+        with warnings.catch_warnings(record=True):
+            warnings.simplefilter("always")
+            store.add_session(Session(["not", "a", "name"], *sessions()[0][1:]))
+            store.flush()
+        assert store.last_error is not None
+        store.add_session(sessions()[0])
+        store.flush()
+        assert store.high_score("ALICE") == 12000
+        store.close()
+
+
+if __name__ == "__main__":
+    test_sessions_are_written_in_batches()
+    test_writer_survives_errors()
+    print("Store tests passed")
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""State stream: a spectator mirror follows the game from its packets
+
+    python -m pytest test_stream.py
+"""
+
+
+import random
+
+from tetrislogic import AbstractScheduler, Mino, Color, Coord
+from tetrislogic.stream import (
+    StreamingLogic,
+    StateMirror,
+    cell_value,
+    piece_pose,
+    shape_id,
+)
+
+
+ACTIONS = (
+    "move_left",
+    "move_right",
+    "soft_drop",
+    "hard_drop",
+    "rotate_clockwise",
+    "rotate_counter",
+    "hold",
+)
+
+
+class NoTimer(AbstractScheduler):
+    """pieces only move and lock down on actions"""
+
+    def postpone(self, task, delay):
+        pass
+
+    def cancel(self, task):
+        pass
+
+    def reset(self, task, delay):
+        pass
+
+
+class StreamedLogic(StreamingLogic):
+
+    timer = NoTimer()
+
+    def load_high_score(self):
+        self.stats.high_score = 0
+
+    def show_text(self, text):
+        pass
+
+    def on_game_over(self):
+        super().on_game_over()
+        self.ended = True
+
+
+def check(mirror, game):
+    assert mirror.matrix == [
+        [cell_value(mino) for mino in line] for line in game.matrix
+    ]
+    assert mirror.pose == piece_pose(game.matrix.piece)
+    assert mirror.held == shape_id(game.held.piece)
+    assert mirror.next == [shape_id(piece) for piece in game.next.pieces]
+    assert mirror.stats["score"] == game.stats.score
+    assert mirror.stats["lines_cleared"] == game.stats.lines_cleared
+
+
+def test_mirrors_follow_the_game():
+    rng = random.Random(0)
+    game = StreamedLogic()
+    game.ended = False
+    game.new_game()
+    mirror = StateMirror()
+    late_mirror = None
+    for tick in range(2000):
+        if game.ended:
+            break
+        getattr(game, rng.choice(ACTIONS))()
+        packet = game.stream.tick()
+        if packet:
+            mirror.apply(packet)
+            if late_mirror:
+                late_mirror.apply(packet)
+        if tick == 50:
+            late_mirror = StateMirror()
+            late_mirror.apply(game.stream.join())
+        check(mirror, game)
+        if late_mirror:
+            check(late_mirror, game)
+    assert late_mirror
+
+
+def test_mirror_clears_lines():
+    game = StreamedLogic()
+    game.ended = False
+    game.new_game()
+    # Fill line 0 but the cells the falling piece lands on
+    ghost = game.matrix.ghost
+    covered = {
+        ghost.coord.x + mino.coord.x
+        for mino in ghost
+        if ghost.coord.y + mino.coord.y == 0
+    }
+    for x in range(game.matrix.collumns):
+        if x not in covered:
+            game.matrix[0][x] = Mino(Color.ORANGE, Coord(x, 0))
+    game.stream.reset()
+    mirror = StateMirror()
+    mirror.apply(game.stream.tick())
+    game.hard_drop()
+    mirror.apply(game.stream.tick())
+    assert game.stats.lines_cleared == 1
+    check(mirror, game)
+
+
+if __name__ == "__main__":
+    test_mirrors_follow_the_game()
+    test_mirror_clears_lines()
+    print("State stream test passed")
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""Versus: attacks, garbage lines and matches between two policies
+
+    python -m pytest test_versus.py
+"""
+
+
+from tetrislogic.utils import Color, T_Spin
+from tetrislogic.env import HeadlessTetrisLogic
+from tetrislogic.stream import StreamingLogic, StateMirror, cell_value
+from tetrislogic.versus import Match, BotPolicy
+
+
+GARBAGE_CELL = Color.GARBAGE + 1
+
+
+class StreamedLogic(StreamingLogic, HeadlessTetrisLogic):
+    pass
+
+
+def test_attacks():
+    game = HeadlessTetrisLogic()
+    game.new_game(seed=0)
+    stats = game.stats
+    stats.combo = 0
+    assert stats.attack(T_Spin.NONE, 0) == 0
+    assert stats.attack(T_Spin.NONE, 1) == 0
+    assert stats.attack(T_Spin.NONE, 4) == 4
+    # Back-to-back Tetris
+    assert stats.attack(T_Spin.NONE, 4) == 5
+    assert stats.attack(T_Spin.T_SPIN, 2) == 5
+    # A single breaks back-to-back
+    assert stats.attack(T_Spin.NONE, 1) == 0
+    assert stats.attack(T_Spin.T_SPIN, 2) == 4
+    stats.combo = 2
+    assert stats.attack(T_Spin.NONE, 1) == 1
+
+
+def test_garbage_is_inserted_after_a_lock_down_without_clear():
+    game = HeadlessTetrisLogic()
+    game.new_game(seed=0)
+    game.receive_garbage(0)
+    assert game.garbage == []
+    game.receive_garbage(2)
+    game.receive_garbage(1)
+    game.hard_drop()
+    assert game.garbage == []
+    cells = bytes(game.matrix.cells)
+    collumns = game.matrix.collumns
+    for y in range(3):
+        line = cells[y * collumns : (y + 1) * collumns]
+        assert line.count(0) == 1
+        assert line.count(GARBAGE_CELL) == collumns - 1
+    # The dropped piece is pushed up above the garbage
+    assert len(cells[3 * collumns :].replace(b"\0", b"")) == 4
+    assert bytes(cell_value(mino) for line in game.matrix for mino in line) == cells
+
+
+def test_too_much_garbage_ends_the_game():
+    game = HeadlessTetrisLogic()
+    game.new_game(seed=0)
+    game.hard_drop()
+    game.receive_garbage(len(game.matrix))
+    game.hard_drop()
+    assert game.over
+
+
+def test_mirror_receives_garbage():
+    game = StreamedLogic()
+    game.new_game(seed=3)
+    mirror = StateMirror()
+    mirror.apply(game.stream.join())
+    for nb_lines in (1, 3, 2):
+        game.receive_garbage(nb_lines)
+        game.hard_drop()
+        mirror.apply(game.stream.tick())
+        assert mirror.matrix == [
+            [cell_value(mino) for mino in line] for line in game.matrix
+        ]
+
+
+def test_match():
+    match = Match(BotPolicy(), BotPolicy(beam_width=2), max_time=5)
+    result = match.play(seed=1)
+    assert result.winner in (0, 1, None)
+    assert result.time < 5 + match.frame
+    assert result.scores == tuple(game.stats.score for game in match.games)
+    assert result.lines_sent == tuple(game.stats.lines_sent for game in match.games)
+    if result.winner is not None:
+        assert match.games[1 - result.winner].over
+
+
+if __name__ == "__main__":
+    test_attacks()
+    test_garbage_is_inserted_after_a_lock_down_without_clear()
+    test_too_much_garbage_ends_the_game()
+    test_mirror_receives_garbage()
+    test_match()
+    print("Versus tests passed")
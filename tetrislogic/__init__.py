@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 from .consts import LINES, COLLUMNS, NEXT_PIECES
-from .utils import Movement, Spin, Color, Coord
+from .utils import Movement, Spin, Color, Coord, Mode
 from .tetromino import (
     Mino,
     Tetromino,
@@ -12,4 +12,11 @@ from .tetromino import (
     T_Tetrimino,
     Z_Tetrimino,
 )
-from .tetrislogic import TetrisLogic, Matrix, AbstractScheduler
+from .tetrislogic import (
+    TetrisLogic,
+    Matrix,
+    BufferedMatrix,
+    AbstractScheduler,
+    VirtualScheduler,
+)
+from .events import EventBus
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""Replay archives verification and analytics
+
+    python -m tetrislogic.archive replays/ [--workers 8]
+
+Each replay of the directory (and its subdirectories) is simulated again
+from its seed and actions on a process pool, and its final score and
+lines checked against the recorded ones: a leaderboard entry whose replay
+does not give its score is not valid.
+
+Files are listed and results aggregated as they come, with a bounded
+number of replays in flight, so memory does not grow with the archive.
+"""
+
+
+import os
+import sys
+import struct
+import argparse
+import concurrent.futures
+from collections import namedtuple, Counter
+
+from .env import HeadlessTetrisLogic
+from .replay import Replay
+
+
+EXTENSION = ".replay"
+IN_FLIGHT = 4  # replays queued per worker
+
+Verification = namedtuple(
+    "Verification",
+    "path valid error mode level recorded score lines time pieces clears level_times",
+)
+
+
+class AnalyzedLogic(HeadlessTetrisLogic):
+    """HeadlessTetrisLogic counting line clear types and timing levels"""
+
+    def on_new_game(self, matrix, next_pieces):
+        self.pieces = 0
+        self.clears = Counter()
+        self.level_times = []
+
+    def on_new_level(self, level):
+        self.level_times.append(self.stats.time)
+
+    def on_completion_phase(self, pattern_name, pattern_score, nb_combo, combo_score):
+        self.pieces += 1
+        if pattern_name:
+            self.clears[pattern_name.replace("\n", " ")] += 1
+
+
+def verify(path):
+    """simulate the replay at `path` again and check its results"""
+    try:
+        with Replay(path) as replay:
+            game, offset = replay.new_game(
+                AnalyzedLogic(replay.lines, replay.collumns, replay.nb_next_pieces)
+            )
+            replay.play(game, offset)
+            recorded = replay.score
+            valid = (
+                game.stats.score == replay.score
+                and game.stats.lines_cleared == replay.lines_cleared
+            )
+            return Verification(
+                path,
+                valid,
+                None,
+                replay.mode,
+                replay.level,
+                recorded,
+                game.stats.score,
+                game.stats.lines_cleared,
+                game.stats.time,
+                game.pieces,
+                dict(game.clears),
+                tuple(game.level_times),
+            )
+    except (OSError, ValueError, struct.error, IndexError) as e:
+        # Unreadable or corrupted file
+        return Verification(path, False, str(e), None, 0, 0, 0, 0, 0, 0, {}, ())
+
+
+def replay_paths(directory):
+    """paths of the replays in `directory` and its subdirectories, lazily"""
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from replay_paths(entry.path)
+            elif entry.name.endswith(EXTENSION):
+                yield entry.path
+
+
+def verify_all(paths, workers=None):
+    """Verification of each replay of `paths`, in completion order"""
+    workers = workers or os.cpu_count() or 1
+    with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+        max_in_flight = IN_FLIGHT * workers
+        pending = set()
+        for path in paths:
+            pending.add(pool.submit(verify, path))
+            if len(pending) >= max_in_flight:
+                done, pending = concurrent.futures.wait(
+                    pending, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    yield future.result()
+        for future in concurrent.futures.as_completed(pending):
+            yield future.result()
+
+
+class Analytics:
+    """Aggregates of verified replays, in constant memory"""
+
+    def __init__(self):
+        self.games = Counter()  # by mode
+        self.invalid = Counter()
+        self.errors = 0
+        self.scores = Counter()  # by (mode, power of 2 bucket)
+        self.score_sums = Counter()
+        self.best_scores = Counter()
+        self.pieces = 0
+        self.clears = Counter()
+        self.level_times = Counter()  # sums of game times each level is reached at
+        self.level_games = Counter()
+
+    def add(self, verification):
+        if verification.error:
+            self.errors += 1
+            return
+
+        mode = verification.mode
+        self.games[mode] += 1
+        if not verification.valid:
+            self.invalid[mode] += 1
+            return
+
+        score = verification.score
+        self.scores[mode, score.bit_length()] += 1
+        self.score_sums[mode] += score
+        self.best_scores[mode] = max(self.best_scores[mode], score)
+        self.pieces += verification.pieces
+        self.clears.update(verification.clears)
+        # Starting level is reached at 0
+        for level, time in enumerate(
+            verification.level_times[1:], verification.level + 1
+        ):
+            self.level_times[level] += time
+            self.level_games[level] += 1
+
+    def t_spins(self):
+        return sum(n for name, n in self.clears.items() if "T-SPIN" in name)
+
+    def table(self):
+        """compact text report"""
+        rows = [
+            "{:<10}{:>10}{:>10}{:>14}{:>14}".format(
+                "MODE", "GAMES", "INVALID", "MEAN", "BEST"
+            )
+        ]
+        for mode, games in sorted(self.games.items()):
+            valid = games - self.invalid[mode]
+            rows.append(
+                "{:<10}{:>10}{:>10}{:>14.0f}{:>14}".format(
+                    mode,
+                    games,
+                    self.invalid[mode],
+                    self.score_sums[mode] / valid if valid else 0,
+                    self.best_scores[mode],
+                )
+            )
+        if self.errors:
+            rows.append("{:<10}{:>10}".format("UNREADABLE", self.errors))
+
+        rows += ["", "{:<10}{:>10}".format("SCORE <", "GAMES")]
+        modes = sorted(self.games)
+        rows[-1] += "".join("{:>10}".format(mode) for mode in modes)
+        for bucket in sorted({bucket for mode, bucket in self.scores}):
+            rows.append(
+                "{:<10}{:>10}".format(
+                    2**bucket, sum(self.scores[mode, bucket] for mode in modes)
+                )
+                + "".join("{:>10}".format(self.scores[mode, bucket]) for mode in modes)
+            )
+
+        rows += ["", "{:<24}{:>10}{:>10}".format("CLEAR", "COUNT", "PER 100")]
+        for name, n in self.clears.most_common():
+            rows.append("{:<24}{:>10}{:>10.2f}".format(name, n, 100 * n / self.pieces))
+        rows.append(
+            "{:<24}{:>10}{:>10.2f}".format(
+                "ALL T-SPINS", self.t_spins(), 100 * self.t_spins() / (self.pieces or 1)
+            )
+        )
+
+        rows += ["", "{:<10}{:>10}{:>10}".format("LEVEL", "GAMES", "MEAN TIME")]
+        for level in sorted(self.level_games):
+            rows.append(
+                "{:<10}{:>10}{:>10.1f}".format(
+                    level,
+                    self.level_games[level],
+                    self.level_times[level] / self.level_games[level],
+                )
+            )
+        return "\n".join(rows)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m tetrislogic.archive", description=__doc__.splitlines()[0]
+    )
+    parser.add_argument("directory")
+    parser.add_argument("-w", "--workers", type=int, default=None)
+    args = parser.parse_args(args)
+
+    analytics = Analytics()
+    for verification in verify_all(replay_paths(args.directory), args.workers):
+        analytics.add(verification)
+        if verification.error:
+            print("UNREADABLE", verification.path, verification.error, file=sys.stderr)
+        elif not verification.valid:
+            print(
+                "INVALID",
+                verification.path,
+                "recorded",
+                verification.recorded,
+                "simulated",
+                verification.score,
+                file=sys.stderr,
+            )
+    print(analytics.table())
+    return 1 if analytics.errors or sum(analytics.invalid.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
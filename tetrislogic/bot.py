@@ -0,0 +1,378 @@
+# -*- coding: utf-8 -*-
+"""Beam search bot playing through TetrisLogic.do_action
+
+Boards are searched as tuples of lines bitmasks (bit x set if collumn x
+is filled) and scored in batches with tetrislogic.evaluation.
+The search looks several pieces ahead with the next queue and the hold,
+within a time budget, optionally spread over a pool of worker processes.
+"""
+
+
+import time
+import concurrent.futures
+from collections import namedtuple
+
+import numpy as np
+
+from .utils import Spin
+from .tetromino import Tetromino
+from .evaluation import score as evaluate, WEIGHTS
+
+
+Placement = namedtuple("Placement", "hold orientation left")
+Node = namedtuple("Node", "rows index held lines first")
+
+
+def shape_orientations(shape):
+    """minoes coords of each reachable orientation, rotated like TetrisLogic.rotate"""
+    coords = shape.MINOES_COORDS
+    orientations = []
+    for orientation in range(4 if shape.SRS[Spin.CLOCKWISE][0] else 1):
+        orientations.append(tuple((coord.x, coord.y) for coord in coords))
+        coords = tuple(coord @ Spin.CLOCKWISE for coord in coords)
+    return tuple(orientations)
+
+
+def piece_masks(cells):
+    """((line offset, bitmask), ...) of minoes `cells` moved to collumn 0,
+    lowest line first, and the piece width"""
+    min_x = min(x for x, y in cells)
+    masks = {}
+    for x, y in cells:
+        masks[y] = masks.get(y, 0) | 1 << (x - min_x)
+    return tuple(sorted(masks.items())), max(x for x, y in cells) - min_x + 1
+
+
+# Tetromino.shapes index -> orientations
+ORIENTATIONS = tuple(shape_orientations(shape) for shape in Tetromino.shapes)
+MASKS = tuple(
+    tuple(piece_masks(cells) for cells in orientations) for orientations in ORIENTATIONS
+)
+
+
+def matrix_to_rows(matrix):
+    """lines bitmasks of a Matrix"""
+    return tuple(sum(1 << x for x, mino in enumerate(line) if mino) for line in matrix)
+
+
+def rows_to_array(boards, nb_collumns):
+    """(boards, lines, collumns) boolean array of a sequence of lines bitmasks"""
+    rows = np.array(boards, np.uint32)
+    return (
+        (rows[..., np.newaxis] >> np.arange(nb_collumns, dtype=np.uint32)) & 1
+    ).astype(bool)
+
+
+def stack_height(rows):
+    top = len(rows)
+    while top and not rows[top - 1]:
+        top -= 1
+    return top
+
+
+def drop(rows, masks, left, nb_collumns, top=None):
+    """lines bitmasks and number of lines cleared after hard dropping
+    piece `masks` (see piece_masks) from above the stack with its leftmost
+    mino in collumn `left`, None if it does not fit in the matrix"""
+    if top is None:
+        top = stack_height(rows)
+    nb_lines = len(rows)
+    masks = [(dy, mask << left) for dy, mask in masks]
+    min_y = masks[0][0]
+    y = top - min_y
+    while y + min_y > 0:
+        for dy, mask in masks:
+            line = y - 1 + dy
+            if line < nb_lines and rows[line] & mask:
+                break
+        else:
+            y -= 1
+            continue
+        break
+
+    if y + masks[-1][0] >= nb_lines:
+        return None
+    new_rows = list(rows)
+    for dy, mask in masks:
+        new_rows[y + dy] |= mask
+
+    full = (1 << nb_collumns) - 1
+    if any(new_rows[y + dy] == full for dy, mask in masks):
+        kept = [row for row in new_rows if row != full]
+        lines_cleared = nb_lines - len(kept)
+        kept.extend([0] * lines_cleared)
+        return tuple(kept), lines_cleared
+    return tuple(new_rows), 0
+
+
+def placements(rows, shape, nb_collumns):
+    """(orientation, left, rows, lines cleared) of each hard drop of `shape`"""
+    top = stack_height(rows)
+    for orientation, (masks, width) in enumerate(MASKS[shape]):
+        for left in range(nb_collumns - width + 1):
+            dropped = drop(rows, masks, left, nb_collumns, top)
+            if dropped:
+                yield (orientation, left) + dropped
+
+
+def piece_options(index, held, queue, can_hold=True):
+    """(hold, shape placed, held shape, next index) of each piece that can
+    be placed next: queue[index], or the held one (or the following one)"""
+    options = []
+    if index < len(queue):
+        options.append((False, queue[index], held, index + 1))
+        if can_hold:
+            if held is None:
+                if index + 1 < len(queue):
+                    options.append((True, queue[index + 1], queue[index], index + 2))
+            else:
+                options.append((True, held, queue[index], index + 1))
+    return options
+
+
+def children(node, queue, nb_collumns, can_hold=True):
+    """nodes after placing the next piece of `queue`, or the held one"""
+    for hold, shape, held, index in piece_options(
+        node.index, node.held, queue, can_hold
+    ):
+        for orientation, left, rows, lines_cleared in placements(
+            node.rows, shape, nb_collumns
+        ):
+            yield Node(
+                rows,
+                index,
+                held,
+                node.lines + lines_cleared,
+                node.first or Placement(hold, orientation, left),
+            )
+
+
+def beam_search(nodes, queue, nb_collumns, depth, beam_width, deadline, weights):
+    """best (score, first placement) of `nodes` searching `depth` pieces more"""
+    best = None
+    for n in range(depth + 1):
+        if not nodes:
+            break
+        scores = evaluate(
+            rows_to_array([node.rows for node in nodes], nb_collumns),
+            [node.lines for node in nodes],
+            weights,
+        )
+        order = np.argsort(scores)[::-1][:beam_width]
+        best = (scores[order[0]], nodes[order[0]].first)
+        if n == depth or time.monotonic() > deadline:
+            break
+        parents, nodes = [nodes[i] for i in order], []
+        for parent in parents:
+            nodes.extend(children(parent, queue, nb_collumns))
+            if time.monotonic() > deadline:
+                return best
+    return best
+
+
+def _search_branch(args):
+    return beam_search(*args)
+
+
+def _worker_ready():
+    return True
+
+
+def snapshot(game):
+    """copy of what the search needs from a game:
+    lines bitmasks, pieces queue, held piece and if hold is enabled"""
+    queue = [Tetromino.shapes.index(type(game.matrix.piece))] + [
+        Tetromino.shapes.index(type(piece)) for piece in game.next.pieces
+    ]
+    held = Tetromino.shapes.index(type(game.held.piece)) if game.held.piece else None
+    return (
+        matrix_to_rows(game.matrix),
+        tuple(queue),
+        held,
+        game.matrix.piece.hold_enabled,
+    )
+
+
+def best_placement(
+    rows,
+    queue,
+    held,
+    can_hold,
+    nb_collumns,
+    depth=3,
+    beam_width=8,
+    time_budget=0.010,
+    weights=WEIGHTS,
+):
+    """best Placement of queue[0] (or held piece) searching `depth` pieces,
+    None if no placement fits. Can be run in another process."""
+    deadline = time.monotonic() + time_budget
+    first_nodes = list(
+        children(Node(rows, 0, held, 0, None), queue, nb_collumns, can_hold)
+    )
+    if not first_nodes:
+        return None
+    best = beam_search(
+        first_nodes,
+        queue,
+        nb_collumns,
+        min(depth, len(queue)) - 1,
+        beam_width,
+        deadline,
+        weights,
+    )
+    return best[1]
+
+
+class Bot:
+    """Plays a TetrisLogic game, one action per step"""
+
+    def __init__(
+        self,
+        game,
+        depth=3,
+        beam_width=8,
+        time_budget=0.010,
+        workers=0,
+        weights=WEIGHTS,
+    ):
+        """`depth` pieces are searched ahead, keeping `beam_width` boards
+        at each depth, for at most `time_budget` seconds per piece.
+        If `workers`, first placements are spread over that many processes,
+        started now: their startup is not counted in the first budgets."""
+        self.game = game
+        self.depth = depth
+        self.beam_width = beam_width
+        self.time_budget = time_budget
+        self.workers = workers
+        self.weights = weights
+        self.pool = None
+        self.starting = []
+        if workers:
+            self.start_workers()
+        self.piece = None
+        self.plan = None
+
+    def start_workers(self):
+        """spawn the worker processes without waiting for them"""
+        self.pool = concurrent.futures.ProcessPoolExecutor(self.workers)
+        # One task per worker spawns them all
+        self.starting = [self.pool.submit(_worker_ready) for n in range(self.workers)]
+
+    def search(self):
+        """best Placement for the falling piece"""
+        game = self.game
+        nb_collumns = game.matrix.collumns
+        rows, queue, held, can_hold = snapshot(game)
+        depth = min(self.depth, len(queue)) - 1
+        if not self.workers or depth < 1:
+            return best_placement(
+                rows,
+                queue,
+                held,
+                can_hold,
+                nb_collumns,
+                self.depth,
+                self.beam_width,
+                self.time_budget,
+                self.weights,
+            )
+
+        if not self.pool:
+            self.start_workers()
+        if self.starting:
+            # Startup time is not counted in the budget
+            concurrent.futures.wait(self.starting)
+            self.starting = []
+        deadline = time.monotonic() + self.time_budget
+        first_nodes = list(
+            children(Node(rows, 0, held, 0, None), queue, nb_collumns, can_hold)
+        )
+        if not first_nodes:
+            return None
+        futures = [
+            self.pool.submit(
+                _search_branch,
+                (
+                    first_nodes[i :: self.workers],
+                    queue,
+                    nb_collumns,
+                    depth,
+                    self.beam_width,
+                    deadline,
+                    self.weights,
+                ),
+            )
+            for i in range(min(self.workers, len(first_nodes)))
+        ]
+        done, not_done = concurrent.futures.wait(
+            futures, timeout=max(0, deadline - time.monotonic())
+        )
+        for future in not_done:
+            future.cancel()
+        if done:
+            score, placement = max(future.result() for future in done)
+            return placement
+        # Out of time: best placement of the falling piece only
+        score, placement = beam_search(
+            first_nodes, queue, nb_collumns, 0, self.beam_width, 0, self.weights
+        )
+        return placement
+
+    def step(self):
+        """do next action toward the best placement and return it,
+        None if there is no piece to play"""
+        game = self.game
+        piece = game.matrix.piece
+        if piece is None:
+            return None
+        if piece is not self.piece:
+            self.piece = piece
+            self.plan = self.search()
+        plan = self.plan
+
+        if plan is None:
+            action = game.hard_drop
+        elif plan.hold and piece.hold_enabled:
+            action = game.hold
+            self.plan = plan._replace(hold=False)
+        elif piece.orientation != plan.orientation:
+            if (plan.orientation - piece.orientation) % 4 == 3:
+                action = game.rotate_counter
+            else:
+                action = game.rotate_clockwise
+        else:
+            left = piece.coord.x + min(mino.coord.x for mino in piece)
+            if left > plan.left:
+                action = game.move_left
+            elif left < plan.left:
+                action = game.move_right
+            else:
+                action = game.hard_drop
+
+        coord, orientation = piece.coord, piece.orientation
+        game.do_action(action)
+        game.remove_action(action)
+        if (
+            game.matrix.piece is piece
+            and action not in (game.hard_drop, game.hold)
+            and (piece.coord, piece.orientation) == (coord, orientation)
+        ):
+            # Blocked: drop where it is
+            self.plan = None
+        if action == game.hold:
+            # Keep the plan for the piece taken from hold or next queue
+            self.piece = game.matrix.piece
+        return action
+
+    def play_piece(self):
+        """do all actions until the falling piece is hard dropped"""
+        action = self.step()
+        while action and action != self.game.hard_drop:
+            action = self.step()
+
+    def close(self):
+        if self.pool:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+            self.starting = []
@@ -13,6 +13,10 @@ FALL_DELAY = 1
 AUTOREPEAT_DELAY = 0.300  # Official : 0.300 s
 AUTOREPEAT_PERIOD = 0.010  # Official : 0.010 s
 
+# Timed modes
+SPRINT_LINES = 40
+ULTRA_TIME = 120  # seconds
+
 # Piece init coord
 FALLING_PIECE_COORD = Coord(4, LINES)
 
@@ -21,7 +25,21 @@ LINES_CLEAR_NAME = "LINES_CLEAR_NAME"
 SCORES = (
     {LINES_CLEAR_NAME: "", T_Spin.NONE: 0, T_Spin.MINI: 1, T_Spin.T_SPIN: 4},
     {LINES_CLEAR_NAME: "SINGLE", T_Spin.NONE: 1, T_Spin.MINI: 2, T_Spin.T_SPIN: 8},
-    {LINES_CLEAR_NAME: "DOUBLE", T_Spin.NONE: 3, T_Spin.T_SPIN: 12},
+    {LINES_CLEAR_NAME: "DOUBLE", T_Spin.NONE: 3, T_Spin.MINI: 4, T_Spin.T_SPIN: 12},
     {LINES_CLEAR_NAME: "TRIPLE", T_Spin.NONE: 5, T_Spin.T_SPIN: 16},
     {LINES_CLEAR_NAME: "TETRIS", T_Spin.NONE: 8},
 )
+
+# Versus
+# Garbage lines sent, same keys as SCORES
+ATTACKS = (
+    {T_Spin.NONE: 0, T_Spin.MINI: 0, T_Spin.T_SPIN: 0},
+    {T_Spin.NONE: 0, T_Spin.MINI: 0, T_Spin.T_SPIN: 2},
+    {T_Spin.NONE: 1, T_Spin.MINI: 1, T_Spin.T_SPIN: 4},
+    {T_Spin.NONE: 2, T_Spin.T_SPIN: 6},
+    {T_Spin.NONE: 4},
+)
+# Bonus for consecutive Tetris or T-Spin line clears
+BACK_TO_BACK_ATTACK = 1
+# Bonus by combo count, the last one for longer combos
+COMBO_ATTACKS = (0, 0, 1, 1, 2, 2, 3, 3, 4, 4, 4, 5)
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""Gym-style synchronous environment over TetrisLogic
+
+    env = TetrisEnv()
+    observation, info = env.reset(seed=42)
+    while True:
+        observation, reward, done, info = env.step("move_left")
+        if done:
+            break
+
+Timers run on a virtual clock advanced by each step, so gravity and
+lock delay still apply. The observed matrix is a NumPy view over the
+engine buffer (BufferedMatrix), not a copy.
+"""
+
+
+import numpy as np
+
+from .consts import LINES, COLLUMNS, NEXT_PIECES
+from .utils import Mode
+from .tetrislogic import TetrisLogic, BufferedMatrix, VirtualScheduler
+from .stream import piece_pose, shape_id
+from .bot import Bot, Placement
+
+
+ACTIONS = (
+    "move_left",
+    "move_right",
+    "soft_drop",
+    "hard_drop",
+    "rotate_clockwise",
+    "rotate_counter",
+    "hold",
+)
+FRAME = 1 / 60  # virtual seconds per step
+
+
+def play(game, driver, action):
+    """do `action` on `game`: an ACTIONS index or name, or a bot.Placement
+    done at once by `driver`, a Bot of `game`"""
+    if isinstance(action, Placement):
+        driver.piece = game.matrix.piece
+        driver.plan = action
+        driver.play_piece()
+    else:
+        if not isinstance(action, str):
+            action = ACTIONS[action]
+        action = getattr(game, action)
+        game.do_action(action)
+        game.remove_action(action)
+
+
+class HeadlessTetrisLogic(TetrisLogic):
+    """TetrisLogic without GUI, on its own virtual clock"""
+
+    MATRIX_CLASS = BufferedMatrix
+
+    def __init__(self, lines=LINES, collumns=COLLUMNS, nb_next_pieces=NEXT_PIECES):
+        self.timer = VirtualScheduler()
+        super().__init__(lines, collumns, nb_next_pieces)
+
+    def load_high_score(self):
+        self.stats.high_score = 0
+
+    def show_text(self, text):
+        pass
+
+
+class TetrisEnv:
+    """reset(seed) and step(action) over a HeadlessTetrisLogic game"""
+
+    def __init__(
+        self,
+        level=1,
+        mode=Mode.MARATHON,
+        frame=FRAME,
+        lines=LINES,
+        collumns=COLLUMNS,
+        nb_next_pieces=NEXT_PIECES,
+    ):
+        self.level = level
+        self.mode = mode
+        self.frame = frame
+        self.game = HeadlessTetrisLogic(lines, collumns, nb_next_pieces)
+        self.driver = Bot(self.game)
+        self.board = np.frombuffer(self.game.matrix.cells, np.uint8).reshape(
+            lines + 3, collumns
+        )
+
+    def observation(self):
+        game = self.game
+        return {
+            "matrix": self.board,
+            "piece": piece_pose(game.matrix.piece),
+            "hold": shape_id(game.held.piece),
+            "next": tuple(shape_id(piece) for piece in game.next.pieces),
+        }
+
+    def info(self):
+        stats = self.game.stats
+        return {
+            "score": stats.score,
+            "lines": stats.lines_cleared,
+            "level": stats.level,
+            "time": stats.time,
+        }
+
+    def reset(self, seed=None, position=None):
+        """new game, same pieces sequence for a same `seed`,
+        from a positions.Position if `position` is given"""
+        self.game.timer = VirtualScheduler()
+        self.game.stats.clock = self.game.timer.time
+        self.game.new_game(self.level, self.mode, seed, position)
+        return self.observation(), self.info()
+
+    def step(self, action):
+        """`action` is an ACTIONS index or name, or a bot.Placement done
+        at once. Returns observation, reward (score gained), done, info."""
+        game = self.game
+        score = game.stats.score
+        play(game, self.driver, action)
+        if not game.over:
+            game.timer.advance(self.frame)
+        return self.observation(), game.stats.score - score, game.over, self.info()
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""Vectorized heuristic evaluation of candidate boards
+
+Boards are batched in a (boards, lines, collumns) boolean array,
+line 0 being the bottom line like in Matrix, so that a whole batch
+of candidate placements is evaluated without per-cell Python loops.
+"""
+
+
+import numpy as np
+
+from .utils import T_Slot
+from .tetrislogic import TetrisLogic
+
+
+FEATURES = (
+    "aggregate_height",
+    "max_height",
+    "holes",
+    "bumpiness",
+    "wells",
+    "row_transitions",
+    "collumn_transitions",
+    "t_slots",
+    "lines_cleared",
+)
+
+# Weights of each feature in score, see Dellacherie's and El-Tetris heuristics
+WEIGHTS = {
+    "aggregate_height": -0.51,
+    "max_height": -0.1,
+    "holes": -0.36,
+    "bumpiness": -0.18,
+    "wells": -0.1,
+    "row_transitions": -0.32,
+    "collumn_transitions": -0.93,
+    "t_slots": 0.5,
+    "lines_cleared": 0.76,
+}
+
+
+def _t_slot_offsets():
+    # A T-Slot is the room for a T pointing down (orientation 2).
+    # Corners are the ones checked by TetrisLogic.is_t_slot
+    corners = TetrisLogic.T_SLOT_COORDS
+    front = tuple(
+        (corners[(2 + n) % 4].x, corners[(2 + n) % 4].y) for n in (T_Slot.A, T_Slot.B)
+    )
+    back = tuple(
+        (corners[(2 + n) % 4].x, corners[(2 + n) % 4].y) for n in (T_Slot.C, T_Slot.D)
+    )
+    room = ((0, 0), (-1, 0), (1, 0), (0, -1))
+    return front, back, room
+
+
+T_SLOT_FRONT, T_SLOT_BACK, T_SLOT_ROOM = _t_slot_offsets()
+
+
+def matrix_to_array(matrix):
+    """(lines, collumns) boolean array of filled cells of a Matrix"""
+    return np.array([[mino is not None for mino in line] for line in matrix], bool)
+
+
+def heights(boards):
+    """height of each collumn: (boards, collumns) array"""
+    nb_lines = boards.shape[1]
+    from_top = boards[:, ::-1, :]
+    return np.where(from_top.any(axis=1), nb_lines - from_top.argmax(axis=1), 0)
+
+
+def _shifted(padded, dx, dy):
+    """view of padded boards moved so that cell (x, y) holds cell (x+dx, y+dy)"""
+    nb_lines, nb_collumns = padded.shape[1] - 2, padded.shape[2] - 2
+    return padded[:, 1 + dy : 1 + dy + nb_lines, 1 + dx : 1 + dx + nb_collumns]
+
+
+def t_slots(boards):
+    """number of T-Slots (three-corner rule, free room for a T) per board"""
+    # Walls and floor are filled, the top is free
+    padded = np.pad(boards, ((0, 0), (1, 0), (1, 1)), constant_values=True)
+    padded = np.pad(padded, ((0, 0), (0, 1), (0, 0)), constant_values=False)
+    free = np.ones(boards.shape, bool)
+    for dx, dy in T_SLOT_ROOM:
+        free &= ~_shifted(padded, dx, dy)
+    front = np.ones(boards.shape, bool)
+    for dx, dy in T_SLOT_FRONT:
+        front &= _shifted(padded, dx, dy)
+    back = np.zeros(boards.shape, bool)
+    for dx, dy in T_SLOT_BACK:
+        back |= _shifted(padded, dx, dy)
+    return (free & front & back).sum(axis=(1, 2))
+
+
+def features(boards, lines_cleared=None):
+    """(boards, FEATURES) array of features of a (boards, lines, collumns)
+    boolean array, `lines_cleared` by the placements leading to each board"""
+    boards = np.asarray(boards, bool)
+    if boards.ndim == 2:
+        boards = boards[np.newaxis]
+    nb_boards, nb_lines, nb_collumns = boards.shape
+
+    h = heights(boards)
+
+    below_top = np.arange(nb_lines)[np.newaxis, :, np.newaxis] < h[:, np.newaxis, :]
+    holes = (below_top & ~boards).sum(axis=(1, 2))
+
+    walled = np.pad(h, ((0, 0), (1, 1)), constant_values=nb_lines)
+    wells = np.clip(np.minimum(walled[:, :-2], walled[:, 2:]) - h, 0, None)
+
+    row_padded = np.pad(boards, ((0, 0), (0, 0), (1, 1)), constant_values=True)
+    row_transitions = (row_padded[:, :, 1:] != row_padded[:, :, :-1]).sum(axis=(1, 2))
+
+    collumn_padded = np.pad(boards, ((0, 0), (1, 0), (0, 0)), constant_values=True)
+    collumn_transitions = (
+        collumn_padded[:, 1:, :] != collumn_padded[:, :-1, :]
+    ).sum(axis=(1, 2))
+
+    if lines_cleared is None:
+        lines_cleared = np.zeros(nb_boards)
+
+    return np.stack(
+        (
+            h.sum(axis=1),
+            h.max(axis=1),
+            holes,
+            np.abs(np.diff(h, axis=1)).sum(axis=1),
+            wells.sum(axis=1),
+            row_transitions,
+            collumn_transitions,
+            t_slots(boards),
+            np.asarray(lines_cleared),
+        ),
+        axis=1,
+    ).astype(float)
+
+
+def score(boards, lines_cleared=None, weights=WEIGHTS):
+    """weighted sum of features of each board, the higher the better"""
+    return features(boards, lines_cleared) @ np.array(
+        [weights.get(name, 0) for name in FEATURES]
+    )
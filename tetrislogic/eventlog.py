@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""Asynchronous structured event log
+
+    log = EventLog(game, "logs")
+    ...
+    log.close()
+
+Engine events are turned into plain records, stamped with the monotonic
+clock and the game time when the event bus is dispatched (each frame in
+the GUI), not when they happened: the records of a dispatch share its
+time, up to a frame late. They are put in a fixed-size ring by the
+dispatching thread. That is all the game thread does: a background thread takes the records in
+batches and writes them as JSON lines to gzip compressed files, starting
+a new file every `max_bytes` and keeping the `backups` last ones.
+
+The ring has one producer and one consumer, each moving its own index,
+so neither side takes a lock. When it is full, new records are dropped
+and counted; the count is logged as a "Dropped" record.
+"""
+
+
+import os
+import json
+import gzip
+import time
+import threading
+import warnings
+
+from .events import (
+    NewGame,
+    NewLevel,
+    GenerationPhase,
+    LocksDown,
+    CompletionPhase,
+    Hold,
+    Pause,
+    Resume,
+    GameOver,
+)
+from .tetromino import TetrominoBase
+
+
+RING_SIZE = 4096  # records
+FLUSH_PERIOD = 1  # seconds between writes at most
+MAX_BYTES = 4 * 1024 * 1024  # uncompressed bytes per file
+BACKUPS = 10  # files kept
+PREFIX = "events-"
+EXTENSION = ".jsonl.gz"
+
+LOGGED_EVENTS = (
+    NewGame,
+    NewLevel,
+    GenerationPhase,
+    LocksDown,
+    CompletionPhase,
+    Hold,
+    Pause,
+    Resume,
+    GameOver,
+)
+
+
+def plain(value):
+    """JSON serializable copy of an event field, pieces by their shape name"""
+    if isinstance(value, TetrominoBase):
+        return type(value).__name__
+    if isinstance(value, (list, tuple)):
+        return [plain(item) for item in value]
+    if isinstance(value, bytes):
+        return list(value)
+    return value
+
+
+class EventLog:
+    """Logs the events of a TetrisLogic game from a background thread"""
+
+    def __init__(
+        self,
+        game,
+        directory,
+        ring_size=RING_SIZE,
+        flush_period=FLUSH_PERIOD,
+        max_bytes=MAX_BYTES,
+        backups=BACKUPS,
+        clock=time.monotonic,
+    ):
+        os.makedirs(directory, exist_ok=True)
+        self.game = game
+        self.directory = directory
+        self.flush_period = flush_period
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.clock = clock
+
+        self.ring = [None] * ring_size
+        self.head = 0  # moved by the game thread only
+        self.tail = 0  # moved by the writer thread only
+        self.dropped = 0
+        self.logged_dropped = 0
+        self.last_error = None
+
+        self.file = None
+        self.file_size = 0
+        self.file_number = max(
+            (
+                int(name[len(PREFIX) : -len(EXTENSION)])
+                for name in os.listdir(directory)
+                if name.startswith(PREFIX) and name.endswith(EXTENSION)
+            ),
+            default=0,
+        )
+
+        self.wake_up = threading.Event()
+        self.stopping = False
+        self.writer = threading.Thread(target=self.write_loop, daemon=True)
+        self.writer.start()
+        game.events.subscribe(self.on_events, *LOGGED_EVENTS)
+
+    # Game thread
+
+    def on_events(self, events):
+        """records stamped with the dispatch time"""
+        now = self.clock()
+        game_time = self.game.stats.time
+        size = len(self.ring)
+        for event in events:
+            if self.head - self.tail >= size:
+                self.dropped += 1
+                continue
+            record = {"t": now, "game_time": game_time, "event": type(event).__name__}
+            for field, value in zip(event._fields, event):
+                record[field] = plain(value)
+            if type(event) is LocksDown:
+                # Locked pieces don't move any more
+                record.update(
+                    x=event.piece.coord.x,
+                    y=event.piece.coord.y,
+                    orientation=event.piece.orientation,
+                )
+            self.ring[self.head % size] = record
+            self.head += 1
+        if self.head - self.tail >= size // 2:
+            self.wake_up.set()
+
+    # Writer thread
+
+    def write_loop(self):
+        while not self.stopping:
+            self.wake_up.wait(self.flush_period)
+            self.wake_up.clear()
+            self.try_write_batch()
+        self.try_write_batch()
+        if self.file:
+            self.close_file()
+
+    def try_write_batch(self):
+        """write_batch, errors (disk full, file removed...) being recorded
+        in last_error: the batch is lost, the next one goes to a new file"""
+        try:
+            self.write_batch()
+        except Exception as e:
+            self.last_error = e
+            warnings.warn("Events could not be logged: {}".format(e))
+            if self.file:
+                self.close_file()
+
+    def close_file(self):
+        file, self.file = self.file, None
+        try:
+            file.close()
+        except Exception as e:
+            self.last_error = e
+
+    def write_batch(self):
+        head = self.head
+        size = len(self.ring)
+        lines = []
+        for n in range(self.tail, head):
+            lines.append(json.dumps(self.ring[n % size]))
+            self.ring[n % size] = None
+        self.tail = head
+        dropped = self.dropped
+        if dropped != self.logged_dropped:
+            lines.append(
+                json.dumps(
+                    {
+                        "t": self.clock(),
+                        "event": "Dropped",
+                        "count": dropped - self.logged_dropped,
+                        "total": dropped,
+                    }
+                )
+            )
+            self.logged_dropped = dropped
+        if lines:
+            self.write("\n".join(lines) + "\n")
+
+    def write(self, text):
+        data = text.encode("utf-8")
+        if self.file is None or self.file_size + len(data) > self.max_bytes:
+            self.rotate()
+        self.file.write(data)
+        self.file_size += len(data)
+
+    def rotate(self):
+        if self.file:
+            self.close_file()
+        self.file_number += 1
+        self.file = gzip.open(self.path(self.file_number), "wb")
+        self.file_size = 0
+        old = self.path(self.file_number - self.backups)
+        if os.path.exists(old):
+            os.remove(old)
+
+    def path(self, number):
+        return os.path.join(
+            self.directory, "{}{:06d}{}".format(PREFIX, number, EXTENSION)
+        )
+
+    def close(self):
+        """write the records left and stop the writer thread"""
+        self.game.events.unsubscribe(self.on_events)
+        self.stopping = True
+        self.wake_up.set()
+        self.writer.join()
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""Typed engine events and a per-tick event bus
+
+The engine only queues an event if its type has at least one subscriber,
+so unsubscribed events cost a set lookup. Subscribers get the queued
+events in batches, in publication order, when the bus is dispatched
+(usually once per frame).
+"""
+
+
+from collections import namedtuple
+
+
+NewGame = namedtuple("NewGame", "level next_pieces position")
+NewLevel = namedtuple("NewLevel", "level")
+GenerationPhase = namedtuple("GenerationPhase", "piece next_piece")
+FallingPhase = namedtuple("FallingPhase", "coord orientation")
+Locked = namedtuple("Locked", "coord orientation")
+LocksDown = namedtuple("LocksDown", "piece")
+EliminatePhase = namedtuple("EliminatePhase", "lines_to_remove")
+CompletionPhase = namedtuple(
+    "CompletionPhase",
+    "t_spin lines_cleared pattern_name pattern_score nb_combo combo_score score",
+)
+Hold = namedtuple("Hold", "piece")
+Action = namedtuple("Action", "name")
+Pause = namedtuple("Pause", "")
+Resume = namedtuple("Resume", "")
+GameOver = namedtuple("GameOver", "score")
+Attack = namedtuple("Attack", "lines")
+Garbage = namedtuple("Garbage", "lines hole")
+
+EVENTS = (
+    NewGame,
+    NewLevel,
+    GenerationPhase,
+    FallingPhase,
+    Locked,
+    LocksDown,
+    EliminatePhase,
+    CompletionPhase,
+    Hold,
+    Action,
+    Pause,
+    Resume,
+    GameOver,
+    Attack,
+    Garbage,
+)
+
+
+class EventBus:
+    """Queue of engine events drained in batches by subscribers"""
+
+    def __init__(self):
+        self.queue = []
+        self.subscribers = []
+        # Event types with at least one subscriber, checked by the engine
+        # before building an event
+        self.wanted = set()
+
+    def subscribe(self, subscriber, *event_types):
+        """`subscriber` will be called with the list of queued events
+        of `event_types` on each dispatch"""
+        self.subscribers.append((subscriber, frozenset(event_types)))
+        self.wanted.update(event_types)
+
+    def unsubscribe(self, subscriber):
+        self.subscribers = [
+            (callback, event_types)
+            for callback, event_types in self.subscribers
+            if callback != subscriber
+        ]
+        self.wanted = set().union(
+            *(event_types for callback, event_types in self.subscribers)
+        )
+
+    def publish(self, event):
+        if type(event) in self.wanted:
+            self.queue.append(event)
+
+    def dispatch(self):
+        """send queued events to subscribers"""
+        if not self.queue:
+            return
+        queue, self.queue = self.queue, []
+        for subscriber, event_types in self.subscribers:
+            batch = [event for event in queue if type(event) in event_types]
+            if batch:
+                subscriber(batch)
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""Training data export: one (state, action, reward) record per piece
+
+Records are built from engine events, live from the event bus or from
+any other event source such as a replay, and streamed by a generator
+into chunked, compressed, columnar NumPy files with a fixed schema.
+Only one chunk is held in memory.
+"""
+
+
+import os
+
+import numpy as np
+
+from .consts import LINES, COLLUMNS, NEXT_PIECES
+from .events import (
+    NewGame,
+    GenerationPhase,
+    LocksDown,
+    EliminatePhase,
+    CompletionPhase,
+    Hold,
+    Garbage,
+)
+from .stream import shape_id, NO_PIECE
+
+
+CHUNK_SIZE = 65536  # records per file
+
+
+def schema(nb_lines=LINES + 3, nb_next=NEXT_PIECES):
+    """column name: (dtype, shape of one record)"""
+    return {
+        "board": (np.uint16, (nb_lines,)),  # lines bitmasks before placement
+        "piece": (np.uint8, ()),  # Tetromino.shapes index
+        "hold": (np.uint8, ()),  # NO_PIECE if empty
+        "next": (np.uint8, (nb_next,)),
+        "used_hold": (np.bool_, ()),
+        "placed": (np.uint8, ()),  # piece locked, differs from piece on hold
+        "orientation": (np.uint8, ()),
+        "x": (np.int8, ()),
+        "y": (np.int8, ()),
+        "lines": (np.uint8, ()),
+        "score_delta": (np.int32, ()),
+    }
+
+
+class Recorder:
+    """Follows a game from its events and yields a record per locked piece"""
+
+    def __init__(self, nb_lines=LINES + 3, nb_collumns=COLLUMNS):
+        self.nb_lines = nb_lines
+        self.nb_collumns = nb_collumns
+        self.rows = [0] * nb_lines
+        self.next = []
+        self.held = NO_PIECE
+        self.score = 0
+        self.pending = None
+
+    def records(self, events):
+        """generator of records from an iterable of events"""
+        for event in events:
+            event_type = type(event)
+            if event_type is GenerationPhase:
+                if event.next_piece is not None:
+                    self.next.pop(0)
+                    self.next.append(shape_id(event.next_piece))
+                if self.pending is None:
+                    self.pending = {
+                        "board": tuple(self.rows),
+                        "piece": shape_id(event.piece),
+                        "hold": self.held,
+                        "next": tuple(self.next),
+                        "used_hold": False,
+                    }
+            elif event_type is Hold:
+                self.held = shape_id(event.piece)
+                if self.pending:
+                    self.pending["used_hold"] = True
+            elif event_type is LocksDown:
+                piece = event.piece
+                for mino in piece:
+                    coord = mino.coord + piece.coord
+                    if 0 <= coord.y < self.nb_lines:
+                        self.rows[coord.y] |= 1 << coord.x
+                if self.pending:
+                    self.pending.update(
+                        placed=shape_id(piece),
+                        orientation=piece.orientation,
+                        x=piece.coord.x,
+                        y=piece.coord.y,
+                    )
+            elif event_type is EliminatePhase:
+                for y in event.lines_to_remove:
+                    self.rows.pop(y)
+                    self.rows.append(0)
+            elif event_type is Garbage:
+                line = ((1 << self.nb_collumns) - 1) & ~(1 << event.hole)
+                del self.rows[self.nb_lines - event.lines :]
+                self.rows[0:0] = [line] * event.lines
+            elif event_type is CompletionPhase:
+                record, self.pending = self.pending, None
+                if record:
+                    record["lines"] = event.lines_cleared
+                    record["score_delta"] = event.score - self.score
+                    yield record
+                self.score = event.score
+            elif event_type is NewGame:
+                self.rows = [0] * self.nb_lines
+                self.next = [shape_id(piece) for piece in event.next_pieces]
+                self.held = NO_PIECE
+                if event.position:
+                    for y, line in enumerate(event.position.matrix):
+                        self.rows[y] = sum(
+                            1 << x for x, value in enumerate(line) if value
+                        )
+                    if event.position.held is not None:
+                        self.held = event.position.held
+                self.score = 0
+                self.pending = None
+
+
+def chunk_writer(directory, columns=None, chunk_size=CHUNK_SIZE, prefix="chunk"):
+    """coroutine receiving records with send() and writing them every
+    `chunk_size` records into `directory`/`prefix`-NNNNNN.npz files.
+    close() writes the last, partial, chunk."""
+    columns = columns or schema()
+    os.makedirs(directory, exist_ok=True)
+    buffers = {
+        name: np.zeros((chunk_size,) + shape, dtype)
+        for name, (dtype, shape) in columns.items()
+    }
+    nb_chunks = 0
+    size = 0
+
+    def flush():
+        path = os.path.join(directory, "{}-{:06d}.npz".format(prefix, nb_chunks))
+        np.savez_compressed(
+            path, **{name: buffer[:size] for name, buffer in buffers.items()}
+        )
+
+    try:
+        while True:
+            record = yield
+            for name, buffer in buffers.items():
+                buffer[size] = record[name]
+            size += 1
+            if size == chunk_size:
+                flush()
+                nb_chunks += 1
+                size = 0
+    finally:
+        if size:
+            flush()
+
+
+class Exporter:
+    """Streams the records of a live game to disk through its event bus"""
+
+    def __init__(self, game, directory, chunk_size=CHUNK_SIZE, prefix="chunk"):
+        self.game = game
+        self.recorder = Recorder(game.matrix.lines + 3, game.matrix.collumns)
+        self.writer = chunk_writer(
+            directory,
+            schema(self.recorder.nb_lines, game.next.nb_pieces),
+            chunk_size,
+            prefix,
+        )
+        next(self.writer)
+        game.events.subscribe(
+            self.on_events,
+            NewGame,
+            GenerationPhase,
+            LocksDown,
+            EliminatePhase,
+            CompletionPhase,
+            Hold,
+            Garbage,
+        )
+
+    def on_events(self, events):
+        for record in self.recorder.records(events):
+            self.writer.send(record)
+
+    def close(self):
+        self.game.events.unsubscribe(self.on_events)
+        self.writer.close()
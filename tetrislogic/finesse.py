@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+"""Finesse: fewest inputs to place a piece on an open board
+
+    table = FinesseTable.for_game(game, cache_directory)
+    table.optimal(piece)  # ("DAS left", "clockwise") for a locked piece
+    table.faults(piece, ["move_left", "rotate_clockwise", "rotate_counter"])
+
+Inputs are taps (one collumn move), DAS (a move key held until the piece
+reaches the wall) and rotations. For each shape, every placement on an
+open board is reached from FALLING_PIECE_COORD by a breadth first search
+played on the engine itself, so moves, auto-repeat and SRS kicks are
+exactly those of the game. Placements are keyed by the cells covered:
+orientations covering the same cells (I, S and Z) share their inputs.
+
+The search runs once per shape set, matrix size and spawn coord: the
+table is saved as JSON in the cache directory, named after a digest of
+those, and loaded from there next time. Checking a locked piece is then
+a dict lookup.
+"""
+
+
+import os
+import json
+import hashlib
+
+from .consts import COLLUMNS
+from .tetromino import Tetromino
+from .env import HeadlessTetrisLogic
+from .positions import Position
+
+
+VERSION = 1
+PREFIX = "finesse-"
+EXTENSION = ".json"
+
+# Input name -> TetrisLogic action, held until the wall
+INPUTS = {
+    "left": ("move_left", False),
+    "right": ("move_right", False),
+    "DAS left": ("move_left", True),
+    "DAS right": ("move_right", True),
+    "clockwise": ("rotate_clockwise", False),
+    "counter": ("rotate_counter", False),
+}
+# Actions counted as inputs, each do_action (tapped or held) being one
+ACTIONS = ("move_left", "move_right", "rotate_clockwise", "rotate_counter")
+
+
+class OpenBoardLogic(HeadlessTetrisLogic):
+    """HeadlessTetrisLogic without gravity: the piece stays on its spawn line"""
+
+    def lock_phase(self):
+        pass
+
+
+def footprint(piece):
+    """(leftmost collumn, cells from the lower left corner) covered by `piece`"""
+    cells = [
+        (piece.coord.x + mino.coord.x, piece.coord.y + mino.coord.y) for mino in piece
+    ]
+    left = min(x for x, y in cells)
+    bottom = min(y for x, y in cells)
+    return left, tuple(sorted((x - left, y - bottom) for x, y in cells))
+
+
+def press(game, name):
+    """do input `name` on `game`, a VirtualScheduler one"""
+    action_name, held = INPUTS[name]
+    action = getattr(game, action_name)
+    game.do_action(action)
+    if held:
+        game.timer.advance(
+            game.AUTOREPEAT_DELAY + game.matrix.collumns * game.AUTOREPEAT_PERIOD
+        )
+    game.remove_action(action)
+
+
+def search(game, shape):
+    """{(left, cells): inputs} of each placement of shape `shape`
+    (Tetromino.shapes index), fewest inputs first found"""
+    spawn = Position("", (), shape, None, ())
+
+    def play(inputs):
+        game.new_game(position=spawn)
+        for name in inputs:
+            press(game, name)
+        piece = game.matrix.piece
+        return (piece.orientation, piece.coord.x), footprint(piece)
+
+    state, placement = play(())
+    seen = {state}
+    placements = {placement: ()}
+    frontier = [()]
+    while frontier:
+        next_frontier = []
+        for inputs in frontier:
+            for name in INPUTS:
+                state, placement = play(inputs + (name,))
+                if state not in seen:
+                    seen.add(state)
+                    placements.setdefault(placement, inputs + (name,))
+                    next_frontier.append(inputs + (name,))
+        frontier = next_frontier
+    return placements
+
+
+def digest(lines, collumns, spawn):
+    """of the shapes, their rotation system, the matrix size and spawn coord"""
+    shapes = [
+        (
+            shape.__name__,
+            [(coord.x, coord.y) for coord in shape.MINOES_COORDS],
+            sorted(
+                (spin, [[(kick.x, kick.y) for kick in kicks] for kicks in srs])
+                for spin, srs in shape.SRS.items()
+            ),
+        )
+        for shape in Tetromino.shapes
+    ]
+    key = repr((VERSION, shapes, lines, collumns, (spawn.x, spawn.y)))
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+
+
+class FinesseTable:
+    """Fewest inputs of each placement on an open board, by shape"""
+
+    def __init__(self, placements):
+        self.placements = placements  # (shape name, left, cells): inputs
+
+    @classmethod
+    def generate(cls, lines, collumns=COLLUMNS, spawn=None):
+        game = OpenBoardLogic(lines, collumns)
+        if spawn is not None:
+            game.FALLING_PIECE_COORD = spawn
+        placements = {}
+        for n, shape in enumerate(Tetromino.shapes):
+            for (left, cells), inputs in search(game, n).items():
+                placements[shape.__name__, left, cells] = inputs
+        return cls(placements)
+
+    @classmethod
+    def for_game(cls, game, directory=None):
+        """table of a TetrisLogic `game`, cached in `directory` if given"""
+        lines = game.matrix.lines
+        collumns = game.matrix.collumns
+        spawn = game.FALLING_PIECE_COORD
+        if directory is None:
+            return cls.generate(lines, collumns, spawn)
+
+        path = os.path.join(
+            directory, PREFIX + digest(lines, collumns, spawn) + EXTENSION
+        )
+        try:
+            return cls.load(path)
+        except (OSError, ValueError, KeyError, TypeError):
+            # Missing or unreadable
+            pass
+        table = cls.generate(lines, collumns, spawn)
+        os.makedirs(directory, exist_ok=True)
+        table.save(path)
+        return table
+
+    def save(self, path):
+        shapes = {}
+        for (name, left, cells), inputs in self.placements.items():
+            shapes.setdefault(name, []).append([left, cells, inputs])
+        with open(path, "w") as f:
+            json.dump({"version": VERSION, "shapes": shapes}, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        if data["version"] != VERSION:
+            raise ValueError("Unsupported finesse table version")
+        return cls(
+            {
+                (name, left, tuple(tuple(cell) for cell in cells)): tuple(inputs)
+                for name, placements in data["shapes"].items()
+                for left, cells, inputs in placements
+            }
+        )
+
+    def optimal(self, piece):
+        """fewest inputs placing `piece` where it is, None if the placement
+        can't be reached on an open board"""
+        return self.placements.get((type(piece).__name__,) + footprint(piece))
+
+    def faults(self, piece, actions):
+        """number of `actions` (names of the moves and rotations done on
+        `piece`) above the fewest inputs"""
+        optimal = self.optimal(piece)
+        if optimal is None:
+            return 0
+        return max(0, sum(name in ACTIONS for name in actions) - len(optimal))
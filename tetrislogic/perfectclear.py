@@ -0,0 +1,348 @@
+# -*- coding: utf-8 -*-
+"""Perfect clear solver
+
+    solution = perfect_clear(game)  # or solve(*snapshot(game), collumns)
+    if solution:
+        height, placements = solution
+
+Decides if the matrix can be emptied with the pieces of the queue (and the
+hold), placing at most `max_pieces` pieces, and returns the Placement of
+each piece. Placements are hard drops, like those of the bot.
+
+A perfect clear of `height` lines fills all the free cells below that
+height, so it takes exactly free cells / 4 pieces. Heights are tried from
+the lowest. Each one is searched depth first on the collumns heights:
+minoes are kept below the height and never left above a free cell, unless
+their lines are cleared at once. That misses the rare perfect clears
+uncovering a hole later, in exchange for a much smaller search, pruned when:
+- the free cells on one side of a filled collumn are not a multiple of 4:
+  no piece can cross it, so they are filled by whole pieces
+- the difference between the free cells of even and odd collumns can't be
+  made up by the pieces left: only I (4), T, J and L (2) pieces change it
+- a sub-board (lines left, queue position, held piece) already failed
+Top level branches can be searched in parallel on a process pool.
+"""
+
+
+import os
+import time
+import concurrent.futures
+
+from .tetromino import Tetromino
+from .bot import (
+    Placement,
+    MASKS,
+    piece_options,
+    snapshot,
+    stack_height,
+    best_placement,
+)
+
+
+MAX_PIECES = 10
+MAX_HEIGHT = 4
+
+# Tetromino.shapes index -> most the piece changes the collumn parity by
+PARITY = tuple(
+    {"I": 4, "T": 2, "J": 2, "L": 2}.get(shape.__name__[0], 0)
+    for shape in Tetromino.shapes
+)
+
+
+def profile(masks, width):
+    """(width, bottoms, tops) of piece `masks`: lowest and above highest
+    line of each collumn, from the lowest line of the piece"""
+    min_y = masks[0][0]
+    bottoms = []
+    tops = []
+    for x in range(width):
+        lines = [dy - min_y for dy, mask in masks if mask >> x & 1]
+        bottoms.append(min(lines))
+        tops.append(max(lines) + 1)
+    return width, tuple(bottoms), tuple(tops)
+
+
+# Tetromino.shapes index -> orientations, in MASKS order
+PROFILES = tuple(
+    tuple(profile(masks, width) for masks, width in orientations)
+    for orientations in MASKS
+)
+
+
+class OutOfTime(Exception):
+    pass
+
+
+def collumn_heights(rows, nb_collumns):
+    """height of each collumn of lines bitmasks `rows`, None if a mino is
+    above a free cell: hard drops can't fill it"""
+    heights = []
+    for x in range(nb_collumns):
+        height = 0
+        for y, row in enumerate(rows):
+            if row >> x & 1:
+                if height < y:
+                    return None
+                height = y + 1
+        heights.append(height)
+    return tuple(heights)
+
+
+def splits_fillable(heights, box):
+    """False if free cells between two filled collumns are not a multiple of 4"""
+    free = 0
+    for height in heights:
+        if height == box:
+            if free % 4:
+                return False
+            free = 0
+        else:
+            free += box - height
+    return free % 4 == 0
+
+
+def parity_fillable(heights, box, shapes):
+    """False if the free cells of even and odd collumns differ by more
+    than pieces `shapes` can make up"""
+    difference = sum(heights[1::2]) - sum(heights[::2])
+    if len(heights) % 2:
+        difference += box
+    return abs(difference) <= sum(PARITY[shape] for shape in shapes)
+
+
+def place(heights, box, piece, left):
+    """collumns heights and number of lines cleared after hard dropping
+    `piece` (see profile) in collumn `left`, None if it goes above the box
+    or stays above a free cell"""
+    width, bottoms, tops = piece
+    y = max(heights[left + x] - bottoms[x] for x in range(width))
+    if y + max(tops) > box:
+        return None
+    new_heights = list(heights)
+    gaps = False
+    for x in range(width):
+        gaps |= heights[left + x] < y + bottoms[x]
+        new_heights[left + x] += tops[x] - bottoms[x]
+    if not gaps:
+        # Collumns stay filled from the floor: lines are full below the lowest
+        lines_cleared = min(new_heights)
+        if not lines_cleared:
+            return tuple(new_heights), 0
+        return tuple(height - lines_cleared for height in new_heights), lines_cleared
+    # Minoes above a gap are fine if all their lines are cleared
+    lines_cleared = 0
+    for line in range(y, y + max(tops)):
+        full = all(
+            line < heights[x]
+            or left <= x < left + width
+            and y + bottoms[x - left] <= line < y + tops[x - left]
+            for x in range(len(heights))
+        )
+        if full:
+            lines_cleared += 1
+        elif any(
+            heights[left + x] < y + bottoms[x] <= line < y + tops[x]
+            for x in range(width)
+        ):
+            return None
+    return tuple(height - lines_cleared for height in new_heights), lines_cleared
+
+
+class Search:
+    """Depth first search of the placements clearing a box of lines.
+    Boards are the collumns heights and the box height: no piece is placed
+    above a free cell."""
+
+    def __init__(self, queue, deadline=None):
+        self.queue = queue
+        self.deadline = deadline
+        self.failed = set()  # (heights, box, index, held)
+        self.cache = {}  # (heights, box, shape): placements
+        self.nodes = 0
+
+    def fillable(self, heights, box, index, held):
+        queue = self.queue
+        nb_pieces = len(queue) - index + (held is not None)
+        if box * len(heights) - sum(heights) > 4 * nb_pieces:
+            return False
+        if not splits_fillable(heights, box):
+            return False
+        shapes = queue[index:] if held is None else queue[index:] + (held,)
+        return parity_fillable(heights, box, shapes)
+
+    def placements(self, heights, box, shape):
+        """(orientation, left, heights, box) after each placement of `shape`"""
+        key = (heights, box, shape)
+        placements = self.cache.get(key)
+        if placements is None:
+            placements = []
+            for orientation, piece in enumerate(PROFILES[shape]):
+                for left in range(len(heights) - piece[0] + 1):
+                    placed = place(heights, box, piece, left)
+                    if placed:
+                        new_heights, lines_cleared = placed
+                        placements.append(
+                            (orientation, left, new_heights, box - lines_cleared)
+                        )
+            self.cache[key] = placements
+        return placements
+
+    def branches(self, heights, box, index, held, can_hold=True):
+        """(placement, heights, box, index, held) after each next placement"""
+        for hold, shape, new_held, new_index in piece_options(
+            index, held, self.queue, can_hold
+        ):
+            for orientation, left, new_heights, new_box in self.placements(
+                heights, box, shape
+            ):
+                yield (
+                    Placement(hold, orientation, left),
+                    new_heights,
+                    new_box,
+                    new_index,
+                    new_held,
+                )
+
+    def search(self, heights, box, index, held):
+        """placements clearing the `box` lines, None if there are none"""
+        if not box:
+            return []
+        key = (heights, box, index, held)
+        if key in self.failed:
+            return None
+        self.nodes += 1
+        if self.deadline and not self.nodes % 256 and time.monotonic() > self.deadline:
+            raise OutOfTime
+        if self.fillable(heights, box, index, held):
+            for placement, *child in self.branches(heights, box, index, held):
+                placements = self.search(*child)
+                if placements is not None:
+                    return [placement] + placements
+        self.failed.add(key)
+        return None
+
+
+def boxes(rows, queue, held, nb_collumns, max_pieces, max_height):
+    """(box height, collumns heights, pieces placed) of the perfect clears
+    possible with the number of pieces available, lowest first"""
+    top = stack_height(rows)
+    heights = collumn_heights(rows[:top], nb_collumns)
+    if heights is None:
+        return
+    nb_pieces = min(max_pieces, len(queue) + (held is not None))
+    for box in range(max(top, 1), max_height + 1):
+        free = box * nb_collumns - sum(heights)
+        if free % 4 == 0 and 0 < free // 4 <= nb_pieces:
+            yield box, heights, free // 4
+
+
+def search_branches(branches, queue, deadline):
+    """first (placement, placements left) of `branches` clearing their
+    box, None if there are none. Can be run in another process."""
+    search = Search(queue, deadline)
+    try:
+        for placement, *child in branches:
+            placements = search.search(*child)
+            if placements is not None:
+                return [placement] + placements
+    except OutOfTime:
+        pass
+    return None
+
+
+def solve(
+    rows,
+    queue,
+    held,
+    can_hold,
+    nb_collumns,
+    max_pieces=MAX_PIECES,
+    max_height=MAX_HEIGHT,
+    time_budget=None,
+):
+    """(height, [Placement, ...]) of a perfect clear of the lines bitmasks
+    `rows`, placing at most `max_pieces` pieces of `queue` (current piece
+    first) and the `held` one, None if there is none (or if `time_budget`
+    seconds are out). Arguments are those of bot.best_placement."""
+    deadline = time.monotonic() + time_budget if time_budget else None
+    queue = tuple(queue)
+    for box, heights, nb_pieces in boxes(
+        rows, queue, held, nb_collumns, max_pieces, max_height
+    ):
+        # Pieces placed are among the first ones, one more if one is held
+        search = Search(queue[: nb_pieces + 1], deadline)
+        try:
+            for placement, *child in search.branches(heights, box, 0, held, can_hold):
+                placements = search.search(*child)
+                if placements is not None:
+                    return box, [placement] + placements
+        except OutOfTime:
+            return None
+    return None
+
+
+class PerfectClearSolver:
+    """solve() with the top level branches spread over a pool of processes"""
+
+    def __init__(
+        self,
+        max_pieces=MAX_PIECES,
+        max_height=MAX_HEIGHT,
+        workers=None,
+        time_budget=None,
+    ):
+        self.max_pieces = max_pieces
+        self.max_height = max_height
+        self.workers = workers or os.cpu_count() or 1
+        self.time_budget = time_budget
+        self.pool = None
+
+    def solve(self, rows, queue, held, can_hold, nb_collumns):
+        deadline = time.monotonic() + self.time_budget if self.time_budget else None
+        queue = tuple(queue)
+        if not self.pool:
+            self.pool = concurrent.futures.ProcessPoolExecutor(self.workers)
+        workers = self.workers
+        for box, heights, nb_pieces in boxes(
+            rows, queue, held, nb_collumns, self.max_pieces, self.max_height
+        ):
+            queue_used = queue[: nb_pieces + 1]
+            branches = list(
+                Search(queue_used).branches(heights, box, 0, held, can_hold)
+            )
+            futures = [
+                self.pool.submit(
+                    search_branches, branches[i::workers], queue_used, deadline
+                )
+                for i in range(min(workers, len(branches)))
+            ]
+            for future in concurrent.futures.as_completed(futures):
+                placements = future.result()
+                if placements is not None:
+                    for other in futures:
+                        other.cancel()
+                    return box, placements
+            if deadline and time.monotonic() > deadline:
+                return None
+        return None
+
+    def close(self):
+        if self.pool:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+
+def perfect_clear(game, max_pieces=MAX_PIECES, max_height=MAX_HEIGHT, time_budget=None):
+    """solve() on the current state of a TetrisLogic `game`"""
+    return solve(
+        *snapshot(game), game.matrix.collumns, max_pieces, max_height, time_budget
+    )
+
+
+def hint(rows, queue, held, can_hold, nb_collumns, time_budget=0.1):
+    """first Placement of a perfect clear found in `time_budget` seconds,
+    else bot.best_placement. Can be run in another process."""
+    solution = solve(rows, queue, held, can_hold, nb_collumns, time_budget=time_budget)
+    if solution:
+        return solution[1][0]
+    return best_placement(rows, queue, held, can_hold, nb_collumns)
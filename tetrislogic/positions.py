@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""Starting positions and position library files
+
+    write_library("drills.positions", positions)
+    with PositionLibrary("drills.positions") as library:
+        game.new_game(position=library[1234])
+
+A position is a matrix content, the falling piece, the held piece and the
+next queue. Library files hold any number of positions, each stored with
+its lines up to the highest non-empty one, and end with an index of their
+offsets: a library is memory-mapped and any position is read in O(1),
+without loading the others.
+"""
+
+
+import mmap
+import struct
+from collections import namedtuple
+
+from .consts import COLLUMNS
+from .utils import Color
+from .tetromino import Tetromino
+from .stream import shape_id, cell_value, NO_PIECE, EMPTY_CELL
+
+
+MAGIC = b"TPOS"
+VERSION = 1
+
+# magic, version, collumns, positions, index offset
+HEADER = struct.Struct("<4sBBIQ")
+# piece, held, next pieces, lines, name size
+RECORD = struct.Struct("<BBBBH")
+INDEX_ENTRY = struct.Struct("<Q")  # record offset
+
+# Matrix lines, line 0 first: bytes of one cell value per collumn,
+# 0 if free, else mino color + 1 (as BufferedMatrix cells).
+# Shapes are Tetromino.shapes indexes, held is None if there is no held piece.
+Position = namedtuple("Position", "name matrix piece held next")
+
+SHAPES = {shape.__name__[0]: n for n, shape in enumerate(Tetromino.shapes)}
+
+
+def trimmed(lines):
+    """`lines` without their empty top lines"""
+    lines = [bytes(line) for line in lines]
+    while lines and not any(lines[-1]):
+        lines.pop()
+    return tuple(lines)
+
+
+def position(game, name=""):
+    """Position of a TetrisLogic `game`, its falling piece not placed yet"""
+    return Position(
+        name,
+        trimmed([cell_value(mino) for mino in line] for line in game.matrix),
+        shape_id(game.matrix.piece),
+        None if game.held.piece is None else shape_id(game.held.piece),
+        tuple(shape_id(piece) for piece in game.next.pieces),
+    )
+
+
+def from_rows(rows, piece, held=None, next_pieces="", name="", collumns=COLLUMNS):
+    """Position from text: `rows` top line first, "." or " " for a free cell,
+    any other character for a garbage mino. Shapes by letter: "T", "IJL"..."""
+    free = (EMPTY_CELL,) * collumns
+    lines = []
+    for row in reversed(rows):
+        line = [
+            EMPTY_CELL if char in ". " else Color.GARBAGE + 1 for char in row[:collumns]
+        ]
+        lines.append(bytes(line + list(free[len(line) :])))
+    return Position(
+        name,
+        trimmed(lines),
+        SHAPES[piece],
+        None if held is None else SHAPES[held],
+        tuple(SHAPES[shape] for shape in next_pieces),
+    )
+
+
+def write_library(path, positions, collumns=COLLUMNS):
+    """write the `positions` iterable (of any length) to library file `path`"""
+    offsets = []
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, collumns, 0, 0))
+        for pos in positions:
+            offsets.append(f.tell())
+            name = pos.name.encode("utf-8")
+            f.write(
+                RECORD.pack(
+                    pos.piece,
+                    NO_PIECE if pos.held is None else pos.held,
+                    len(pos.next),
+                    len(pos.matrix),
+                    len(name),
+                )
+            )
+            f.write(bytes(pos.next) + name)
+            for line in pos.matrix:
+                if len(line) != collumns:
+                    raise ValueError(
+                        "{} collumns line in a {} collumns library".format(
+                            len(line), collumns
+                        )
+                    )
+                f.write(line)
+        index_offset = f.tell()
+        for offset in offsets:
+            f.write(INDEX_ENTRY.pack(offset))
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, collumns, len(offsets), index_offset))
+
+
+class PositionLibrary:
+    """Memory-mapped position library file, a sequence of Position"""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.mmap) < HEADER.size:
+            raise ValueError("Not a position library: {}".format(path))
+        (
+            magic,
+            version,
+            self.collumns,
+            self.nb_positions,
+            self.index_offset,
+        ) = HEADER.unpack_from(self.mmap)
+        if magic != MAGIC or self.index_offset == 0:
+            raise ValueError("Not a complete position library: {}".format(path))
+        if version != VERSION:
+            raise ValueError("Unsupported position library version: {}".format(version))
+
+    def close(self):
+        self.mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.nb_positions
+
+    def __getitem__(self, n):
+        if n < 0:
+            n += self.nb_positions
+        if not 0 <= n < self.nb_positions:
+            raise IndexError("position index out of range")
+        mm = self.mmap
+        (offset,) = INDEX_ENTRY.unpack_from(
+            mm, self.index_offset + n * INDEX_ENTRY.size
+        )
+        piece, held, nb_next, nb_lines, name_size = RECORD.unpack_from(mm, offset)
+        offset += RECORD.size
+        next_pieces = tuple(mm[offset : offset + nb_next])
+        offset += nb_next
+        name = mm[offset : offset + name_size].decode("utf-8")
+        offset += name_size
+        collumns = self.collumns
+        matrix = tuple(
+            mm[start : start + collumns]
+            for start in range(offset, offset + nb_lines * collumns, collumns)
+        )
+        return Position(
+            name, matrix, piece, None if held == NO_PIECE else held, next_pieces
+        )
+
+    def __iter__(self):
+        for n in range(self.nb_positions):
+            yield self[n]
@@ -0,0 +1,462 @@
+# -*- coding: utf-8 -*-
+"""Seekable replay files
+
+    game.record("game.replay")  # game is a RecordingLogic
+    game.new_game(seed=42)
+    ...
+    replay = Replay("game.replay")
+    mirror = replay.state(piece=500)  # StateMirror, without simulation
+    game, offset = replay.game_at(piece=500)
+    replay.play(game, offset)  # simulates the rest of the game
+
+A replay is the game seed and its timed actions (and received garbage),
+enough to simulate it again, plus a keyframe every `keyframe_period`
+pieces: a StateStream snapshot and the engine state left. An index of the
+keyframes ends the file, so a viewer reads the header, the footer and one
+keyframe to seek anywhere, whatever the length of the game. Files are
+memory-mapped: only the pages read are loaded.
+
+Times are those of the game timer. Games on a VirtualScheduler, whose
+actions are done between timer advances, replay exactly.
+"""
+
+
+import math
+import mmap
+import random
+import struct
+
+from .utils import Mode, Coord
+from .tetromino import Mino, Tetromino
+from .tetrislogic import TetrisLogic, VirtualScheduler
+from .stream import StateStream, StateMirror, EMPTY_CELL, NO_PIECE
+from .env import HeadlessTetrisLogic
+
+
+MAGIC = b"TRPL"
+VERSION = 1
+KEYFRAME_PERIOD = 100  # pieces between keyframes
+
+MODES = (Mode.MARATHON, Mode.SPRINT, Mode.ULTRA)
+# Action codes of the records
+ACTIONS = (
+    "move_left",
+    "move_right",
+    "soft_drop",
+    "hard_drop",
+    "rotate_clockwise",
+    "rotate_counter",
+    "hold",
+    "pause",
+    "resume",
+)
+CODES = {name: code for code, name in enumerate(ACTIONS)}
+GARBAGE = 0xFE  # received garbage, value is the number of lines
+KEYFRAME = 0xFF
+
+# magic, version, mode, level, seed, lines, collumns, next, keyframe period, start
+HEADER = struct.Struct("<4sBBHqHHHHd")
+RECORD = struct.Struct("<dBB")  # time, code, value (1 pressed, 0 released)
+KEYFRAME_STATE = struct.Struct("<IqihihBiddddIddBBH")
+INDEX_ENTRY = struct.Struct("<IdQ")  # piece, time, record offset
+# index offset, keyframes, end time, score, lines cleared, magic
+FOOTER = struct.Struct("<QIdqi4s")
+
+NO_TIME = math.nan
+
+
+class ReplayWriter:
+    """Writes the game of a RecordingLogic to a replay file"""
+
+    def __init__(self, path, game, keyframe_period=KEYFRAME_PERIOD):
+        self.path = path
+        self.game = game
+        self.keyframe_period = keyframe_period
+        self.stream = StateStream(game)
+        self.file = None
+
+    def new_game(self, level, mode, seed):
+        game = self.game
+        self.file = open(self.path, "wb")
+        self.file.write(
+            HEADER.pack(
+                MAGIC,
+                VERSION,
+                MODES.index(mode),
+                level,
+                seed,
+                game.matrix.lines,
+                game.matrix.collumns,
+                game.next.nb_pieces,
+                self.keyframe_period,
+                game.timer.time(),
+            )
+        )
+        self.index = []
+        self.nb_pieces = 0
+        self.nb_holes = 0
+
+    def record(self, code, value):
+        self.file.write(RECORD.pack(self.game.timer.time(), code, value))
+
+    def new_piece(self):
+        if self.nb_pieces % self.keyframe_period == 0:
+            self.keyframe()
+        self.nb_pieces += 1
+
+    def keyframe(self):
+        """engine state as the falling piece is generated, before it falls"""
+        game = self.game
+        stats = game.stats
+        timer = game.timer
+        snapshot = self.stream.snapshot()
+        pressed = bytes(CODES[action.__name__] for action in game.pressed_actions)
+        garbage = struct.pack("<{}H".format(len(game.garbage)), *game.garbage)
+        self.index.append((self.nb_pieces, timer.time(), self.file.tell()))
+        self.record(KEYFRAME, 0)
+        self.file.write(
+            KEYFRAME_STATE.pack(
+                self.nb_pieces,
+                stats.score,
+                stats.lines_cleared,
+                stats.level,
+                stats.goal,
+                stats.combo,
+                stats.back_to_back,
+                stats.lines_sent,
+                stats.fall_delay,
+                stats.lock_delay,
+                stats._time,
+                NO_TIME if stats.running_since is None else stats.running_since,
+                self.nb_holes,
+                due(timer, game.repeat_action),
+                due(timer, game.time_up),
+                len(pressed),
+                len(game.garbage),
+                len(snapshot),
+            )
+        )
+        self.file.write(pressed + garbage + snapshot)
+
+    def close(self):
+        """write the index and the footer"""
+        game = self.game
+        index_offset = self.file.tell()
+        for entry in self.index:
+            self.file.write(INDEX_ENTRY.pack(*entry))
+        self.file.write(
+            FOOTER.pack(
+                index_offset,
+                len(self.index),
+                game.timer.time(),
+                game.stats.score,
+                game.stats.lines_cleared,
+                MAGIC,
+            )
+        )
+        self.file.close()
+        self.file = None
+
+
+def due(timer, task):
+    """time `task` is scheduled at on a VirtualScheduler, NO_TIME if it is not"""
+    entries = getattr(timer, "tasks", {}).get(task)
+    if entries:
+        return entries[0][0]
+    return NO_TIME
+
+
+class RecordingLogic(TetrisLogic):
+    """TetrisLogic mixin writing a game to a replay file, see record().
+    Put it before the other TetrisLogic classes in the bases."""
+
+    recording = None
+
+    def record(self, path, keyframe_period=KEYFRAME_PERIOD):
+        """record the next game to replay file `path`"""
+        self.stop_recording()
+        self.recording = ReplayWriter(path, self, keyframe_period)
+
+    def stop_recording(self):
+        """end the replay file of the game being recorded"""
+        if self.recording and self.recording.file:
+            self.recording.close()
+        self.recording = None
+
+    def new_game(self, level=1, mode=Mode.MARATHON, seed=None, position=None):
+        if self.recording:
+            if self.recording.file or position is not None:
+                # Previous game was not over, or starts from a position
+                # that replay files can't hold
+                self.stop_recording()
+            else:
+                if seed is None:
+                    seed = random.getrandbits(63)
+                self.recording.new_game(level, mode, seed)
+        super().new_game(level, mode, seed, position)
+
+    def on_generation_phase(self, matrix, falling_piece, ghost_piece, next_pieces):
+        super().on_generation_phase(matrix, falling_piece, ghost_piece, next_pieces)
+        # Pieces taken back from hold can't be held again
+        if self.recording and falling_piece.hold_enabled:
+            self.recording.new_piece()
+
+    def on_garbage(self, matrix, nb_lines, hole):
+        super().on_garbage(matrix, nb_lines, hole)
+        if self.recording:
+            self.recording.nb_holes += 1
+
+    def receive_garbage(self, nb_lines):
+        if self.recording and nb_lines:
+            self.recording.record(GARBAGE, nb_lines)
+        super().receive_garbage(nb_lines)
+
+    def do_action(self, action):
+        if self.recording and action.__name__ in CODES:
+            self.recording.record(CODES[action.__name__], 1)
+        super().do_action(action)
+
+    def remove_action(self, action):
+        if self.recording and action in self.autorepeatable_actions:
+            self.recording.record(CODES[action.__name__], 0)
+        super().remove_action(action)
+
+    def game_over(self):
+        super().game_over()
+        self.stop_recording()
+
+
+class Replay:
+    """Memory-mapped replay file"""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.mmap) < HEADER.size + FOOTER.size:
+            raise ValueError("Not a complete replay file: {}".format(path))
+        (
+            magic,
+            version,
+            mode,
+            self.level,
+            self.seed,
+            self.lines,
+            self.collumns,
+            self.nb_next_pieces,
+            self.keyframe_period,
+            self.start,
+        ) = HEADER.unpack_from(self.mmap)
+        (
+            self.index_offset,
+            self.nb_keyframes,
+            self.end,
+            self.score,
+            self.lines_cleared,
+            end_magic,
+        ) = FOOTER.unpack_from(self.mmap, len(self.mmap) - FOOTER.size)
+        if magic != MAGIC or end_magic != MAGIC:
+            raise ValueError("Not a complete replay file: {}".format(path))
+        if version != VERSION:
+            raise ValueError("Unsupported replay version: {}".format(version))
+        self.mode = MODES[mode]
+
+    def close(self):
+        self.mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Index
+
+    def keyframe(self, n):
+        """(piece, time, offset) of keyframe `n`"""
+        return INDEX_ENTRY.unpack_from(
+            self.mmap, self.index_offset + n * INDEX_ENTRY.size
+        )
+
+    def seek(self, piece):
+        """last keyframe at or before `piece`"""
+        return min(piece // self.keyframe_period, self.nb_keyframes - 1)
+
+    def seek_time(self, time):
+        """last keyframe at or before `time`"""
+        low, high = 0, self.nb_keyframes
+        while high - low > 1:
+            middle = (low + high) // 2
+            if self.keyframe(middle)[1] <= time:
+                low = middle
+            else:
+                high = middle
+        return low
+
+    # Reading
+
+    def records(self, offset=HEADER.size):
+        """(offset, time, code, value) of the records from `offset`,
+        keyframes included"""
+        mm = self.mmap
+        while offset < self.index_offset:
+            time, code, value = RECORD.unpack_from(mm, offset)
+            yield offset, time, code, value
+            offset += RECORD.size
+            if code == KEYFRAME:
+                nb_pressed, nb_garbage, snapshot_size = KEYFRAME_STATE.unpack_from(
+                    mm, offset
+                )[-3:]
+                offset += (
+                    KEYFRAME_STATE.size + nb_pressed + 2 * nb_garbage + snapshot_size
+                )
+
+    def keyframe_state(self, n):
+        """engine state and snapshot packet of keyframe `n`"""
+        piece, time, offset = self.keyframe(n)
+        offset += RECORD.size
+        state = KEYFRAME_STATE.unpack_from(self.mmap, offset)
+        nb_pressed, nb_garbage, snapshot_size = state[-3:]
+        offset += KEYFRAME_STATE.size
+        pressed = self.mmap[offset : offset + nb_pressed]
+        offset += nb_pressed
+        garbage = struct.unpack_from("<{}H".format(nb_garbage), self.mmap, offset)
+        offset += 2 * nb_garbage
+        snapshot = self.mmap[offset : offset + snapshot_size]
+        return state, pressed, garbage, snapshot, offset + snapshot_size
+
+    def state(self, piece=0):
+        """StateMirror at the last keyframe before `piece`, without simulation"""
+        mirror = StateMirror()
+        mirror.apply(self.keyframe_state(self.seek(piece))[3])
+        return mirror
+
+    # Simulation
+
+    def new_game(self, game=None):
+        """game started as recorded and offset of its first record"""
+        if game is None:
+            game = HeadlessTetrisLogic(self.lines, self.collumns, self.nb_next_pieces)
+        game.timer = VirtualScheduler()
+        game.timer.now = self.start
+        game.stats.clock = game.timer.time
+        game.new_game(self.level, self.mode, self.seed)
+        return game, HEADER.size
+
+    def game_at(self, piece=0, game=None):
+        """game restored at the last keyframe before `piece`,
+        and offset of the records following it"""
+        if game is None:
+            game = HeadlessTetrisLogic(self.lines, self.collumns, self.nb_next_pieces)
+        n = self.seek(piece)
+        state, pressed, garbage, snapshot, offset = self.keyframe_state(n)
+        (
+            nb_pieces,
+            score,
+            lines_cleared,
+            level,
+            goal,
+            combo,
+            back_to_back,
+            lines_sent,
+            fall_delay,
+            lock_delay,
+            game_time,
+            running_since,
+            nb_holes,
+            repeat_due,
+            time_up_due,
+        ) = state[:-3]
+        mirror = StateMirror()
+        mirror.apply(snapshot)
+
+        timer = game.timer = VirtualScheduler()
+        timer.now = self.keyframe(n)[1]
+        game.mode = self.mode
+        game.over = False
+
+        stats = game.stats
+        stats.clock = timer.time
+        stats.new_game(level)
+        stats.level = level
+        stats.score = score
+        stats.high_score = mirror.stats["high_score"]
+        stats.lines_cleared = lines_cleared
+        stats.goal = goal
+        stats.combo = combo
+        stats.back_to_back = bool(back_to_back)
+        stats.lines_sent = lines_sent
+        stats.fall_delay = fall_delay
+        stats.lock_delay = lock_delay
+        stats._time = game_time
+        stats.running_since = None if math.isnan(running_since) else running_since
+
+        game.matrix.new_game()
+        for y, line in enumerate(mirror.matrix):
+            for x, value in enumerate(line):
+                if value != EMPTY_CELL:
+                    game.matrix[y][x] = Mino(value - 1, Coord(x, y))
+        game.held.piece = new_piece(mirror.held)
+        if game.held.piece:
+            game.held.piece.hold_enabled = False
+        game.next.pieces = [new_piece(shape) for shape in mirror.next]
+        game.next.preset = []
+        game.next.bag = bag(
+            game.next.random, self.seed, len(mirror.next) + nb_pieces + 1
+        )
+        game.garbage = list(garbage)
+        game.garbage_random.seed(self.seed)
+        for n in range(nb_holes):
+            game.garbage_random.randrange(game.matrix.collumns)
+
+        game.pressed_actions = [getattr(game, ACTIONS[code]) for code in pressed]
+        if not math.isnan(repeat_due):
+            timer.postpone(game.repeat_action, repeat_due - timer.now)
+        if not math.isnan(time_up_due):
+            timer.postpone(game.time_up, time_up_due - timer.now)
+        game.matrix.piece = new_piece(mirror.pose[0])
+        game.generation_phase(game.matrix.piece)
+        return game, offset
+
+    def play(self, game, offset=HEADER.size, until=None):
+        """simulate `game` with the records from `offset` up to time `until`,
+        the end of the game by default. Returns the offset reached."""
+        if until is None:
+            until = self.end
+        for offset, time, code, value in self.records(offset):
+            if game.over:
+                return offset
+            if time > until:
+                break
+            game.timer.advance_to(time)
+            if code == GARBAGE:
+                game.receive_garbage(value)
+            elif code != KEYFRAME:
+                action = getattr(game, ACTIONS[code])
+                if value:
+                    game.do_action(action)
+                else:
+                    game.remove_action(action)
+        else:
+            offset = self.index_offset
+        if not game.over:
+            game.timer.advance_to(until)
+        return offset
+
+
+def new_piece(shape):
+    if shape == NO_PIECE:
+        return None
+    return Tetromino.shapes[shape]()
+
+
+def bag(random_generator, seed, nb_pieces):
+    """NextQueue bag content after `nb_pieces` were drawn with `seed`:
+    the generator only shuffles one bag every len(Tetromino.shapes) pieces"""
+    random_generator.seed(seed)
+    shapes = Tetromino.shapes
+    nb_bags = -(-nb_pieces // len(shapes))
+    content = []
+    for n in range(nb_bags):
+        content = list(shapes)
+        random_generator.shuffle(content)
+    return content[: nb_bags * len(shapes) - nb_pieces]
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+"""Game state published in shared memory for out-of-process agents
+
+The segment holds, at fixed offsets, a header with a sequence counter,
+the matrix cells, the falling piece pose, the held and next pieces,
+the stats and a ring buffer of actions sent back by the agent.
+The sequence counter is odd while the state is being written: readers
+retry if it changed or was odd during their read (seqlock).
+
+The matrix cells are those of the game BufferedMatrix, backed by the
+segment: the engine writes them in place and the counter turns odd at
+its first write. The rest of the state is written, and the counter made
+even again, when the game events are dispatched: the engine owner must
+call game.events.dispatch() after each step (as the GUI does each
+frame), else agents only see the state left by play_actions.
+"""
+
+
+import struct
+from multiprocessing import shared_memory
+
+from .events import EVENTS
+from .tetrislogic import BufferedMatrix
+from .stream import (
+    PIECE_POSE,
+    STATS_FIELDS,
+    STATS_VALUES,
+    piece_pose,
+    shape_id,
+    stats_values,
+)
+
+
+MAGIC = b"TETR"
+HEADER = struct.Struct("<4sIHHHH")  # magic, seq, lines, collumns, next, ring size
+SEQ = struct.Struct("<I")
+SEQ_OFFSET = 4
+RING_INDEXES = struct.Struct("<II")  # head (written by agent), tail (by engine)
+RING_SIZE = 256  # power of 2
+
+# Action codes of the ring buffer
+ACTIONS = (
+    "move_left",
+    "move_right",
+    "soft_drop",
+    "hard_drop",
+    "rotate_clockwise",
+    "rotate_counter",
+    "hold",
+)
+
+
+class Layout:
+    """Offsets of each field in the segment"""
+
+    def __init__(self, nb_lines, nb_collumns, nb_next, ring_size):
+        self.nb_lines = nb_lines
+        self.nb_collumns = nb_collumns
+        self.nb_next = nb_next
+        self.ring_size = ring_size
+        self.matrix = HEADER.size
+        self.pose = self.matrix + nb_lines * nb_collumns
+        self.held = self.pose + PIECE_POSE.size
+        self.next = self.held + 1
+        self.stats = self.next + nb_next
+        self.ring_indexes = -(-(self.stats + STATS_VALUES.size) // 4) * 4
+        self.ring = self.ring_indexes + RING_INDEXES.size
+        self.size = self.ring + ring_size
+
+    @classmethod
+    def read(cls, buf):
+        magic, seq, nb_lines, nb_collumns, nb_next, ring_size = HEADER.unpack_from(buf)
+        if magic != MAGIC:
+            raise ValueError("Not a TetrisLogic shared memory segment")
+        return cls(nb_lines, nb_collumns, nb_next, ring_size)
+
+
+class SharedState:
+    """Publishes a TetrisLogic game into a shared memory segment, on
+    game.events.dispatch() and after play_actions, and plays the actions
+    agents write in its ring buffer"""
+
+    def __init__(self, game, name=None, ring_size=RING_SIZE):
+        """`game` matrix must be a BufferedMatrix (see MATRIX_CLASS)"""
+        if not isinstance(game.matrix, BufferedMatrix):
+            raise TypeError("Shared game matrix must be a BufferedMatrix")
+        # Power of 2 so that indexes stay in order when they wrap at 2**32
+        if not 0 < ring_size <= 2**15 or ring_size & (ring_size - 1):
+            raise ValueError("Ring size must be a power of 2 up to 2**15")
+        self.game = game
+        self.layout = Layout(
+            game.matrix.lines + 3, game.matrix.collumns, game.next.nb_pieces, ring_size
+        )
+        if len(game.matrix.cells) != self.layout.pose - self.layout.matrix:
+            raise ValueError("Matrix cells buffer size does not match its size")
+        self.shm = shared_memory.SharedMemory(name, create=True, size=self.layout.size)
+        self.buf = self.shm.buf
+        HEADER.pack_into(
+            self.buf,
+            0,
+            MAGIC,
+            0,
+            self.layout.nb_lines,
+            self.layout.nb_collumns,
+            self.layout.nb_next,
+            ring_size,
+        )
+        RING_INDEXES.pack_into(self.buf, self.layout.ring_indexes, 0, 0)
+        self.seq = 0
+        self.invalid_actions = 0  # action codes out of ACTIONS, skipped
+        # The engine writes its cells in the segment
+        cells = self.buf[self.layout.matrix : self.layout.pose]
+        cells[:] = game.matrix.cells
+        game.matrix.cells = cells
+        game.matrix.on_cells_write = self.begin_write
+        # Any event means the state changed
+        game.events.subscribe(self.on_events, *EVENTS)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def on_events(self, events):
+        self.publish()
+
+    def begin_write(self):
+        """make the counter odd until the next publish"""
+        if not self.seq % 2:
+            self.seq += 1
+            SEQ.pack_into(self.buf, SEQ_OFFSET, self.seq)
+
+    def publish(self):
+        """write what the engine does not write in place and end the write"""
+        game = self.game
+        layout = self.layout
+        buf = self.buf
+        self.begin_write()
+
+        PIECE_POSE.pack_into(buf, layout.pose, *piece_pose(game.matrix.piece))
+        buf[layout.held] = shape_id(game.held.piece)
+        next_pieces = bytes(shape_id(piece) for piece in game.next.pieces)
+        buf[layout.next : layout.next + len(next_pieces)] = next_pieces
+        STATS_VALUES.pack_into(buf, layout.stats, *stats_values(game.stats))
+
+        self.seq += 1
+        SEQ.pack_into(buf, SEQ_OFFSET, self.seq)
+
+    def play_actions(self):
+        """do actions queued by agents and publish the resulting state,
+        returns how many were done. Once the game is over, queued actions
+        are dropped."""
+        layout = self.layout
+        head, tail = RING_INDEXES.unpack_from(self.buf, layout.ring_indexes)
+        nb_actions = (head - tail) % 2**32
+        nb_done = 0
+        for n in range(nb_actions):
+            if self.game.over:
+                break
+            code = self.buf[layout.ring + (tail + n) % layout.ring_size]
+            if code >= len(ACTIONS):
+                self.invalid_actions += 1
+                continue
+            action = getattr(self.game, ACTIONS[code])
+            self.game.do_action(action)
+            self.game.remove_action(action)
+            nb_done += 1
+        if nb_actions:
+            struct.pack_into("<I", self.buf, layout.ring_indexes + 4, head)
+        if nb_done:
+            self.publish()
+        return nb_done
+
+    def close(self):
+        """unpublish, the game keeps a copy of its cells"""
+        self.game.events.unsubscribe(self.on_events)
+        matrix = self.game.matrix
+        cells, matrix.cells = matrix.cells, bytearray(matrix.cells)
+        del matrix.on_cells_write
+        cells.release()
+        self.buf = None
+        self.shm.close()
+        self.shm.unlink()
+
+
+class SharedStateClient:
+    """Agent side: reads the published state and sends actions"""
+
+    def __init__(self, name):
+        self.shm = shared_memory.SharedMemory(name)
+        self.buf = self.shm.buf
+        self.layout = Layout.read(self.buf)
+
+    @property
+    def seq(self):
+        return SEQ.unpack_from(self.buf, SEQ_OFFSET)[0]
+
+    def matrix_view(self):
+        """(lines, collumns) NumPy array over the shared cells, without copy.
+        Check seq before and after use for consistency."""
+        import numpy as np
+
+        return np.ndarray(
+            (self.layout.nb_lines, self.layout.nb_collumns),
+            np.uint8,
+            self.buf,
+            self.layout.matrix,
+        )
+
+    def read(self):
+        """consistent copy of the state: (seq, cells, pose, held, next, stats)"""
+        layout = self.layout
+        while True:
+            seq = self.seq
+            if seq % 2:
+                continue
+            cells = bytes(self.buf[layout.matrix : layout.pose])
+            pose = PIECE_POSE.unpack_from(self.buf, layout.pose)
+            held = self.buf[layout.held]
+            next_pieces = bytes(self.buf[layout.next : layout.stats])
+            stats = dict(
+                zip(
+                    (name for name, fmt in STATS_FIELDS),
+                    STATS_VALUES.unpack_from(self.buf, layout.stats),
+                )
+            )
+            if self.seq == seq:
+                return seq, cells, pose, held, next_pieces, stats
+
+    def send(self, action):
+        """queue action name (see ACTIONS), False if the ring is full"""
+        layout = self.layout
+        head, tail = RING_INDEXES.unpack_from(self.buf, layout.ring_indexes)
+        if (head - tail) % 2**32 >= layout.ring_size:
+            return False
+        self.buf[layout.ring + head % layout.ring_size] = ACTIONS.index(action)
+        struct.pack_into("<I", self.buf, layout.ring_indexes, (head + 1) % 2**32)
+        return True
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
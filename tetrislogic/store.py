@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""Local SQLite store of player profiles and game sessions
+
+    store = Store("tetrarcade.sqlite")
+    store.add_session(session(game, "PLAYER"))
+    store.high_score("PLAYER", Mode.MARATHON)
+    store.close()
+
+Writes are queued and committed in batches, one transaction each, by a
+background thread: adding a session never waits on the disk. The database
+is in WAL mode so reads from other threads or processes are not blocked
+by the writer.
+"""
+
+
+import os
+import time
+import queue
+import sqlite3
+import threading
+import warnings
+from collections import namedtuple
+
+from .consts import SPRINT_LINES
+from .utils import Mode
+
+
+BATCH_SIZE = 1024  # sessions per transaction at most
+
+Session = namedtuple("Session", "profile mode started duration score lines level")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    profile_id INTEGER NOT NULL REFERENCES profiles(id),
+    mode TEXT NOT NULL,
+    started REAL NOT NULL,
+    duration REAL NOT NULL,
+    score INTEGER NOT NULL,
+    lines INTEGER NOT NULL,
+    level INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_by_score ON sessions (mode, score DESC);
+CREATE INDEX IF NOT EXISTS sessions_by_duration ON sessions (mode, duration);
+CREATE INDEX IF NOT EXISTS sessions_by_profile
+    ON sessions (profile_id, mode, score DESC);
+"""
+
+INSERT_PROFILE = "INSERT OR IGNORE INTO profiles (name, created) VALUES (?, ?)"
+INSERT_SESSION = """
+INSERT INTO sessions (profile_id, mode, started, duration, score, lines, level)
+VALUES ((SELECT id FROM profiles WHERE name = ?), ?, ?, ?, ?, ?, ?)
+"""
+
+
+def session(game, profile, started=None):
+    """Session of a TetrisLogic game, `started` being a time.time() timestamp"""
+    stats = game.stats
+    if started is None:
+        started = time.time() - stats.time
+    return Session(
+        profile,
+        game.mode,
+        started,
+        stats.time,
+        stats.score,
+        stats.lines_cleared,
+        stats.level,
+    )
+
+
+def connect(path):
+    connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+class Store:
+    """Profiles and sessions database with a background writer thread"""
+
+    def __init__(self, path, batch_size=BATCH_SIZE):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.batch_size = batch_size
+        self.connection = connect(path)
+        self.connection.executescript(SCHEMA)
+        self.last_error = None
+        self.queue = queue.Queue()
+        self.writer = threading.Thread(target=self.write_loop, daemon=True)
+        self.writer.start()
+
+    # Writes, asynchronous
+
+    def add_session(self, session):
+        self.queue.put((session,))
+
+    def add_sessions(self, sessions):
+        """batch of sessions, from a simulation harness for example"""
+        sessions = tuple(sessions)
+        if sessions:
+            self.queue.put(sessions)
+
+    def write_loop(self):
+        """write queued sessions until None is queued. Errors are recorded
+        in last_error and the queue is still consumed, so flush never hangs."""
+        connection = None
+        stop = False
+        while not stop:
+            batches = [self.queue.get()]
+            try:
+                size = len(batches[0] or ())
+                while size < self.batch_size:
+                    try:
+                        batch = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    batches.append(batch)
+                    size += len(batch or ())
+                sessions = []
+                for batch in batches:
+                    if batch is None:
+                        stop = True
+                    else:
+                        sessions.extend(batch)
+                if sessions:
+                    if connection is None:
+                        # Retried at each batch until the database opens
+                        connection = self.connect()
+                    if connection is not None:
+                        self.write(connection, sessions)
+            finally:
+                for batch in batches:
+                    self.queue.task_done()
+        if connection is not None:
+            connection.close()
+
+    def connect(self):
+        """writer connection, None if the database can't be opened"""
+        try:
+            return connect(self.path)
+        except Exception as e:
+            self.last_error = e
+            warnings.warn("Sessions could not be saved: {}".format(e))
+            return None
+
+    def write(self, connection, sessions):
+        now = time.time()
+        try:
+            with connection:
+                connection.executemany(
+                    INSERT_PROFILE,
+                    ((profile, now) for profile in {s.profile for s in sessions}),
+                )
+                connection.executemany(INSERT_SESSION, sessions)
+        except Exception as e:
+            # Sessions are lost but the game goes on
+            self.last_error = e
+            warnings.warn("Sessions could not be saved: {}".format(e))
+
+    def flush(self):
+        """wait until queued sessions are written"""
+        self.queue.join()
+
+    def close(self):
+        self.queue.put(None)
+        self.writer.join()
+        self.connection.close()
+
+    # Reads, synchronous
+
+    def profiles(self):
+        return [
+            name
+            for (name,) in self.connection.execute(
+                "SELECT name FROM profiles ORDER BY name"
+            )
+        ]
+
+    def high_score(self, profile, mode=Mode.MARATHON):
+        (high_score,) = self.connection.execute(
+            """
+            SELECT MAX(score) FROM sessions
+            WHERE profile_id = (SELECT id FROM profiles WHERE name = ?)
+            AND mode = ?
+            """,
+            (profile, mode),
+        ).fetchone()
+        return high_score or 0
+
+    def leaderboard(self, mode=Mode.MARATHON, limit=10):
+        """best sessions of all profiles: highest scores,
+        or shortest times of completed sprints"""
+        if mode == Mode.SPRINT:
+            where, order = "AND lines >= {:d}".format(SPRINT_LINES), "duration"
+        else:
+            where, order = "", "score DESC"
+        return [
+            Session(*row)
+            for row in self.connection.execute(
+                """
+                SELECT profiles.name, mode, started, duration, score, lines, level
+                FROM sessions JOIN profiles ON profiles.id = sessions.profile_id
+                WHERE mode = ? {}
+                ORDER BY {} LIMIT ?
+                """.format(where, order),
+                (mode, limit),
+            )
+        ]
+
+    def sessions(self, profile):
+        """sessions of a profile, oldest first"""
+        return [
+            Session(profile, *row)
+            for row in self.connection.execute(
+                """
+                SELECT mode, started, duration, score, lines, level FROM sessions
+                WHERE profile_id = (SELECT id FROM profiles WHERE name = ?)
+                ORDER BY started
+                """,
+                (profile,),
+            )
+        ]
@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+"""Compact state streaming for spectators and remote displays
+
+A spectator receives a full snapshot when joining (and periodically after),
+then only the per-tick deltas recorded from the engine callbacks:
+changed cells, cleared lines, garbage lines, piece pose, next/hold changes
+and stat deltas.
+"""
+
+
+import struct
+
+from .utils import Color
+from .tetromino import Tetromino
+from .tetrislogic import TetrisLogic
+
+
+# Packet types
+SNAPSHOT = b"S"
+DELTA = b"D"
+
+# Delta operations
+CELLS = 1
+LINES = 2
+POSE = 3
+NEXT = 4
+HOLD = 5
+STATS = 6
+GARBAGE = 7
+
+NO_PIECE = 0xFF
+EMPTY_CELL = 0
+
+STATS_FIELDS = (
+    ("score", "q"),
+    ("lines_cleared", "i"),
+    ("level", "h"),
+    ("goal", "i"),
+    ("combo", "h"),
+    ("high_score", "q"),
+)
+
+HEADER = struct.Struct("<BB")
+CELL = struct.Struct("<BBB")
+PIECE_POSE = struct.Struct("<BbbBB")
+STATS_VALUES = struct.Struct("<" + "".join(fmt for name, fmt in STATS_FIELDS))
+
+
+def shape_id(piece):
+    if piece is None:
+        return NO_PIECE
+    return Tetromino.shapes.index(type(piece))
+
+
+def cell_value(mino):
+    return mino.color + 1 if mino else EMPTY_CELL
+
+
+def piece_pose(piece):
+    if piece is None:
+        return (NO_PIECE, 0, 0, 0, 0)
+    return (
+        shape_id(piece),
+        piece.coord.x,
+        piece.coord.y,
+        piece.orientation,
+        getattr(piece, "locked", False),
+    )
+
+
+def stats_values(stats):
+    return tuple(getattr(stats, name, 0) for name, fmt in STATS_FIELDS)
+
+
+class StateStream:
+    """Records engine callbacks and encodes them as snapshot or delta packets"""
+
+    SNAPSHOT_PERIOD = 600  # ticks between keyframe snapshots, 0 to disable
+
+    def __init__(self, game):
+        self.game = game
+        self.ops = []
+        self.ticks = 0
+        self.sent_pose = None
+        self.sent_stats = None
+
+    def reset(self):
+        """forget pending operations, the next tick sends a snapshot"""
+        self.ops = []
+        self.sent_pose = None
+        self.sent_stats = None
+
+    # Callbacks recording
+
+    def locks_down(self, matrix, falling_piece):
+        cells = []
+        for mino in falling_piece:
+            coord = mino.coord + falling_piece.coord
+            if 0 <= coord.y < len(matrix):
+                cells.append(CELL.pack(coord.x, coord.y, cell_value(mino)))
+        self.ops.append(bytes((CELLS, len(cells))) + b"".join(cells))
+
+    def eliminate_phase(self, lines_to_remove):
+        self.ops.append(bytes((LINES, len(lines_to_remove), *lines_to_remove)))
+
+    def generation_phase(self, next_pieces, shifted):
+        if shifted:
+            self.ops.append(bytes((NEXT, shape_id(next_pieces[-1]))))
+
+    def hold(self, held_piece):
+        self.ops.append(bytes((HOLD, shape_id(held_piece))))
+
+    def garbage(self, nb_lines, hole):
+        self.ops.append(bytes((GARBAGE, nb_lines, hole)))
+
+    # Encoding
+
+    def snapshot(self):
+        """full state packet, sent on join and periodically"""
+        game = self.game
+        matrix = game.matrix
+        self.ops = []
+        self.sent_pose = piece_pose(matrix.piece)
+        self.sent_stats = stats_values(game.stats)
+        return b"".join(
+            (
+                SNAPSHOT,
+                HEADER.pack(len(matrix), matrix.collumns),
+                bytes(cell_value(mino) for line in matrix for mino in line),
+                PIECE_POSE.pack(*self.sent_pose),
+                bytes((shape_id(game.held.piece), len(game.next.pieces))),
+                bytes(shape_id(piece) for piece in game.next.pieces),
+                STATS_VALUES.pack(*self.sent_stats),
+            )
+        )
+
+    def delta(self):
+        """changes since last packet, or None if nothing changed"""
+        ops = self.ops
+        self.ops = []
+
+        pose = piece_pose(self.game.matrix.piece)
+        if pose != self.sent_pose:
+            ops.append(bytes((POSE,)) + PIECE_POSE.pack(*pose))
+            self.sent_pose = pose
+
+        values = stats_values(self.game.stats)
+        if values != self.sent_stats:
+            mask = 0
+            changes = []
+            for i, ((name, fmt), old, new) in enumerate(
+                zip(STATS_FIELDS, self.sent_stats, values)
+            ):
+                if old != new:
+                    mask |= 1 << i
+                    changes.append(struct.pack("<" + fmt, new))
+            ops.append(bytes((STATS, mask)) + b"".join(changes))
+            self.sent_stats = values
+
+        if ops:
+            return DELTA + b"".join(ops)
+        return None
+
+    def tick(self):
+        """packet to broadcast for this tick: a snapshot every SNAPSHOT_PERIOD
+        ticks or after a reset, else a delta (None if nothing changed)"""
+        self.ticks += 1
+        if self.sent_stats is None or (
+            self.SNAPSHOT_PERIOD and self.ticks % self.SNAPSHOT_PERIOD == 0
+        ):
+            return self.snapshot()
+        return self.delta()
+
+    def join(self):
+        """snapshot for a new spectator, does not disturb pending deltas"""
+        ops, pose, values = self.ops, self.sent_pose, self.sent_stats
+        packet = self.snapshot()
+        self.ops, self.sent_pose, self.sent_stats = ops, pose, values
+        return packet
+
+
+class StreamingLogic(TetrisLogic):
+    """TetrisLogic mixin feeding a StateStream from the on_* callbacks.
+    Put it before the GUI class in the bases so both get notified."""
+
+    _last_next = None
+
+    def __init__(self, *args, **kwargs):
+        self.stream = StateStream(self)
+        super().__init__(*args, **kwargs)
+
+    def on_new_game(self, matrix, next_pieces):
+        super().on_new_game(matrix, next_pieces)
+        self.stream.reset()
+
+    def on_generation_phase(self, matrix, falling_piece, ghost_piece, next_pieces):
+        super().on_generation_phase(matrix, falling_piece, ghost_piece, next_pieces)
+        self.stream.generation_phase(
+            next_pieces, next_pieces and next_pieces[-1] is not self._last_next
+        )
+        self._last_next = next_pieces[-1] if next_pieces else None
+
+    def on_locks_down(self, matrix, falling_piece):
+        super().on_locks_down(matrix, falling_piece)
+        self.stream.locks_down(matrix, falling_piece)
+
+    def on_eliminate_phase(self, matrix, lines_to_remove):
+        super().on_eliminate_phase(matrix, lines_to_remove)
+        self.stream.eliminate_phase(lines_to_remove)
+
+    def on_hold(self, held_piece):
+        super().on_hold(held_piece)
+        self.stream.hold(held_piece)
+
+    def on_garbage(self, matrix, nb_lines, hole):
+        super().on_garbage(matrix, nb_lines, hole)
+        self.stream.garbage(nb_lines, hole)
+
+
+class StateMirror:
+    """Spectator side: rebuilds the game state from received packets"""
+
+    def __init__(self):
+        self.matrix = []
+        self.collumns = 0
+        self.pose = piece_pose(None)
+        self.held = NO_PIECE
+        self.next = []
+        self.stats = dict.fromkeys(name for name, fmt in STATS_FIELDS)
+
+    def apply(self, packet):
+        kind, data = packet[:1], memoryview(packet)[1:]
+        if kind == SNAPSHOT:
+            self.apply_snapshot(data)
+        elif kind == DELTA:
+            self.apply_delta(data)
+        else:
+            raise ValueError("Unknown packet type: {!r}".format(kind))
+
+    def apply_snapshot(self, data):
+        nb_lines, self.collumns = HEADER.unpack_from(data)
+        i = HEADER.size
+        self.matrix = [
+            list(data[i + y * self.collumns : i + (y + 1) * self.collumns])
+            for y in range(nb_lines)
+        ]
+        i += nb_lines * self.collumns
+        self.pose = PIECE_POSE.unpack_from(data, i)
+        i += PIECE_POSE.size
+        self.held, nb_next = data[i], data[i + 1]
+        i += 2
+        self.next = list(data[i : i + nb_next])
+        i += nb_next
+        self.stats = dict(
+            zip((name for name, fmt in STATS_FIELDS), STATS_VALUES.unpack_from(data, i))
+        )
+
+    def apply_delta(self, data):
+        i = 0
+        while i < len(data):
+            op = data[i]
+            i += 1
+            if op == CELLS:
+                for n in range(data[i]):
+                    x, y, value = CELL.unpack_from(data, i + 1 + n * CELL.size)
+                    self.matrix[y][x] = value
+                i += 1 + data[i] * CELL.size
+            elif op == LINES:
+                for y in data[i + 1 : i + 1 + data[i]]:
+                    self.matrix.pop(y)
+                    self.matrix.append([EMPTY_CELL] * self.collumns)
+                i += 1 + data[i]
+            elif op == GARBAGE:
+                nb_lines, hole = data[i], data[i + 1]
+                garbage_cell = Color.GARBAGE + 1
+                del self.matrix[len(self.matrix) - nb_lines :]
+                self.matrix[0:0] = [
+                    [
+                        EMPTY_CELL if x == hole else garbage_cell
+                        for x in range(self.collumns)
+                    ]
+                    for y in range(nb_lines)
+                ]
+                i += 2
+            elif op == POSE:
+                self.pose = PIECE_POSE.unpack_from(data, i)
+                i += PIECE_POSE.size
+            elif op == NEXT:
+                self.next.pop(0)
+                self.next.append(data[i])
+                i += 1
+            elif op == HOLD:
+                self.held = data[i]
+                i += 1
+            elif op == STATS:
+                mask = data[i]
+                i += 1
+                for n, (name, fmt) in enumerate(STATS_FIELDS):
+                    if mask & 1 << n:
+                        (self.stats[name],) = struct.unpack_from("<" + fmt, data, i)
+                        i += struct.calcsize("<" + fmt)
+            else:
+                raise ValueError("Unknown delta operation: {}".format(op))
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""Player performance telemetry
+
+Pieces per second, actions per minute, finesse faults and input latency,
+aggregated with streaming counters and fixed-bucket histograms fed by
+the engine event bus.
+"""
+
+
+import bisect
+import json
+import time
+import threading
+
+from .events import NewGame, GenerationPhase, LocksDown, Action, GameOver
+from .finesse import FinesseTable, ACTIONS
+
+
+# Input latency histogram buckets upper bounds (milliseconds)
+LATENCY_BUCKETS = (0.5, 1, 2, 4, 8, 16, 33, 50, 100, 200, 500)
+
+
+class Histogram:
+    """Fixed-bucket histogram, the last bucket counts overflows"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0
+        self.sum = 0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += 1
+        self.sum += value
+
+    @property
+    def mean(self):
+        return self.sum / self.total if self.total else 0
+
+    def quantile(self, q):
+        """upper bound of the bucket holding the `q` quantile"""
+        if not self.total:
+            return 0
+        rank = q * self.total
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def export(self):
+        return {
+            "buckets": list(self.buckets),
+            "counts": list(self.counts),
+            "mean": self.mean,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+        }
+
+
+class Telemetry:
+    """Live player statistics of a TetrisLogic game"""
+
+    def __init__(
+        self, game, clock=time.perf_counter, finesse_cache=None, background=False
+    ):
+        """`finesse_cache` is the directory of the finesse table, generated
+        each time if None. With `background`, the table is loaded or generated
+        by a thread and finesse faults are counted once it is ready."""
+        self.game = game
+        self.clock = clock
+        self.finesse = None
+        if background:
+            threading.Thread(
+                target=self.load_finesse, args=(finesse_cache,), daemon=True
+            ).start()
+        else:
+            self.load_finesse(finesse_cache)
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.report = None
+        self.pressed_at = []
+        self.new_game()
+        game.events.subscribe(
+            self.on_events,
+            NewGame,
+            GenerationPhase,
+            LocksDown,
+            Action,
+            GameOver,
+        )
+
+    def load_finesse(self, directory):
+        self.finesse = FinesseTable.for_game(self.game, directory)
+
+    def new_game(self):
+        self.pieces = 0
+        self.actions = 0
+        self.finesse_faults = 0
+        self.finesse_pieces = 0  # checked for finesse
+        self.piece_actions = []
+        self.piece_soft_dropped = False
+
+    @property
+    def time(self):
+        """play time in seconds, pauses excluded"""
+        return self.game.stats.time
+
+    @property
+    def pps(self):
+        """pieces per second"""
+        t = self.time
+        return self.pieces / t if t > 0 else 0
+
+    @property
+    def apm(self):
+        """actions per minute"""
+        t = self.time
+        return 60 * self.actions / t if t > 0 else 0
+
+    @property
+    def finesse_faults_per_piece(self):
+        if not self.finesse_pieces:
+            return 0
+        return self.finesse_faults / self.finesse_pieces
+
+    # Input latency, from the input event to the first frame drawing its
+    # result, measured by the GUI
+
+    def key_pressed(self, at=None):
+        """input received `at` (clock time, now if None), its result shown by
+        the next frame drawn"""
+        self.pressed_at.append(self.clock() if at is None else at)
+
+    def frame_drawn(self):
+        if self.pressed_at:
+            now = self.clock()
+            for pressed_at in self.pressed_at:
+                self.latency.add(1000 * (now - pressed_at))
+            self.pressed_at = []
+
+    # Engine events
+
+    def on_events(self, events):
+        for event in events:
+            event_type = type(event)
+            if event_type is Action:
+                self.actions += 1
+                if event.name in ACTIONS:
+                    self.piece_actions.append(event.name)
+                elif event.name == "soft_drop":
+                    self.piece_soft_dropped = True
+            elif event_type is LocksDown:
+                self.pieces += 1
+                if self.finesse is not None and not self.piece_soft_dropped:
+                    self.finesse_pieces += 1
+                    self.finesse_faults += self.finesse.faults(
+                        event.piece, self.piece_actions
+                    )
+            elif event_type is GenerationPhase:
+                self.piece_actions = []
+                self.piece_soft_dropped = False
+            elif event_type is NewGame:
+                self.new_game()
+            elif event_type is GameOver:
+                self.report = self.export()
+
+    def export(self):
+        return {
+            "time": self.time,
+            "pieces": self.pieces,
+            "actions": self.actions,
+            "pps": self.pps,
+            "apm": self.apm,
+            "finesse_pieces": self.finesse_pieces,
+            "finesse_faults": self.finesse_faults,
+            "finesse_faults_per_piece": self.finesse_faults_per_piece,
+            "input_latency_ms": self.latency.export(),
+        }
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.export(), f, indent=2)
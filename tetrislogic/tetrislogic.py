@@ -5,9 +5,31 @@ Follows Tetris Guidelines 2009 (see https://tetris.fandom.com/wiki/Tetris_Guidel
 
 
 import pickle
-
-from .utils import Coord, Movement, Spin, T_Spin, T_Slot
-from .tetromino import Tetromino, T_Tetrimino
+import time
+import heapq
+import itertools
+import random
+
+from .utils import Coord, Movement, Spin, T_Spin, T_Slot, Mode, Color
+from .tetromino import Mino, Tetromino, T_Tetrimino
+from .events import (
+    EventBus,
+    NewGame,
+    NewLevel,
+    GenerationPhase,
+    FallingPhase,
+    Locked,
+    LocksDown,
+    EliminatePhase,
+    CompletionPhase,
+    Hold,
+    Action,
+    Pause,
+    Resume,
+    GameOver,
+    Attack,
+    Garbage,
+)
 from .consts import (
     LINES,
     COLLUMNS,
@@ -19,6 +41,11 @@ from .consts import (
     FALLING_PIECE_COORD,
     SCORES,
     LINES_CLEAR_NAME,
+    ATTACKS,
+    BACK_TO_BACK_ATTACK,
+    COMBO_ATTACKS,
+    SPRINT_LINES,
+    ULTRA_TIME,
 )
 
 
@@ -28,7 +55,7 @@ CRYPT_KEY = 987943759387540938469837689379857347598347598379584857934579343
 class AbstractScheduler:
     """Scheduler class to be implemented"""
 
-    def postpone(task, delay):
+    def postpone(self, task, delay):
         """schedule callable task once after delay in second"""
         raise Warning("AbstractScheduler.postpone is not implemented.")
 
@@ -38,8 +65,54 @@ class AbstractScheduler:
 
     def reset(self, task, delay):
         """cancel and reschedule task"""
-        self.timer.cancel(task)
-        self.timer.postpone(task, delay)
+        self.cancel(task)
+        self.postpone(task, delay)
+
+    def time(self):
+        """monotonic clock in seconds used for game time"""
+        return time.monotonic()
+
+
+class VirtualScheduler(AbstractScheduler):
+    """Scheduler on a virtual clock, advanced by the caller.
+    Runs games faster than real time, deterministically."""
+
+    def __init__(self):
+        self.now = 0
+        self.queue = []
+        self.tasks = {}
+        self.counter = itertools.count()
+
+    def postpone(self, task, delay):
+        entry = [self.now + delay, next(self.counter), task]
+        self.tasks.setdefault(task, []).append(entry)
+        heapq.heappush(self.queue, entry)
+
+    def cancel(self, task):
+        for entry in self.tasks.pop(task, ()):
+            entry[2] = None
+
+    def time(self):
+        return self.now
+
+    def advance(self, delay):
+        """run tasks due in the next `delay` seconds"""
+        self.advance_to(self.now + delay)
+
+    def advance_to(self, end):
+        """run tasks due until time `end`"""
+        while self.queue and self.queue[0][0] <= end:
+            entry = heapq.heappop(self.queue)
+            due, n, task = entry
+            if task is None:
+                continue
+            entries = self.tasks[task]
+            entries.remove(entry)
+            if not entries:
+                del self.tasks[task]
+            self.now = due
+            task()
+        self.now = end
 
 
 class AbstractPieceContainer:
@@ -69,12 +142,43 @@ class Matrix(list, AbstractPieceContainer):
         for y in range(self.lines + 3):
             self.append_new_line()
 
+    def load(self, lines):
+        """new_game with the minoes of `lines`, line 0 first:
+        cell values are 0 if free, else mino color + 1"""
+        self.new_game()
+        for y, line in enumerate(lines):
+            for x, value in enumerate(line):
+                if value:
+                    self[y][x] = Mino(value - 1, Coord(x, y))
+
+    def new_line(self, y):
+        return [None for x in range(self.collumns)]
+
     def append_new_line(self):
-        self.append([None for x in range(self.collumns)])
+        self.append(self.new_line(len(self)))
+
+    def insert_garbage(self, nb_lines, hole):
+        """push the matrix content up by `nb_lines` garbage lines, full
+        except in collumn `hole`. True if minoes are pushed out of the matrix"""
+        nb_lines = min(nb_lines, len(self))
+        top = len(self) - nb_lines
+        overflow = any(any(line) for line in self[top:])
+        del self[top:]
+        garbage = []
+        for y in range(nb_lines):
+            line = self.new_line(y)
+            for x in range(self.collumns):
+                if x != hole:
+                    line[x] = Mino(Color.GARBAGE, Coord(x, y))
+            garbage.append(line)
+        self[0:0] = garbage
+        return overflow
 
     def cell_is_free(self, coord):
         return (
-            0 <= coord.x < self.collumns and 0 <= coord.y and not self[coord.y][coord.x]
+            0 <= coord.x < self.collumns
+            and 0 <= coord.y < len(self)
+            and not self[coord.y][coord.x]
         )
 
     def space_to_move(self, potential_coord, minoes_coord):
@@ -89,6 +193,68 @@ class Matrix(list, AbstractPieceContainer):
         )
 
 
+class BufferedLine(list):
+    """Matrix line mirroring its cells in the matrix buffer"""
+
+    def __init__(self, matrix, y):
+        super().__init__(None for x in range(matrix.collumns))
+        self.matrix = matrix
+        self.y = y
+
+    def __setitem__(self, x, mino):
+        super().__setitem__(x, mino)
+        self.matrix.on_cells_write()
+        self.matrix.cells[self.y * self.matrix.collumns + x] = (
+            mino.color + 1 if mino else 0
+        )
+
+
+class BufferedMatrix(Matrix):
+    """Matrix keeping a copy of its cells in a contiguous buffer,
+    one byte per cell (0 if free, else mino color + 1), line 0 first,
+    that can be viewed without copy (memoryview, NumPy...)"""
+
+    def __init__(self, lines, collumns, cells=None):
+        super().__init__(lines, collumns)
+        self.cells = cells if cells is not None else bytearray((lines + 3) * collumns)
+
+    def on_cells_write(self):
+        """called before each change of the cells buffer"""
+        pass
+
+    def new_game(self):
+        self.on_cells_write()
+        self.cells[:] = bytes(len(self.cells))
+        super().new_game()
+
+    def new_line(self, y):
+        return BufferedLine(self, y)
+
+    def insert_garbage(self, nb_lines, hole):
+        nb_lines = min(nb_lines, len(self))
+        size = nb_lines * self.collumns
+        self.on_cells_write()
+        self.cells[size:] = self.cells[: len(self.cells) - size]
+        self.cells[:size] = bytes(size)
+        for line in self[: len(self) - nb_lines]:
+            line.y += nb_lines
+        return super().insert_garbage(nb_lines, hole)
+
+    def pop(self, y):
+        line = super().pop(y)
+        start = y * self.collumns
+        self.on_cells_write()
+        self.cells[start : len(self) * self.collumns] = self.cells[
+            start + self.collumns : (len(self) + 1) * self.collumns
+        ]
+        self.cells[len(self) * self.collumns : (len(self) + 1) * self.collumns] = bytes(
+            self.collumns
+        )
+        for line_above in self[y:]:
+            line_above.y -= 1
+        return line
+
+
 class NextQueue(AbstractPieceContainer):
     """Displays the Next Tetrimino(s) to be placed (generated) just above the Matrix"""
 
@@ -96,12 +262,29 @@ class NextQueue(AbstractPieceContainer):
         super().__init__()
         self.nb_pieces = nb_pieces
         self.pieces = []
-
-    def new_game(self):
-        self.pieces = [Tetromino() for n in range(self.nb_pieces)]
+        self.random = random.Random()
+        self.bag = []
+        self.preset = []
+
+    def new_game(self, seed=None, shapes=()):
+        """`seed` gives the same pieces sequence each game,
+        after the pieces of `shapes`, if any"""
+        self.random.seed(seed)
+        self.bag = []
+        self.preset = list(shapes)
+        self.pieces = [self.new_piece() for n in range(self.nb_pieces)]
+
+    def new_piece(self):
+        """Random generator: each shape once in a shuffled bag"""
+        if self.preset:
+            return self.preset.pop(0)()
+        if not self.bag:
+            self.bag = list(Tetromino.shapes)
+            self.random.shuffle(self.bag)
+        return self.bag.pop()()
 
     def generation_phase(self):
-        self.pieces.append(Tetromino())
+        self.pieces.append(self.new_piece())
         return self.pieces.pop(0)
 
 
@@ -118,18 +301,36 @@ class Stats:
 
     score = property(_get_score, _set_score)
 
-    def __init__(self):
+    def _get_time(self):
+        if self.running_since is None:
+            return self._time
+        return self._time + self.clock() - self.running_since
+
+    def _set_time(self, new_time):
+        self._time = new_time
+        if self.running_since is not None:
+            self.running_since = self.clock()
+
+    time = property(_get_time, _set_time)
+
+    def __init__(self, clock=None):
+        """`clock` is a monotonic clock in seconds, play time has its resolution"""
+        self.clock = clock or time.monotonic
         self._score = 0
         self.high_score = 0
-        self.time = 0
+        self._time = 0
+        self.running_since = None
 
     def new_game(self, level):
         self.level = level - 1
         self.score = 0
         self.lines_cleared = 0
         self.goal = 0
-        self.time = 0
+        self._time = 0
+        self.running_since = self.clock()
         self.combo = -1
+        self.back_to_back = False
+        self.lines_sent = 0
 
         self.lock_delay = LOCK_DELAY
         self.fall_delay = FALL_DELAY
@@ -142,8 +343,15 @@ class Stats:
         if self.level > 15:
             self.lock_delay = 0.5 * pow(0.9, self.level - 15)
 
-    def update_time(self):
-        self.time += 1
+    def pause(self):
+        """stop the game clock, paused time is not counted"""
+        if self.running_since is not None:
+            self._time = self.time
+            self.running_since = None
+
+    def resume(self):
+        if self.running_since is None:
+            self.running_since = self.clock()
 
     def locks_down(self, t_spin, lines_cleared):
         pattern_name = []
@@ -171,6 +379,21 @@ class Stats:
 
         return pattern_name, pattern_score, self.combo, combo_score
 
+    def attack(self, t_spin, lines_cleared):
+        """garbage lines earned by a lock down, after locks_down"""
+        if not lines_cleared:
+            return 0
+
+        attack = ATTACKS[lines_cleared][t_spin]
+        if lines_cleared == 4 or t_spin:
+            if self.back_to_back:
+                attack += BACK_TO_BACK_ATTACK
+            self.back_to_back = True
+        else:
+            self.back_to_back = False
+        attack += COMBO_ATTACKS[min(self.combo, len(COMBO_ATTACKS) - 1)]
+        return attack
+
 
 class TetrisLogic:
     """Tetris game logic"""
@@ -179,32 +402,66 @@ class TetrisLogic:
     AUTOREPEAT_DELAY = AUTOREPEAT_DELAY
     AUTOREPEAT_PERIOD = AUTOREPEAT_PERIOD
     FALLING_PIECE_COORD = FALLING_PIECE_COORD
+    MATRIX_CLASS = Matrix
+    SPRINT_LINES = SPRINT_LINES
+    ULTRA_TIME = ULTRA_TIME
 
     timer = AbstractScheduler()
 
     def __init__(self, lines=LINES, collumns=COLLUMNS, nb_next_pieces=NEXT_PIECES):
         """init game with a `lines`x`collumns` size matrix
         and `nb_next_pieces`"""
-        self.stats = Stats()
+        self.stats = Stats(self.timer.time)
+        self.mode = Mode.MARATHON
+        self.events = EventBus()
         self.load_high_score()
         self.held = HoldQueue()
-        self.matrix = Matrix(lines, collumns)
+        self.matrix = self.MATRIX_CLASS(lines, collumns)
         self.next = NextQueue(nb_next_pieces)
+        self.garbage = []  # incoming garbage lines, by attack
+        self.garbage_random = random.Random()
+        self.over = False
         self.autorepeatable_actions = (self.move_left, self.move_right, self.soft_drop)
         self.pressed_actions = []
 
-    def new_game(self, level=1):
-        """start a new game at `level`"""
+    def new_game(self, level=1, mode=Mode.MARATHON, seed=None, position=None):
+        """start a new game at `level`
+        Sprint ends after SPRINT_LINES lines, Ultra after ULTRA_TIME seconds
+        `seed` gives the same pieces sequence each game
+        `position` (positions.Position) gives the matrix content, falling,
+        held and next pieces to start from, instead of an empty matrix"""
+        self.mode = mode
         self.stats.new_game(level)
 
         self.pressed_actions = []
 
-        self.matrix.new_game()
-        self.next.new_game()
-        self.held.piece = None
-        self.timer.postpone(self.stats.update_time, 1)
+        if position is None:
+            self.matrix.new_game()
+            self.next.new_game(seed)
+            self.held.piece = None
+        else:
+            self.matrix.load(position.matrix)
+            self.next.new_game(
+                seed,
+                [
+                    Tetromino.shapes[shape]
+                    for shape in (position.piece,) + tuple(position.next)
+                ],
+            )
+            if position.held is None:
+                self.held.piece = None
+            else:
+                self.held.piece = Tetromino.shapes[position.held]()
+                self.held.piece.hold_enabled = False
+        self.garbage = []
+        self.garbage_random.seed(seed)
+        self.over = False
+        if self.mode == Mode.ULTRA:
+            self.timer.postpone(self.time_up, self.ULTRA_TIME)
 
         self.on_new_game(self.matrix, self.next.pieces)
+        if NewGame in self.events.wanted:
+            self.events.queue.append(NewGame(level, tuple(self.next.pieces), position))
         self.new_level()
 
     def on_new_game(self, matrix, next_pieces):
@@ -213,6 +470,8 @@ class TetrisLogic:
     def new_level(self):
         self.stats.new_level()
         self.on_new_level(self.stats.level)
+        if NewLevel in self.events.wanted:
+            self.events.queue.append(NewLevel(self.stats.level))
         self.generation_phase()
 
     def on_new_level(self, level):
@@ -230,6 +489,12 @@ class TetrisLogic:
         self.on_generation_phase(
             self.matrix, self.matrix.piece, self.matrix.ghost, self.next.pieces
         )
+        if GenerationPhase in self.events.wanted:
+            self.events.queue.append(
+                GenerationPhase(
+                    self.matrix.piece, None if held_piece else self.next.pieces[-1]
+                )
+            )
         if self.matrix.space_to_move(
             self.matrix.piece.coord, (mino.coord for mino in self.matrix.piece)
         ):
@@ -256,6 +521,10 @@ class TetrisLogic:
         self.matrix.piece.locked = False
         self.timer.postpone(self.lock_phase, self.stats.fall_delay)
         self.on_falling_phase(self.matrix.piece, self.matrix.ghost)
+        if FallingPhase in self.events.wanted:
+            self.events.queue.append(
+                FallingPhase(self.matrix.piece.coord, self.matrix.piece.orientation)
+            )
 
     def on_falling_phase(self, falling_piece, ghost_piece):
         pass
@@ -281,6 +550,10 @@ class TetrisLogic:
             else:
                 self.matrix.piece.locked = True
                 self.on_locked(self.matrix.piece, self.matrix.ghost)
+                if Locked in self.events.wanted:
+                    self.events.queue.append(
+                        Locked(self.matrix.piece.coord, self.matrix.piece.orientation)
+                    )
                 self.timer.reset(self.locks_down, self.stats.lock_delay)
             return True
         else:
@@ -322,6 +595,8 @@ class TetrisLogic:
                 self.matrix[coord.y][coord.x] = mino
 
         self.on_locks_down(self.matrix, self.matrix.piece)
+        if LocksDown in self.events.wanted:
+            self.events.queue.append(LocksDown(self.matrix.piece))
 
         # Pattern phase
 
@@ -359,6 +634,8 @@ class TetrisLogic:
 
             # Eliminate phase
             self.on_eliminate_phase(self.matrix, lines_to_remove)
+            if EliminatePhase in self.events.wanted:
+                self.events.queue.append(EliminatePhase(lines_to_remove))
             for y in lines_to_remove:
                 self.matrix.pop(y)
                 self.matrix.append_new_line()
@@ -369,8 +646,41 @@ class TetrisLogic:
             t_spin, lines_cleared
         )
         self.on_completion_phase(pattern_name, pattern_score, nb_combo, combo_score)
+        if CompletionPhase in self.events.wanted:
+            self.events.queue.append(
+                CompletionPhase(
+                    t_spin,
+                    lines_cleared,
+                    pattern_name,
+                    pattern_score,
+                    nb_combo,
+                    combo_score,
+                    self.stats.score,
+                )
+            )
 
-        if self.stats.goal <= 0:
+        # Versus
+        attack = self.stats.attack(t_spin, lines_cleared)
+        while attack and self.garbage:
+            # Attack cancels incoming garbage first
+            countered = min(attack, self.garbage[0])
+            attack -= countered
+            self.garbage[0] -= countered
+            if not self.garbage[0]:
+                self.garbage.pop(0)
+        if attack:
+            self.stats.lines_sent += attack
+            self.on_attack(attack)
+            if Attack in self.events.wanted:
+                self.events.queue.append(Attack(attack))
+        elif not lines_cleared and self.garbage:
+            if self.insert_garbage():
+                self.game_over()
+                return
+
+        if self.mode == Mode.SPRINT and self.stats.lines_cleared >= self.SPRINT_LINES:
+            self.game_over()
+        elif self.stats.goal <= 0:
             self.new_level()
         else:
             self.generation_phase()
@@ -387,6 +697,33 @@ class TetrisLogic:
     def on_completion_phase(self, pattern_name, pattern_score, nb_combo, combo_score):
         pass
 
+    def on_attack(self, nb_lines):
+        """send `nb_lines` garbage lines to opponent(s) with receive_garbage"""
+        pass
+
+    def receive_garbage(self, nb_lines):
+        """queue garbage lines, inserted after the next lock down
+        without line clear, unless countered by an attack before"""
+        if nb_lines:
+            self.garbage.append(nb_lines)
+
+    def insert_garbage(self):
+        """insert incoming garbage, one hole collumn per attack.
+        True if it tops out"""
+        garbage, self.garbage = self.garbage, []
+        for nb_lines in garbage:
+            hole = self.garbage_random.randrange(self.matrix.collumns)
+            overflow = self.matrix.insert_garbage(nb_lines, hole)
+            self.on_garbage(self.matrix, nb_lines, hole)
+            if Garbage in self.events.wanted:
+                self.events.queue.append(Garbage(nb_lines, hole))
+            if overflow:
+                return True
+        return False
+
+    def on_garbage(self, matrix, nb_lines, hole):
+        pass
+
     # Actions
 
     def move_left(self):
@@ -422,16 +759,22 @@ class TetrisLogic:
         self.timer.cancel(self.lock_phase)
         self.matrix.piece, self.held.piece = self.held.piece, self.matrix.piece
 
+        # Held pieces come back as spawned
         for mino, coord in zip(self.held.piece, self.held.piece.MINOES_COORDS):
             mino.coord = coord
+        self.held.piece.orientation = 0
+        self.held.piece.rotated_last = False
+        self.held.piece.rotation_point_5_used = False
 
         self.on_hold(self.held.piece)
+        if Hold in self.events.wanted:
+            self.events.queue.append(Hold(self.held.piece))
         self.generation_phase(self.matrix.piece)
 
     def on_hold(self, held_piece):
         pass
 
-    T_SLOT_COORDS = (Coord(-1, 1), Coord(1, 1), Coord(-1, 1), Coord(-1, -1))
+    T_SLOT_COORDS = (Coord(-1, 1), Coord(1, 1), Coord(1, -1), Coord(-1, -1))
 
     def is_t_slot(self, n):
         t_slot_coord = (
@@ -445,6 +788,8 @@ class TetrisLogic:
         self.pressed_actions = []
         self.timer.cancel(self.repeat_action)
         self.on_pause()
+        if Pause in self.events.wanted:
+            self.events.queue.append(Pause())
 
     def on_pause(self):
         pass
@@ -453,27 +798,42 @@ class TetrisLogic:
         self.timer.postpone(self.lock_phase, self.stats.fall_delay)
         if self.matrix.piece.locked:
             self.timer.postpone(self.locks_down, self.stats.lock_delay)
-        self.timer.postpone(self.stats.update_time, 1)
+        if self.mode == Mode.ULTRA:
+            self.timer.postpone(self.time_up, self.ULTRA_TIME - self.stats.time)
+        self.stats.resume()
         self.on_resume()
+        if Resume in self.events.wanted:
+            self.events.queue.append(Resume())
 
     def on_resume(self):
         pass
 
     def game_over(self):
+        self.over = True
         self.stop_all()
         self.save_high_score()
         self.on_game_over()
+        if GameOver in self.events.wanted:
+            self.events.queue.append(GameOver(self.stats.score))
 
     def on_game_over(self):
         pass
 
+    def time_up(self):
+        self.stats.pause()
+        self.stats.time = self.ULTRA_TIME
+        self.game_over()
+
     def stop_all(self):
         self.timer.cancel(self.lock_phase)
         self.timer.cancel(self.locks_down)
-        self.timer.cancel(self.stats.update_time)
+        self.timer.cancel(self.time_up)
+        self.stats.pause()
 
     def do_action(self, action):
         action()
+        if Action in self.events.wanted:
+            self.events.queue.append(Action(action.__name__))
         if action in self.autorepeatable_actions:
             self.pressed_actions.append(action)
             if action == self.soft_drop:
@@ -505,10 +865,8 @@ class TetrisLogic:
             crypted_high_score = int(pickle.loads(crypted_high_score))
             self.stats.high_score = crypted_high_score ^ CRYPT_KEY
         else:
-            raise Warning(
-                """TetrisLogic.load_high_score not implemented.
-High score is set to 0"""
-            )
+            raise Warning("""TetrisLogic.load_high_score not implemented.
+High score is set to 0""")
             self.stats.high_score = 0
 
     def save_high_score(self):
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 import random
+import warnings
 
 from .utils import Coord, Spin, Color
 
@@ -17,14 +18,24 @@ class MetaTetromino(type):
 
 
 class Tetromino:
+    """Registry of the shapes, drawn by each game seeded bag"""
 
     shapes = []
+    # Default bag of Tetromino(), Tetromino.random.seed(n) replays it
+    random = random.Random()
     random_bag = []
 
     def __new__(cls):
+        """piece drawn from the default bag. Deprecated: games draw from the
+        bag of their NextQueue, seeded by new_game(seed=...)"""
+        warnings.warn(
+            "Tetromino() is deprecated, use NextQueue.new_piece()",
+            DeprecationWarning,
+            stacklevel=2,
+        )
         if not cls.random_bag:
             cls.random_bag = list(cls.shapes)
-            random.shuffle(cls.random_bag)
+            cls.random.shuffle(cls.random_bag)
         return cls.random_bag.pop()()
 
 
@@ -31,6 +31,13 @@ class T_Spin:
     T_SPIN = "T-SPIN"
 
 
+class Mode:
+
+    MARATHON = "MARATHON"
+    SPRINT = "SPRINT"
+    ULTRA = "ULTRA"
+
+
 class T_Slot:
 
     A = 0
@@ -48,3 +55,4 @@ class Color:
     ORANGE = 4
     RED = 5
     YELLOW = 6
+    GARBAGE = 7
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""Headless versus matches between two policies
+
+    match = Match(BotPolicy(), BotPolicy(depth=1))
+    result = match.play(seed=42)
+
+Both games run on one virtual clock, advanced by a frame after each
+policy had its turn. A policy is called with its game and returns
+an action as TetrisEnv.step takes it, or None to wait.
+Lines sent by a game are received as garbage by the other one.
+"""
+
+
+from collections import namedtuple
+
+from .consts import LINES, COLLUMNS, NEXT_PIECES
+from .utils import Mode
+from .tetrislogic import VirtualScheduler
+from .env import HeadlessTetrisLogic, FRAME, play
+from .bot import Bot, snapshot, best_placement
+from .evaluation import WEIGHTS
+
+
+MatchResult = namedtuple("MatchResult", "winner time scores lines_sent")
+
+
+class VersusLogic(HeadlessTetrisLogic):
+    """HeadlessTetrisLogic sending its attacks to `opponent`"""
+
+    opponent = None
+
+    def on_attack(self, nb_lines):
+        if self.opponent:
+            self.opponent.receive_garbage(nb_lines)
+
+
+class BotPolicy:
+    """Places each piece where the beam search bot would"""
+
+    def __init__(self, depth=1, beam_width=4, time_budget=0.010, weights=WEIGHTS):
+        self.depth = depth
+        self.beam_width = beam_width
+        self.time_budget = time_budget
+        self.weights = weights
+
+    def __call__(self, game):
+        return best_placement(
+            *snapshot(game),
+            game.matrix.collumns,
+            self.depth,
+            self.beam_width,
+            self.time_budget,
+            self.weights
+        )
+
+
+class Match:
+    """Two policies playing against each other until one tops out"""
+
+    def __init__(
+        self,
+        policy_1,
+        policy_2,
+        level=1,
+        frame=FRAME,
+        max_time=None,
+        lines=LINES,
+        collumns=COLLUMNS,
+        nb_next_pieces=NEXT_PIECES,
+    ):
+        """`max_time` in virtual seconds ends the match in a draw"""
+        self.policies = (policy_1, policy_2)
+        self.level = level
+        self.frame = frame
+        self.max_time = max_time
+        self.games = tuple(
+            VersusLogic(lines, collumns, nb_next_pieces) for policy in self.policies
+        )
+        self.games[0].opponent, self.games[1].opponent = self.games[1], self.games[0]
+        self.drivers = tuple(Bot(game) for game in self.games)
+
+    def play(self, seed=None):
+        """play a match, both games get the same pieces and garbage holes
+        sequences for a same `seed`. Returns a MatchResult, winner being
+        0 or 1, or None for a draw"""
+        timer = VirtualScheduler()
+        for game in self.games:
+            game.timer = timer
+            game.stats.clock = timer.time
+            game.new_game(self.level, Mode.MARATHON, seed)
+
+        players = tuple(zip(self.games, self.policies, self.drivers))
+        while True:
+            for game, policy, driver in players:
+                if game.matrix.piece is not None:
+                    action = policy(game)
+                    if action is not None:
+                        play(game, driver, action)
+                if game.over:
+                    break
+            if any(game.over for game in self.games):
+                break
+            if self.max_time is not None and timer.now >= self.max_time:
+                break
+            timer.advance(self.frame)
+
+        alive = [n for n, game in enumerate(self.games) if not game.over]
+        return MatchResult(
+            alive[0] if len(alive) == 1 else None,
+            timer.now,
+            tuple(game.stats.score for game in self.games),
+            tuple(game.stats.lines_sent for game in self.games),
+        )